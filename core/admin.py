@@ -1,18 +1,95 @@
 from django.contrib import admin
+from django.db import transaction
 from .models import (
     Location, Material, Product, ProductBOM, MaterialStock,
     ProductStock, MaterialPurchase, Production, ProductionMaterial,
-    WBShipment, ShipmentLogistics  # ← новые
+    WBShipment, ShipmentLogistics,  # ← новые
+    StockMovement, ProductComponent, WBJob, PlannedShipment, PurchaseOrder, StockSnapshot,
 )
+from .services.stock import record_adjustment
 
 admin.site.register(Location)
 admin.site.register(Material)
 admin.site.register(Product)
 admin.site.register(ProductBOM)
-admin.site.register(MaterialStock)
-admin.site.register(ProductStock)
+admin.site.register(ProductComponent)
 admin.site.register(MaterialPurchase)
 admin.site.register(Production)
 admin.site.register(ProductionMaterial)
 admin.site.register(WBShipment)
 admin.site.register(ShipmentLogistics)
+
+
+class StockAdmin(admin.ModelAdmin):
+    """Правка остатка вручную проводится через журнал движений (корректировка)"""
+    list_filter = ('location',)
+    # Пороги переписываются из позиции (services/thresholds.py)
+    readonly_fields = ('critical_level', 'low_level')
+
+    def get_readonly_fields(self, request, obj=None):
+        # У существующей строки меняется только количество: перенос между позициями/локациями — не корректировка
+        if obj is not None:
+            return (self.item_field, 'location') + self.readonly_fields
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        # changeform_view уже в транзакции: остаток до правки читается под блокировкой
+        before = 0
+        if change:
+            before = type(obj).objects.select_for_update().filter(pk=obj.pk).values_list('quantity', flat=True).first() or 0
+        super().save_model(request, obj, form, change)
+        record_adjustment(obj, obj.quantity - before)
+
+    def delete_model(self, request, obj):
+        record_adjustment(obj, -obj.quantity)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for obj in queryset.select_for_update():
+                record_adjustment(obj, -obj.quantity)
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(MaterialStock)
+class MaterialStockAdmin(StockAdmin):
+    item_field = 'material'
+    list_display = ('material', 'location', 'quantity', 'critical_level', 'low_level')
+
+
+@admin.register(ProductStock)
+class ProductStockAdmin(StockAdmin):
+    item_field = 'product'
+    list_display = ('product', 'location', 'quantity', 'critical_level', 'low_level')
+
+
+@admin.register(PlannedShipment)
+class PlannedShipmentAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'quantity', 'comment')
+    date_hierarchy = 'date'
+
+
+@admin.register(PurchaseOrder)
+class PurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = ('expected_date', 'material', 'quantity', 'supplier', 'received')
+    list_filter = ('received',)
+    list_editable = ('received',)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('date', 'reason', 'material', 'product', 'location', 'delta')
+    list_filter = ('reason', 'location')
+    date_hierarchy = 'date'
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('day', 'last_movement_id', 'created_at')
+    date_hierarchy = 'day'
+
+
+@admin.register(WBJob)
+class WBJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'token', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
@@ -0,0 +1,64 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+
+# Количества хранятся целым числом тысячных долей единицы
+QUANTITY_SCALE = 1000
+# Наибольшее количество в одном документе: BIGINT тысячных (до 9.2e15 единиц)
+# остаётся с запасом на суммы остатков и итогов
+MAX_QUANTITY = Decimal(10) ** 12
+
+
+def to_units(value):
+    """Количество → целое число тысячных (float — через repr, без двоичного хвоста)"""
+    if isinstance(value, float):
+        value = repr(value)
+    return int((Decimal(value) * QUANTITY_SCALE).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_units(units):
+    """Целое число тысячных → Decimal (12000 → 12, 1500 → 1.5)"""
+    return Decimal(units) / QUANTITY_SCALE
+
+
+def to_quantity(value):
+    """Округлить количество до тысячной, как оно будет сохранено в БД"""
+    return from_units(to_units(value))
+
+
+class QuantityField(models.Field):
+    """Количество с точностью до тысячной: в БД — BIGINT тысячных, в Python — Decimal.
+
+    Приращения остатков и суммы в БД — целочисленные и точные,
+    filter(quantity=0) находит ровно нулевые остатки.
+    Значения в lookup'ах и Value(..., output_field=...) масштабируются
+    автоматически; F('quantity') + число без output_field — ошибка типов,
+    а не тихое смешение единиц.
+    """
+    description = 'Количество (целое число тысячных)'
+    default_error_messages = {
+        'invalid': '«%(value)s» должно быть числом.',
+    }
+
+    def get_internal_type(self):
+        return 'BigIntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else from_units(round(value))
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        try:
+            return to_quantity(value)
+        except (InvalidOperation, TypeError, ValueError):
+            raise exceptions.ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        return None if value is None else to_units(value)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': forms.DecimalField, 'decimal_places': 3, **kwargs})
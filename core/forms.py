@@ -27,6 +27,35 @@ class ProductionForm(forms.ModelForm):
             }),
         }
 
+# Производство за смену — строка пакетной формы.
+# Справочники передаются готовыми списками, чтобы валидация 500 строк
+# не делала по запросу на каждый продукт и склад.
+class ProductionRowForm(forms.Form):
+    date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    product = forms.TypedChoiceField(coerce=int, widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    location = forms.TypedChoiceField(coerce=int, widget=forms.Select(attrs={'class': 'form-select form-select-sm'}))
+    produced_qty = forms.DecimalField(min_value=0, decimal_places=3, widget=forms.NumberInput(attrs={
+        'step': '0.1',
+        'class': 'form-control form-control-sm',
+        'placeholder': '0.0',
+        'min': '0'
+    }))
+
+    def __init__(self, *args, product_choices=(), location_choices=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['product'].choices = [('', '---------')] + list(product_choices)
+        self.fields['location'].choices = [('', '---------')] + list(location_choices)
+
+    def to_production(self):
+        return Production(
+            date=self.cleaned_data['date'],
+            product_id=self.cleaned_data['product'],
+            location_id=self.cleaned_data['location'],
+            produced_qty=self.cleaned_data['produced_qty'],
+        )
+
+ProductionBatchFormSet = forms.formset_factory(ProductionRowForm, extra=10, max_num=500, validate_max=True)
+
 class PurchaseForm(forms.ModelForm):
     class Meta:
         model = MaterialPurchase
@@ -59,6 +88,13 @@ class PurchaseForm(forms.ModelForm):
             }),
         }
 
+# Накладная поставщика CSV: дата;материал;количество;цена[;поставщик]
+class PurchaseImportForm(forms.Form):
+    file = forms.FileField(
+        label='Файл CSV',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+    )
+
 class ShipmentForm(forms.ModelForm):
     class Meta:
         model = WBShipment
@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.services.contention import DEFAULT_PROFILE, production_profile, run_profile
+
+
+class Command(BaseCommand):
+    help = 'Параллельная проводка документов во временной SQLite: настройки по умолчанию против боевого профиля'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=50, help='Проводок на поток')
+        parser.add_argument('--output', help='Записать результаты в JSON')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, profile in (('default', DEFAULT_PROFILE), ('production', production_profile())):
+            results[name] = run_profile(profile, threads=options['threads'], operations=options['operations'])
+            row = results[name]
+            self.stdout.write(
+                f"{name:<12} {row['succeeded']}/{row['operations']} за {row['seconds']} с — "
+                f"{row['ops_per_second']} оп/с, p50 {row['p50_ms']} мс, p95 {row['p95_ms']} мс, "
+                f"блокировок: {row['lock_errors']}, прочих ошибок: {row['other_errors']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS('✅ Готово'))
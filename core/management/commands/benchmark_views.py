@@ -0,0 +1,41 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.benchmark import environment, run
+
+
+class Command(BaseCommand):
+    help = 'Замер задержек, числа SQL-запросов и памяти основных страниц (результат — JSON)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Замеров на сценарий')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных запросов на сценарий')
+        parser.add_argument('--only', nargs='*', help='Только эти сценарии (dashboard, wb_stocks, ...)')
+        parser.add_argument('--label', default='', help='Метка прогона, например хэш коммита')
+        parser.add_argument('--output', default='benchmark.json', help='Куда записать JSON')
+
+    def handle(self, *args, **options):
+        try:
+            results = run(repeat=options['repeat'], warmup=options['warmup'], only=options['only'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        report = {
+            'label': options['label'],
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'repeat': options['repeat'],
+            'environment': environment(),
+            'views': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+        self.stdout.write(f"{'сценарий':<22}{'p50':>9}{'p95':>9}{'max':>9}{'SQL':>6}{'память, КБ':>12}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<22}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['max_ms']:>9}{row['queries']:>6}"
+                f"{row['peak_memory_kb']:>12}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ Результаты: {options['output']}"))
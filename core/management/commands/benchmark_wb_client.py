@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.services.wb_stub import benchmark_clients
+
+
+class Command(BaseCommand):
+    help = 'Выкачка каталога с локальной заглушки WB: синхронный клиент против асинхронного'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=1000)
+        parser.add_argument('--prices', type=int, default=20000)
+        parser.add_argument('--stocks', type=int, default=500)
+        parser.add_argument('--latency', type=float, default=0.05, help='Задержка заглушки на запрос, с')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--output', help='Записать результаты в JSON')
+
+    def handle(self, *args, **options):
+        results = benchmark_clients(
+            cards=options['cards'], prices=options['prices'], stocks=options['stocks'],
+            latency=options['latency'], concurrency=options['concurrency'],
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['client']:<10} {row['seconds']} с — запросов: {row['requests']}, "
+                f"одновременно до {row['max_in_flight']}; карточек {row['card']}, "
+                f"цен {row['price']}, остатков {row['stock']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS('✅ Готово'))
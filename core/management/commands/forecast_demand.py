@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.services.forecast import run_forecast
+
+
+class Command(BaseCommand):
+    help = 'Прогноз отгрузок на WB и пересчёт точек заказа / страхового запаса (запускать по расписанию)'
+
+    def handle(self, *args, **options):
+        products, materials = run_forecast()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Пороги пополнения: продукты — {products}, материалы — {materials}'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.purchase_import import PurchaseImportError, decode, import_purchases, parse_purchases
+
+
+class Command(BaseCommand):
+    help = 'Загрузить накладную CSV с закупками и оприходовать на склад «Дом»'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV: дата;материал;количество;цена[;поставщик]')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить, ничего не проводить')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as source:
+                text = decode(source.read())
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+
+        try:
+            purchases = parse_purchases(text) if options['dry_run'] else import_purchases(text)
+        except PurchaseImportError as error:
+            for line, message in error.errors:
+                self.stderr.write(f'строка {line}: {message}')
+            raise CommandError(f'❌ Накладная не загружена: {len(error.errors)} ошибок')
+
+        total = sum(purchase.total_amount for purchase in purchases)
+        verb = 'Проверено' if options['dry_run'] else 'Загружено'
+        self.stdout.write(self.style.SUCCESS(f'✅ {verb} {len(purchases)} закупок на {total:,.2f} руб.'))
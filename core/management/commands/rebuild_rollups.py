@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.services.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать дневные итоги для отчётов по всей истории документов'
+
+    def handle(self, *args, **options):
+        materials, products = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Дневных итогов: материалы — {materials}, продукция — {products}'
+        ))
@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Material
+from core.services.dataset import DEFAULT_END, flush, seed
+
+
+class Command(BaseCommand):
+    help = 'Сгенерировать воспроизводимый синтетический набор данных для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=5)
+        parser.add_argument('--materials', type=int, default=200)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--bom-lines', type=int, default=5, help='Материалов в рецептуре продукта')
+        parser.add_argument('--years', type=int, default=2, help='Сколько лет истории документов')
+        parser.add_argument('--purchases-per-day', type=int, default=20)
+        parser.add_argument('--productions-per-day', type=int, default=30)
+        parser.add_argument('--shipments-per-day', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора (одинаковое = одинаковые данные)')
+        parser.add_argument('--end', type=date.fromisoformat, default=DEFAULT_END,
+                            help=f'Последний день истории, ГГГГ-ММ-ДД (по умолчанию {DEFAULT_END:%Y-%m-%d})')
+        parser.add_argument('--flush', action='store_true', help='Удалить существующие складские данные')
+
+    def handle(self, *args, **options):
+        if Material.objects.exists():
+            if not options['flush']:
+                raise CommandError('В базе уже есть данные — запустите с --flush, чтобы их удалить')
+            flush()
+
+        counts = seed(
+            locations=options['locations'],
+            materials=options['materials'],
+            products=options['products'],
+            bom_lines=options['bom_lines'],
+            years=options['years'],
+            purchases_per_day=options['purchases_per_day'],
+            productions_per_day=options['productions_per_day'],
+            shipments_per_day=options['shipments_per_day'],
+            random_seed=options['seed'],
+            end=options['end'],
+        )
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS('✅ Набор данных создан'))
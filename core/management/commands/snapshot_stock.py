@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.snapshots import backfill, take_snapshot
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Дата «{value}» — ожидается ГГГГ-ММ-ДД')
+
+
+class Command(BaseCommand):
+    help = 'Снимок остатков на конец дня для запросов «остаток на дату» (запускать по расписанию)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='День снимка, ГГГГ-ММ-ДД (по умолчанию — сегодня)')
+        parser.add_argument('--since', help='Заполнить историю: снимки с этой даты до --date с шагом --interval')
+        parser.add_argument('--interval', type=int, default=7, help='Шаг снимков при --since, дней')
+
+    def handle(self, *args, **options):
+        day = _date(options['date']) if options['date'] else date.today()
+        if options['since']:
+            if options['interval'] < 1:
+                raise CommandError('--interval должен быть не меньше 1')
+            snapshots = backfill(_date(options['since']), day, options['interval'])
+        else:
+            snapshots = [take_snapshot(day)]
+
+        for snapshot, lines in snapshots:
+            self.stdout.write(f'{snapshot.day}: {lines} строк')
+        self.stdout.write(self.style.SUCCESS(f'✅ Снимков остатков: {len(snapshots)}'))
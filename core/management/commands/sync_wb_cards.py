@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import WBToken
+from core.services.wb_sync import sync_cards
+
+
+class Command(BaseCommand):
+    help = 'Инкрементальная синхронизация карточек WB в Product (по сохранённому курсору)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Синхронизировать только токен этого пользователя')
+        parser.add_argument('--full', action='store_true', help='Игнорировать курсор и выкачать всё заново')
+        parser.add_argument('--limit', type=int, default=100, help='Карточек на страницу (макс. 100)')
+
+    def handle(self, *args, **options):
+        tokens = WBToken.objects.exclude(api_key='').select_related('user')
+        if options['user']:
+            tokens = tokens.filter(user__username=options['user'])
+            if not tokens:
+                raise CommandError(f"Нет WB токена у пользователя {options['user']}")
+
+        for token in tokens:
+            synced = sync_cards(token, full=options['full'], limit=options['limit'])
+            self.stdout.write(self.style.SUCCESS(f'✅ {token.user.username}: {synced} карточек'))
@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.services.jobs import claim_next, requeue_stale, run_job
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди WB задач: выполняет WBJob в пуле потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Размер пула потоков')
+        parser.add_argument('--poll', type=float, default=1.0, help='Пауза опроса пустой очереди, сек')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Через сколько секунд задача в running считается зависшей')
+        parser.add_argument('--once', action='store_true', help='Выполнить очередь и выйти')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'↩️ Возвращено в очередь зависших задач: {requeued}')
+
+        threads = options['threads']
+        running = set()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            while True:
+                running = {future for future in running if not future.done()}
+                job = claim_next() if len(running) < threads else None
+                if job is not None:
+                    self.stdout.write(f'▶️ {job}')
+                    running.add(pool.submit(_run_in_thread, job))
+                    continue
+
+                if options['once'] and not running:
+                    break
+                close_old_connections()
+                time.sleep(options['poll'])
@@ -0,0 +1,35 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .services import profiling
+
+
+class ProfilingMiddleware:
+    """Замер времени и SQL каждого запроса по представлениям (включается PROFILING_ENABLED).
+
+    Сводка — /profiling/ (только staff), сырые замеры — PROFILING_LOG_FILE.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = profiling.QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        if view != 'profiling':
+            profiling.record(recorder.sample(view, request.method, response.status_code, wall_ms))
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_userprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reason', models.CharField(choices=[('purchase', 'Закупка'), ('production', 'Выпуск продукции'), ('consumption', 'Списание в производство'), ('shipment_out', 'Отгрузка'), ('shipment_in', 'Поступление по отгрузке')], max_length=20)),
+                ('delta', models.FloatField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.location')),
+                ('material', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.material')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+                ('production', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.production')),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.materialpurchase')),
+                ('shipment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.wbshipment')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 16:11
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_stockmovement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductComponent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty_per_unit', models.FloatField(validators=[django.core.validators.MinValueValidator(0.0001)])),
+                ('component', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='used_in', to='core.product')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='components', to='core.product')),
+            ],
+            options={
+                'unique_together': {('product', 'component')},
+            },
+        ),
+    ]
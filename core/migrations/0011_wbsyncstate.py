@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 16:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_productcomponent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WBSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cursor_updated_at', models.CharField(blank=True, max_length=40)),
+                ('cursor_nm_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('cards_synced', models.PositiveIntegerField(default=0)),
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_state', to='core.wbtoken')),
+            ],
+        ),
+    ]
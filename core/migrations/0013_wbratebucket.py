@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_wbjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WBRateBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=20)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.FloatField()),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rate_buckets', to='core.wbtoken')),
+            ],
+            options={
+                'unique_together': {('token', 'category')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-18 16:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_wbratebucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMaterialRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('purchased', models.FloatField(default=0)),
+                ('consumed', models.FloatField(default=0)),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.location')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.material')),
+            ],
+            options={
+                'unique_together': {('day', 'material', 'location')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('produced', models.FloatField(default=0)),
+                ('shipped_out', models.FloatField(default=0)),
+                ('shipped_in', models.FloatField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.location')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+            ],
+            options={
+                'unique_together': {('day', 'product', 'location')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0 on 2026-10-18 16:18
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_costs(apps, schema_editor):
+    """Начальная средняя цена — по всей истории закупок, под неё — текущий остаток"""
+    Material = apps.get_model('core', 'Material')
+    MaterialPurchase = apps.get_model('core', 'MaterialPurchase')
+    MaterialStock = apps.get_model('core', 'MaterialStock')
+
+    purchases = {
+        row['material_id']: row
+        for row in MaterialPurchase.objects.values('material_id').annotate(
+            quantity=Sum('quantity'), amount=Sum('total_amount'),
+        )
+    }
+    stock = dict(MaterialStock.objects.values('material_id').annotate(total=Sum('quantity')).values_list('material_id', 'total'))
+
+    materials = []
+    for material in Material.objects.filter(id__in=purchases):
+        row = purchases[material.id]
+        if not row['quantity']:
+            continue
+        material.avg_cost = (Decimal(str(row['amount'] or 0)) / Decimal(str(row['quantity']))).quantize(Decimal('0.0001'))
+        material.cost_qty = max(stock.get(material.id) or 0, 0)
+        materials.append(material)
+    Material.objects.bulk_update(materials, ['avg_cost', 'cost_qty'], batch_size=300)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyproductrollup',
+            name='produced_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='avg_cost',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='cost_qty',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='production',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_costs, migrations.RunPython.noop),
+    ]
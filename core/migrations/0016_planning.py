@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 16:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_costing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='lead_time_days',
+            field=models.PositiveSmallIntegerField(default=7),
+        ),
+        migrations.CreateModel(
+            name='PlannedShipment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.FloatField()),
+                ('comment', models.CharField(blank=True, max_length=200)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PurchaseOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_date', models.DateField()),
+                ('quantity', models.FloatField()),
+                ('supplier', models.CharField(blank=True, max_length=100)),
+                ('received', models.BooleanField(default=False)),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.material')),
+            ],
+        ),
+    ]
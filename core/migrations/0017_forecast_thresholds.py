@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_planning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='forecast_weekly',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='reorder_point',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='safety_stock',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='forecast_weekly',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_point',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='safety_stock',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
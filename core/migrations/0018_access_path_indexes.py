@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_forecast_thresholds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='materialpurchase',
+            index=models.Index(fields=['date', 'material'], name='purchase_date_material_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materialstock',
+            index=models.Index(fields=['location', 'quantity'], name='materialstock_loc_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='production',
+            index=models.Index(fields=['date', 'product'], name='production_date_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstock',
+            index=models.Index(fields=['location', 'quantity'], name='productstock_loc_qty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wbshipment',
+            index=models.Index(fields=['date', 'product'], name='wbshipment_date_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wbshipment',
+            index=models.Index(fields=['wb_shipment_number'], name='wbshipment_number_idx'),
+        ),
+    ]
@@ -0,0 +1,166 @@
+# Generated by Django 6.0 on 2026-10-18 16:34
+
+import core.fields
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Round
+
+# Поля, переводимые из FloatField в целые тысячные: {модель: [поля]}
+QUANTITY_FIELDS = {
+    'dailymaterialrollup': ['consumed', 'purchased'],
+    'dailyproductrollup': ['produced', 'shipped_in', 'shipped_out'],
+    'material': ['cost_qty', 'forecast_weekly', 'reorder_point', 'safety_stock'],
+    'materialpurchase': ['quantity'],
+    'materialstock': ['quantity'],
+    'plannedshipment': ['quantity'],
+    'product': ['forecast_weekly', 'reorder_point', 'safety_stock'],
+    'productbom': ['qty_per_unit'],
+    'productcomponent': ['qty_per_unit'],
+    'production': ['produced_qty'],
+    'productionmaterial': ['quantity_used'],
+    'productstock': ['quantity'],
+    'purchaseorder': ['quantity'],
+    'stockmovement': ['delta'],
+    'wbshipment': ['quantity'],
+}
+
+
+def to_milli_units(apps, schema_editor):
+    """Пока колонки ещё float: x → round(x * 1000), затем AlterField меняет тип на BIGINT"""
+    for model_name, fields in QUANTITY_FIELDS.items():
+        model = apps.get_model('core', model_name)
+        model.objects.update(**{field: Round(F(field) * Value(1000.0)) for field in fields})
+
+
+def from_milli_units(apps, schema_editor):
+    for model_name, fields in QUANTITY_FIELDS.items():
+        model = apps.get_model('core', model_name)
+        model.objects.update(**{field: F(field) / Value(1000.0) for field in fields})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_milli_units, from_milli_units),
+        migrations.AlterField(
+            model_name='dailymaterialrollup',
+            name='consumed',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailymaterialrollup',
+            name='purchased',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailyproductrollup',
+            name='produced',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailyproductrollup',
+            name='shipped_in',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='dailyproductrollup',
+            name='shipped_out',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='cost_qty',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='forecast_weekly',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='reorder_point',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='safety_stock',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='materialpurchase',
+            name='quantity',
+            field=core.fields.QuantityField(),
+        ),
+        migrations.AlterField(
+            model_name='materialstock',
+            name='quantity',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='plannedshipment',
+            name='quantity',
+            field=core.fields.QuantityField(),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='forecast_weekly',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='reorder_point',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='safety_stock',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='productbom',
+            name='qty_per_unit',
+            field=core.fields.QuantityField(validators=[django.core.validators.MinValueValidator(Decimal('0.001'))]),
+        ),
+        migrations.AlterField(
+            model_name='productcomponent',
+            name='qty_per_unit',
+            field=core.fields.QuantityField(validators=[django.core.validators.MinValueValidator(Decimal('0.001'))]),
+        ),
+        migrations.AlterField(
+            model_name='production',
+            name='produced_qty',
+            field=core.fields.QuantityField(),
+        ),
+        migrations.AlterField(
+            model_name='productionmaterial',
+            name='quantity_used',
+            field=core.fields.QuantityField(),
+        ),
+        migrations.AlterField(
+            model_name='productstock',
+            name='quantity',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='quantity',
+            field=core.fields.QuantityField(),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='delta',
+            field=core.fields.QuantityField(),
+        ),
+        migrations.AlterField(
+            model_name='wbshipment',
+            name='quantity',
+            field=core.fields.QuantityField(),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-18 16:39
+
+import core.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_quantity_milli_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockSnapshotLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', core.fields.QuantityField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['date', 'location'], name='stockmovement_date_loc_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotline',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.location'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotline',
+            name='material',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.material'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotline',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.product'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshotline',
+            name='snapshot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='core.stocksnapshot'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshotline',
+            index=models.Index(fields=['snapshot', 'location'], name='snapshotline_snapshot_loc_idx'),
+        ),
+    ]
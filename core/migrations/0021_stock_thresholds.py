@@ -0,0 +1,99 @@
+# Generated by Django 6.0 on 2026-10-18 16:44
+
+import core.fields
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Пороги по умолчанию, замороженные на момент миграции: от текущих настроек результат не зависит
+DEFAULTS = {
+    'material': {'critical': 0, 'low': 10},
+    'product': {'critical': 4, 'low': 20},
+}
+
+
+def fill_levels(apps, schema_editor):
+    """Пороги существующих строк остатков: свой порог позиции → прогноз → по умолчанию"""
+    for kind in ('material', 'product'):
+        stock_model = apps.get_model('core', f'{kind}stock')
+        item_model = apps.get_model('core', kind)
+        quantity_field = stock_model._meta.get_field('quantity')
+        default = DEFAULTS[kind]
+        item = item_model.objects.filter(id=OuterRef(f'{kind}_id'))
+
+        def level(manual, forecast, fallback):
+            return Subquery(item.values(level=Coalesce(
+                manual, forecast, Value(fallback, output_field=quantity_field), output_field=quantity_field,
+            )))
+
+        stock_model.objects.update(
+            critical_level=level('critical_level', 'safety_stock', default['critical']),
+            low_level=level('low_level', 'reorder_point', default['low']),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_stock_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='critical_level',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='material',
+            name='low_level',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='materialstock',
+            name='critical_level',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AddField(
+            model_name='materialstock',
+            name='low_level',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='critical_level',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_level',
+            field=core.fields.QuantityField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='productstock',
+            name='critical_level',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.AddField(
+            model_name='productstock',
+            name='low_level',
+            field=core.fields.QuantityField(default=0),
+        ),
+        migrations.RunPython(fill_levels, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='materialstock',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('critical_level'))), fields=['location'], name='materialstock_critical_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materialstock',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('critical_level')), ('quantity__lt', models.F('low_level')), _connector='OR'), fields=['location'], name='materialstock_attention_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstock',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('critical_level'))), fields=['location'], name='productstock_critical_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstock',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('critical_level')), ('quantity__lt', models.F('low_level')), _connector='OR'), fields=['location'], name='productstock_attention_idx'),
+        ),
+    ]
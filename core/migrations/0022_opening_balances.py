@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 16:55
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import Min, Sum
+
+
+def seed_opening_balances(apps, schema_editor):
+    """Остатки, заведённые до журнала (и правки мимо него), — движениями «начальный остаток».
+
+    Для каждой пары (позиция, локация) в журнал пишется разница между текущим
+    остатком и суммой движений — датой самого раннего движения, чтобы
+    «остаток на дату» по журналу совпадал с текущим.
+    """
+    StockMovement = apps.get_model('core', 'StockMovement')
+    day = StockMovement.objects.aggregate(first=Min('date'))['first'] or date.today()
+    movements = []
+    for kind in ('material', 'product'):
+        stock_model = apps.get_model('core', f'{kind}stock')
+        item_key = f'{kind}_id'
+        ledger = dict(
+            ((item_id, location_id), total) for item_id, location_id, total in
+            StockMovement.objects.filter(**{f'{item_key}__isnull': False})
+            .values(item_key, 'location_id').annotate(total=Sum('delta'))
+            .values_list(item_key, 'location_id', 'total')
+        )
+        current = {
+            (item_id, location_id): quantity
+            for item_id, location_id, quantity in stock_model.objects.values_list(item_key, 'location_id', 'quantity')
+        }
+        for item_id, location_id in current.keys() | ledger.keys():
+            delta = current.get((item_id, location_id), 0) - ledger.get((item_id, location_id), 0)
+            if delta:
+                movements.append(StockMovement(
+                    date=day, reason='opening', location_id=location_id, delta=delta, **{item_key: item_id},
+                ))
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+def drop_opening_balances(apps, schema_editor):
+    apps.get_model('core', 'StockMovement').objects.filter(reason='opening').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_stock_thresholds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(choices=[('purchase', 'Закупка'), ('production', 'Выпуск продукции'), ('consumption', 'Списание в производство'), ('shipment_out', 'Отгрузка'), ('shipment_in', 'Поступление по отгрузке'), ('opening', 'Начальный остаток'), ('adjustment', 'Корректировка остатка')], max_length=20),
+        ),
+        migrations.RunPython(seed_opening_balances, drop_opening_balances),
+    ]
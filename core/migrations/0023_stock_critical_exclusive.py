@@ -0,0 +1,73 @@
+# Generated by Django 6.0 on 2026-10-18 17:18
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Порог «критично» товара по умолчанию: в 0021 — граница включалась (остаток <= 4),
+# теперь не включается (остаток < 5). У материалов по умолчанию 0 в обоих случаях
+OLD_PRODUCT_CRITICAL = 4
+PRODUCT_CRITICAL = 5
+
+
+def _fill_product_critical(apps, fallback):
+    ProductStock = apps.get_model('core', 'ProductStock')
+    Product = apps.get_model('core', 'Product')
+    quantity_field = ProductStock._meta.get_field('quantity')
+    ProductStock.objects.update(critical_level=Subquery(
+        Product.objects.filter(id=OuterRef('product_id')).values(level=Coalesce(
+            'critical_level', 'safety_stock', Value(fallback, output_field=quantity_field),
+            output_field=quantity_field,
+        ))
+    ))
+
+
+def exclusive_default(apps, schema_editor):
+    _fill_product_critical(apps, PRODUCT_CRITICAL)
+
+
+def inclusive_default(apps, schema_editor):
+    _fill_product_critical(apps, OLD_PRODUCT_CRITICAL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_opening_balances'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='materialstock',
+            name='materialstock_critical_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='materialstock',
+            name='materialstock_attention_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productstock',
+            name='productstock_critical_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productstock',
+            name='productstock_attention_idx',
+        ),
+        migrations.RunPython(exclusive_default, inclusive_default),
+        migrations.AddIndex(
+            model_name='materialstock',
+            index=models.Index(condition=models.Q(('quantity__lt', models.F('critical_level')), ('quantity__lte', 0), _connector='OR'), fields=['location'], name='materialstock_critical_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materialstock',
+            index=models.Index(condition=models.Q(('quantity__lt', models.F('critical_level')), ('quantity__lte', 0), ('quantity__lt', models.F('low_level')), _connector='OR'), fields=['location'], name='materialstock_attention_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstock',
+            index=models.Index(condition=models.Q(('quantity__lt', models.F('critical_level')), ('quantity__lte', 0), _connector='OR'), fields=['location'], name='productstock_critical_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productstock',
+            index=models.Index(condition=models.Q(('quantity__lt', models.F('critical_level')), ('quantity__lte', 0), ('quantity__lt', models.F('low_level')), _connector='OR'), fields=['location'], name='productstock_attention_idx'),
+        ),
+    ]
@@ -1,7 +1,13 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, Q
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.shortcuts import render
 
+from .fields import QuantityField
+
 # Места хранения
 class Location(models.Model):
     name = models.CharField(max_length=100)
@@ -15,6 +21,17 @@ class Material(models.Model):
     name = models.CharField(max_length=100)  # Тряпка 30x40, Зип 25x35
     unit = models.CharField(max_length=20)  # шт, рулон
     type = models.CharField(max_length=20, choices=[('raw', 'Сырьё'), ('pack', 'Упаковка'), ('other', 'Прочее')])
+    # Средневзвешенная себестоимость единицы и количество, к которому она относится
+    avg_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    cost_qty = QuantityField(default=0)
+    lead_time_days = models.PositiveSmallIntegerField(default=7)  # срок поставки от заказа
+    # Прогноз расхода (через рецептуры) и пороги пополнения; пусто — прогноза нет, действуют общие пороги
+    forecast_weekly = QuantityField(null=True, blank=True)
+    safety_stock = QuantityField(null=True, blank=True)
+    reorder_point = QuantityField(null=True, blank=True)
+    # Свои пороги «критично» (остаток <=) и «мало» (остаток <); заданные вручную важнее прогноза
+    critical_level = QuantityField(null=True, blank=True)
+    low_level = QuantityField(null=True, blank=True)
 
     def __str__(self):
         return self.name
@@ -23,6 +40,14 @@ class Material(models.Model):
 class Product(models.Model):
     name = models.CharField(max_length=100)  # Комплект 5 тряпок 30x40
     wb_article = models.CharField(max_length=50, blank=True)
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0)  # по последнему производству
+    # Прогноз отгрузок на WB и пороги пополнения; пусто — прогноза нет, действуют общие пороги
+    forecast_weekly = QuantityField(null=True, blank=True)
+    safety_stock = QuantityField(null=True, blank=True)
+    reorder_point = QuantityField(null=True, blank=True)
+    # Свои пороги «критично» (остаток <=) и «мало» (остаток <); заданные вручную важнее прогноза
+    critical_level = QuantityField(null=True, blank=True)
+    low_level = QuantityField(null=True, blank=True)
 
     def __str__(self):
         return self.name
@@ -31,59 +56,110 @@ class Product(models.Model):
 class ProductBOM(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     material = models.ForeignKey(Material, on_delete=models.CASCADE)
-    qty_per_unit = models.FloatField(validators=[MinValueValidator(0.0001)])
+    qty_per_unit = QuantityField(validators=[MinValueValidator(Decimal('0.001'))])
 
     class Meta:
         unique_together = ('product', 'material')
 
+# Полуфабрикаты: продукт как компонент другого продукта
+class ProductComponent(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='components')
+    component = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='used_in')
+    qty_per_unit = QuantityField(validators=[MinValueValidator(Decimal('0.001'))])
+
+    class Meta:
+        unique_together = ('product', 'component')
+
+    def clean(self):
+        from .services.bom import creates_cycle
+
+        if self.product_id and self.component_id and creates_cycle(self.product_id, self.component_id):
+            raise ValidationError('Компонент не может содержать сам продукт (циклическая рецептура)')
+
+# Статус строки остатка — сравнение с её же порогами (см. services/thresholds.py):
+# критично — остаток ниже critical_level или закончился, мало — ниже low_level.
+# По этим условиям построены частичные индексы: в них попадают только проблемные строки
+STOCK_CRITICAL_Q = Q(quantity__lt=F('critical_level')) | Q(quantity__lte=0)
+STOCK_ATTENTION_Q = STOCK_CRITICAL_Q | Q(quantity__lt=F('low_level'))
+
 # Остатки материалов
 class MaterialStock(models.Model):
     material = models.ForeignKey(Material, on_delete=models.CASCADE)
     location = models.ForeignKey(Location, on_delete=models.CASCADE)
-    quantity = models.FloatField(default=0)
+    quantity = QuantityField(default=0)
+    # Действующие пороги позиции (копия из Material или общие), обновляются вместе с остатком
+    critical_level = QuantityField(default=0)
+    low_level = QuantityField(default=0)
 
     class Meta:
         unique_together = ('material', 'location')
+        indexes = [
+            models.Index(fields=['location', 'quantity'], name='materialstock_loc_qty_idx'),
+            models.Index(fields=['location'], condition=STOCK_CRITICAL_Q, name='materialstock_critical_idx'),
+            models.Index(fields=['location'], condition=STOCK_ATTENTION_Q, name='materialstock_attention_idx'),
+        ]
 
 # Остатки готовой продукции
 class ProductStock(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     location = models.ForeignKey(Location, on_delete=models.CASCADE)
-    quantity = models.FloatField(default=0)
+    quantity = QuantityField(default=0)
+    # Действующие пороги позиции (копия из Product или общие), обновляются вместе с остатком
+    critical_level = QuantityField(default=0)
+    low_level = QuantityField(default=0)
 
     class Meta:
         unique_together = ('product', 'location')
+        indexes = [
+            models.Index(fields=['location', 'quantity'], name='productstock_loc_qty_idx'),
+            models.Index(fields=['location'], condition=STOCK_CRITICAL_Q, name='productstock_critical_idx'),
+            models.Index(fields=['location'], condition=STOCK_ATTENTION_Q, name='productstock_attention_idx'),
+        ]
 
 # Закупка материалов
 class MaterialPurchase(models.Model):
     date = models.DateField()
     material = models.ForeignKey(Material, on_delete=models.CASCADE)
-    quantity = models.FloatField()
+    quantity = QuantityField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
     supplier = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['date', 'material'], name='purchase_date_material_idx')]
+
 # Производство
 class Production(models.Model):
     date = models.DateField()
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     location = models.ForeignKey(Location, on_delete=models.CASCADE)
-    produced_qty = models.FloatField()
+    produced_qty = QuantityField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0)  # себестоимость 1 шт на момент выпуска
+
+    class Meta:
+        indexes = [models.Index(fields=['date', 'product'], name='production_date_product_idx')]
 
 # Списание материалов
 class ProductionMaterial(models.Model):
     production = models.ForeignKey(Production, on_delete=models.CASCADE)
     material = models.ForeignKey(Material, on_delete=models.CASCADE)
-    quantity_used = models.FloatField()
+    quantity_used = QuantityField()
 # Отгрузки на WB
 class WBShipment(models.Model):
     date = models.DateField()
     from_location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='shipments_from')
     to_location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='shipments_to')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    quantity = models.FloatField()
+    quantity = QuantityField()
     wb_shipment_number = models.CharField(max_length=50)  # Номер поставки WB
     comment = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'product'], name='wbshipment_date_product_idx'),
+            models.Index(fields=['wb_shipment_number'], name='wbshipment_number_idx'),
+        ]
+
     def __str__(self):
         return f"{self.wb_shipment_number} - {self.quantity} {self.product.name}"
 
@@ -94,6 +170,27 @@ class ShipmentLogistics(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2)
     tracking_number = models.CharField(max_length=100, blank=True)
 
+# План отгрузок на WB (потребность для планирования закупок)
+class PlannedShipment(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = QuantityField()
+    comment = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        return f"{self.date} {self.product.name} × {self.quantity:g}"
+
+# Заказ поставщику: ещё не пришедшая закупка
+class PurchaseOrder(models.Model):
+    expected_date = models.DateField()
+    material = models.ForeignKey(Material, on_delete=models.CASCADE)
+    quantity = QuantityField()
+    supplier = models.CharField(max_length=100, blank=True)
+    received = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.expected_date} {self.material.name} × {self.quantity:g}"
+
 
 from django.contrib.auth.models import User
 
@@ -107,6 +204,69 @@ class WBToken(models.Model):
         return f"WB Token {self.user.username}"
 
 
+# Контрольная точка инкрементальной синхронизации карточек WB
+class WBSyncState(models.Model):
+    token = models.OneToOneField(WBToken, on_delete=models.CASCADE, related_name='sync_state')
+    cursor_updated_at = models.CharField(max_length=40, blank=True)
+    cursor_nm_id = models.BigIntegerField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    cards_synced = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"WB Sync {self.token.user.username}: {self.cursor_updated_at or '—'}"
+
+    @property
+    def cursor(self):
+        if not self.cursor_nm_id:
+            return None
+        return {'updatedAt': self.cursor_updated_at, 'nmID': self.cursor_nm_id}
+
+
+# Фоновые задачи WB (очередь в БД, обрабатывается командой wb_worker)
+class WBJob(models.Model):
+    KINDS = [
+        ('ping', 'Проверка токена'),
+        ('sync_cards', 'Синхронизация карточек'),
+    ]
+    STATUSES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    token = models.ForeignKey(WBToken, on_delete=models.CASCADE, related_name='jobs')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_pending(self):
+        return self.status in ('queued', 'running')
+
+
+# Token bucket лимита запросов к WB: общий для всех процессов через БД
+class WBRateBucket(models.Model):
+    token = models.ForeignKey(WBToken, on_delete=models.CASCADE, related_name='rate_buckets')
+    category = models.CharField(max_length=20)  # content, prices, statistics
+    tokens = models.FloatField()
+    updated_at = models.FloatField()  # unix time последнего пополнения
+
+    class Meta:
+        unique_together = ('token', 'category')
+
+    def __str__(self):
+        return f"{self.token} / {self.category}: {self.tokens:.2f}"
+
+
 from django.db.models import Sum
 from .models import MaterialStock, ProductStock, Location
 
@@ -156,3 +316,86 @@ class UserProfile(models.Model):
         if self.avatar:
             return self.avatar.url
         return '/static/img/default-avatar.png'
+
+
+# Дневные итоги по материалам (для отчётов): обновляются при каждой проводке
+class DailyMaterialRollup(models.Model):
+    day = models.DateField()
+    material = models.ForeignKey(Material, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    purchased = QuantityField(default=0)
+    consumed = QuantityField(default=0)
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'material', 'location')
+
+# Дневные итоги по продукции
+class DailyProductRollup(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    produced = QuantityField(default=0)
+    produced_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    shipped_out = QuantityField(default=0)
+    shipped_in = QuantityField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'product', 'location')
+
+
+# Журнал движений остатков (только добавление, одна строка на каждое +/- изменение)
+class StockMovement(models.Model):
+    REASONS = [
+        ('purchase', 'Закупка'),
+        ('production', 'Выпуск продукции'),
+        ('consumption', 'Списание в производство'),
+        ('shipment_out', 'Отгрузка'),
+        ('shipment_in', 'Поступление по отгрузке'),
+        ('opening', 'Начальный остаток'),
+        ('adjustment', 'Корректировка остатка'),
+    ]
+
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    reason = models.CharField(max_length=20, choices=REASONS)
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, null=True, blank=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    delta = QuantityField()
+
+    # Документ-основание
+    purchase = models.ForeignKey(MaterialPurchase, on_delete=models.SET_NULL, null=True, blank=True)
+    production = models.ForeignKey(Production, on_delete=models.SET_NULL, null=True, blank=True)
+    shipment = models.ForeignKey(WBShipment, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['date', 'location'], name='stockmovement_date_loc_idx')]
+
+    def __str__(self):
+        item = self.material or self.product
+        return f"{self.date} {self.get_reason_display()}: {item} {self.delta:+g} ({self.location})"
+
+
+# Снимок остатков на конец дня по журналу движений (для запросов «остаток на дату»)
+class StockSnapshot(models.Model):
+    day = models.DateField(unique=True)
+    # Журнал учтён до этой строки включительно: более поздние строки с датой <= day
+    # (задним числом) досчитываются при запросе
+    last_movement_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Снимок остатков на {self.day}"
+
+
+# Строка снимка: ненулевой остаток позиции на локации
+class StockSnapshotLine(models.Model):
+    snapshot = models.ForeignKey(StockSnapshot, on_delete=models.CASCADE, related_name='lines')
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, null=True, blank=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    quantity = QuantityField()
+
+    class Meta:
+        indexes = [models.Index(fields=['snapshot', 'location'], name='snapshotline_snapshot_loc_idx')]
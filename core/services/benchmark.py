@@ -0,0 +1,124 @@
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import date
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Location, Material, MaterialStock, Product, ProductStock
+
+
+class _Rollback(Exception):
+    """Откат POST-запроса бенчмарка, чтобы данные не менялись между прогонами"""
+
+
+def scenarios():
+    """[(имя, метод, url, данные)] — запросы, которые гоняет бенчмарк"""
+    home = Location.objects.filter(type='home').first()
+    wb = Location.objects.filter(type='wb').first() or home
+    material = Material.objects.order_by('id').first()
+    product_stock = ProductStock.objects.filter(location=home, quantity__gte=1).order_by('-quantity').first()
+    product = product_stock.product if product_stock else Product.objects.order_by('id').first()
+    if not (home and material and product):
+        raise ValueError('Нет данных: сначала выполните manage.py seed_dataset')
+    today = date.today().isoformat()
+
+    return [
+        ('dashboard', 'get', reverse('dashboard'), None),
+        ('wb_stocks', 'get', reverse('wb_stocks'), None),
+        ('wb_stocks_filtered', 'get', reverse('wb_stocks'), {'status': 'low', 'sort': '-quantity'}),
+        ('production_create', 'post', reverse('production_create'), {
+            'date': today, 'product': product.id, 'location': home.id, 'produced_qty': 1,
+        }),
+        ('purchase_create', 'post', reverse('purchase_create'), {
+            'date': today, 'material': material.id, 'quantity': 1, 'unit_price': 1,
+        }),
+        ('shipment_create', 'post', reverse('shipment_create'), {
+            'date': today, 'from_location': home.id, 'to_location': wb.id, 'product': product.id,
+            'quantity': 1, 'wb_shipment_number': 'BENCH',
+        }),
+        ('report_overview', 'get', reverse('report', args=['overview']), {'period': 'year'}),
+        ('capacity', 'get', reverse('capacity'), None),
+        ('mrp', 'get', reverse('mrp'), None),
+    ]
+
+
+def _request(client, method, url, data):
+    """Один запрос; POST выполняется в транзакции с откатом"""
+    if method == 'get':
+        return client.get(url, data or {})
+    try:
+        with transaction.atomic():
+            response = client.post(url, data or {})
+            raise _Rollback(response)
+    except _Rollback as rollback:
+        return rollback.args[0]
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(round(share * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def run(repeat=20, warmup=2, only=None):
+    """⚡ Прогон сценариев тестовым клиентом: p50/p95/max задержки, число SQL и пик памяти.
+
+    Время меряется без tracemalloc (он сам замедляет код), запросы и
+    пик памяти — отдельным прогоном.
+    """
+    user, _ = User.objects.get_or_create(username='benchmark')
+    host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '') and not host.startswith('.')),
+                'localhost')
+    client = Client(HTTP_HOST=host)
+    client.force_login(user)
+
+    results = {}
+    for name, method, url, data in scenarios():
+        if only and name not in only:
+            continue
+        for _ in range(warmup):
+            response = _request(client, method, url, data)
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = _request(client, method, url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            _request(client, method, url, data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(_percentile(timings, 0.95), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': len(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+    return results
+
+
+def environment():
+    """Описание окружения и объёма данных для сравнения прогонов"""
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'rows': {
+            'materials': Material.objects.count(),
+            'products': Product.objects.count(),
+            'material_stocks': MaterialStock.objects.count(),
+            'product_stocks': ProductStock.objects.count(),
+        },
+    }
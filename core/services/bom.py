@@ -0,0 +1,131 @@
+import threading
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from ..models import ProductBOM, ProductComponent
+
+# Развёрнутые рецептуры: {product_id: {material_id: qty на 1 шт}}.
+# Строки рецептур читаются двумя запросами и держатся в памяти процесса,
+# продукты разворачиваются по мере запросов. Актуальность — по «версии рецептур»
+# в общем кэше (settings.CACHES): сигналы (см. core/signals.py) меняют её при любом
+# изменении ProductBOM / ProductComponent, и все воркеры перечитывают рецептуры.
+VERSION_KEY = 'bom:version'
+
+_state = None
+_lock = threading.Lock()
+
+
+class BOMCycleError(ValueError):
+    """Циклическая рецептура: продукт прямо или косвенно входит сам в себя"""
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Случайная версия, чтобы после вытеснения ключа не принять старое состояние за свежее
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Сбросить развёрнутые рецептуры во всех процессах"""
+    global _state
+    with _lock:
+        _state = None
+    # Не incr: в файловом кэше это чтение и запись без блокировки, два параллельных сброса
+    # записали бы одну версию. Случайное значение у каждого сброса своё
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _load_components():
+    components = defaultdict(list)
+    for product_id, component_id, qty in ProductComponent.objects.values_list('product_id', 'component_id', 'qty_per_unit'):
+        components[product_id].append((component_id, qty))
+    return components
+
+
+def _get_state():
+    """(строки материалов, строки компонентов, уже развёрнутые продукты) текущей версии рецептур"""
+    global _state
+    version = _version()
+    state = _state
+    if state is None or state['version'] != version:
+        materials = defaultdict(list)
+        for product_id, material_id, qty in ProductBOM.objects.values_list('product_id', 'material_id', 'qty_per_unit'):
+            materials[product_id].append((material_id, qty))
+        # Версия прочитана до загрузки: если рецептуры поменялись во время чтения,
+        # следующее обращение увидит новую версию и перечитает их
+        state = {'version': version, 'materials': materials, 'components': _load_components(), 'flat': {}}
+        with _lock:
+            _state = state
+    return state
+
+
+def _explode(state, product_id):
+    """Развернуть продукт (и его полуфабрикаты) в материалы; цикл — BOMCycleError"""
+    materials, components, flat = state['materials'], state['components'], state['flat']
+    in_progress = set()
+
+    def walk(product_id):
+        if product_id in flat:
+            return flat[product_id]
+        if product_id in in_progress:
+            raise BOMCycleError(product_id)
+        in_progress.add(product_id)
+
+        need = defaultdict(Decimal)
+        for material_id, qty in materials.get(product_id, ()):
+            need[material_id] += qty
+        for component_id, qty in components.get(product_id, ()):
+            for material_id, component_qty in walk(component_id).items():
+                need[material_id] += qty * component_qty
+
+        in_progress.discard(product_id)
+        flat[product_id] = dict(need)
+        return flat[product_id]
+
+    return walk(product_id)
+
+
+def explode(product_id):
+    """Потребность в материалах на 1 шт продукта с учётом полуфабрикатов"""
+    return _explode(_get_state(), product_id)
+
+
+def explode_many(product_ids, skip_cycles=False):
+    """{product_id: {material_id: qty}} для набора продуктов без запросов к БД (после прогрева).
+
+    Разворачиваются только запрошенные продукты, поэтому цикл в чужой рецептуре
+    (записанный мимо проверки, например bulk_create) их не ломает.
+    skip_cycles — продукты с циклической рецептурой не попадают в результат
+    (для сводных расчётов по всему каталогу) вместо BOMCycleError.
+    """
+    state = _get_state()
+    flat = {}
+    for product_id in product_ids:
+        try:
+            flat[product_id] = _explode(state, product_id)
+        except BOMCycleError:
+            if not skip_cycles:
+                raise
+    return flat
+
+
+def creates_cycle(product_id, component_id):
+    """Появится ли цикл, если добавить component_id в состав product_id"""
+    if product_id == component_id:
+        return True
+    components = _load_components()
+    stack, seen = [component_id], set()
+    while stack:
+        current = stack.pop()
+        if current == product_id:
+            return True
+        if current not in seen:
+            seen.add(current)
+            stack.extend(child for child, _ in components.get(current, ()))
+    return False
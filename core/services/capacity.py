@@ -0,0 +1,93 @@
+import numpy as np
+
+from ..models import Location, Material, MaterialStock, Product
+from .bom import explode_many
+
+
+def bom_matrix(product_ids):
+    """Развёрнутые рецептуры в разреженном виде, отсортированные по продукту.
+
+    Возвращает (product_ids с рецептурой, material_ids,
+    строки-начала каждого продукта, индексы материалов, qty на 1 шт).
+    Продукты с циклической рецептурой пропускаются: сделать их всё равно нельзя.
+    """
+    flat = explode_many(product_ids, skip_cycles=True)
+    products = [product_id for product_id in flat if any(qty > 0 for qty in flat[product_id].values())]
+    material_ids = sorted({material_id for product_id in products for material_id in flat[product_id]})
+    column = {material_id: index for index, material_id in enumerate(material_ids)}
+
+    starts, columns, quantities = [], [], []
+    for product_id in products:
+        starts.append(len(columns))
+        for material_id, qty in flat[product_id].items():
+            if qty > 0:
+                columns.append(column[material_id])
+                quantities.append(qty)
+    return (
+        products, material_ids,
+        np.array(starts, dtype=np.intp), np.array(columns, dtype=np.intp), np.array(quantities, dtype=float),
+    )
+
+
+def stock_matrix(material_ids, location_ids):
+    """Остатки материалов: матрица материал × локация (минус считается нулём)"""
+    row = {material_id: index for index, material_id in enumerate(material_ids)}
+    column = {location_id: index for index, location_id in enumerate(location_ids)}
+    stock = np.zeros((len(material_ids), len(location_ids)))
+    rows = MaterialStock.objects.filter(material_id__in=material_ids, location_id__in=location_ids)
+    for material_id, location_id, quantity in rows.values_list('material_id', 'location_id', 'quantity'):
+        stock[row[material_id], column[location_id]] = max(quantity, 0)
+    return stock
+
+
+def max_producible(product_ids, location_ids):
+    """⚡ Сколько штук каждого продукта можно сделать на каждой локации.
+
+    Для каждой пары (продукт, материал) рецептуры считается остаток / расход
+    на всех локациях сразу, затем минимум по материалам продукта берётся
+    одним np.minimum.reduceat. Стоимость — O(строк рецептур × локаций),
+    без цикла по продуктам в ORM.
+    Возвращает (продукты с рецептурой, матрица штук, матрица индексов
+    узкого материала, material_ids).
+    """
+    products, material_ids, starts, columns, quantities = bom_matrix(product_ids)
+    if not products:
+        return [], np.zeros((0, len(location_ids))), np.zeros((0, len(location_ids)), dtype=np.intp), material_ids
+
+    stock = stock_matrix(material_ids, location_ids)
+    ratios = stock[columns] / quantities[:, None]            # строки рецептур × локации
+    capacity = np.minimum.reduceat(ratios, starts, axis=0)   # продукты × локации
+
+    # Узкое место: первый материал рецептуры, на котором достигается минимум
+    counts = np.diff(np.append(starts, len(columns)))
+    is_min = ratios == np.repeat(capacity, counts, axis=0)
+    positions = np.where(is_min, np.arange(len(columns))[:, None], len(columns))
+    bottleneck = columns[np.minimum.reduceat(positions, starts, axis=0)]
+
+    return products, np.floor(capacity + 1e-9), bottleneck, material_ids
+
+
+def capacity_table(location_ids=None, search=''):
+    """Данные для страницы/JSON: локации и строки {product, capacity, bottleneck} по продуктам"""
+    locations = Location.objects.order_by('name')
+    if location_ids:
+        locations = locations.filter(id__in=location_ids)
+    locations = list(locations.values('id', 'name'))
+
+    products = Product.objects.order_by('name')
+    if search:
+        products = products.filter(name__icontains=search)
+    names = dict(products.values_list('id', 'name'))
+
+    product_ids, capacity, bottleneck, material_ids = max_producible(list(names), [loc['id'] for loc in locations])
+    material_names = dict(Material.objects.filter(id__in=material_ids).values_list('id', 'name'))
+
+    rows = []
+    for index, product_id in enumerate(product_ids):
+        rows.append({
+            'product_id': product_id,
+            'product': names[product_id],
+            'capacity': [int(value) for value in capacity[index]],
+            'bottleneck': [material_names.get(material_ids[column]) for column in bottleneck[index]],
+        })
+    return locations, rows
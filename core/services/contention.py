@@ -0,0 +1,145 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+
+from ..models import (
+    Location, Material, MaterialPurchase, MaterialStock, Product, ProductBOM, ProductStock, Production, WBShipment
+)
+from . import bom
+from .stock import InsufficientStock, post_production, post_purchase, post_shipment
+
+# «До»: настройки SQLite по умолчанию (журнал отката, отложенные транзакции, таймаут 5 с)
+DEFAULT_PROFILE = {
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'},
+}
+
+
+def production_profile():
+    """«После»: профиль из settings.DATABASES['default'] (WAL, busy timeout, IMMEDIATE, ...)"""
+    config = settings.DATABASES['default']
+    return {'CONN_MAX_AGE': config.get('CONN_MAX_AGE', 0), 'OPTIONS': dict(config.get('OPTIONS', {}))}
+
+
+def _drop_connection():
+    # Обёртка соединения текущего потока пересоздастся из connections.settings
+    try:
+        del connections['default']
+    except AttributeError:
+        pass
+
+
+def _use_database(path, profile):
+    """Переключить соединение 'default' на файл path с указанным профилем (для новых потоков тоже)"""
+    connections.close_all()
+    config = dict(connections.settings['default'])
+    config.update(NAME=path, CONN_MAX_AGE=profile['CONN_MAX_AGE'], OPTIONS=profile['OPTIONS'])
+    connections.settings['default'] = config
+    _drop_connection()
+
+
+def _seed():
+    home = Location.objects.create(name='Дом', type='home')
+    wb = Location.objects.create(name='WB', type='wb')
+    materials = Material.objects.bulk_create([Material(name=f'М{i}', unit='шт', type='raw') for i in range(20)])
+    products = Product.objects.bulk_create([Product(name=f'П{i}') for i in range(10)])
+    ProductBOM.objects.bulk_create([
+        ProductBOM(product=product, material=materials[(i + j) % len(materials)], qty_per_unit=1)
+        for i, product in enumerate(products) for j in range(3)
+    ])
+    # Запас на весь прогон: производство и отгрузка не упираются в нехватку остатка
+    MaterialStock.objects.bulk_create([MaterialStock(material=material, location=home, quantity=10 ** 6) for material in materials])
+    ProductStock.objects.bulk_create([ProductStock(product=product, location=home, quantity=10 ** 6) for product in products])
+    bom.invalidate()
+    return home, wb, materials, products
+
+
+def _operation(index, home, wb, materials, products):
+    """Одна проводка: по очереди закупка, производство и отгрузка"""
+    today = date.today()
+    kind = index % 3
+    with transaction.atomic():
+        if kind == 0:
+            purchase = MaterialPurchase.objects.create(
+                date=today, material=materials[index % len(materials)], quantity=10, unit_price=1, total_amount=10,
+            )
+            post_purchase(purchase, home)
+        elif kind == 1:
+            production = Production.objects.create(
+                date=today, product=products[index % len(products)], location=home, produced_qty=1,
+            )
+            post_production(production)
+        else:
+            shipment = WBShipment.objects.create(
+                date=today, from_location=home, to_location=wb, product=products[index % len(products)],
+                quantity=1, wb_shipment_number=f'BENCH-{index}',
+            )
+            post_shipment(shipment)
+
+
+def run_profile(profile, threads=8, operations=50):
+    """⚡ threads потоков одновременно проводят по operations документов во временной БД.
+
+    Возвращает пропускную способность, задержки и число ошибок блокировки.
+    """
+    handle, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    original = dict(connections.settings['default'])
+    try:
+        _use_database(path, profile)
+        call_command('migrate', verbosity=0)
+        fixtures = _seed()
+        connection.close()
+
+        latencies, errors, lock = [], [], threading.Lock()
+        start = threading.Barrier(threads)
+
+        def worker(number):
+            start.wait()
+            for step in range(operations):
+                started = time.perf_counter()
+                try:
+                    _operation(number * operations + step, *fixtures)
+                except (OperationalError, InsufficientStock) as error:
+                    with lock:
+                        errors.append(str(error))
+                else:
+                    with lock:
+                        latencies.append((time.perf_counter() - started) * 1000)
+            connection.close()
+
+        pool = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'threads': threads,
+            'operations': threads * operations,
+            'succeeded': len(latencies),
+            'lock_errors': sum('locked' in error for error in errors),
+            'other_errors': sum('locked' not in error for error in errors),
+            'seconds': round(elapsed, 2),
+            'ops_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+            'p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))], 2) if latencies else None,
+        }
+    finally:
+        connections.close_all()
+        connections.settings['default'] = original
+        _drop_connection()
+        bom.invalidate()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
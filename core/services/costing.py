@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Greatest
+
+from ..models import Material, Product
+
+COST_FIELD = Material._meta.get_field('avg_cost')
+QUANTITY_FIELD = Material._meta.get_field('cost_qty')
+# Шаг себестоимости — четыре знака после запятой, как у avg_cost / unit_cost
+COST_STEP = Decimal('0.0001')
+
+
+def record_purchases(totals):
+    """⚡ Пересчёт средневзвешенной себестоимости по закупкам: одно чтение и один UPDATE.
+
+    totals — {material_id: (количество, сумма)}.
+    avg = (avg * qty + сумма) / (qty + количество), где qty — остаток себестоимости
+    (не меньше нуля; при нуле avg — цена закупки). Считается в Decimal по строкам,
+    заблокированным до конца транзакции, — без смешения тысячных и рублей в SQL.
+    """
+    totals = {material_id: total for material_id, total in totals.items() if total[0] > 0}
+    if not totals:
+        return
+    avg_whens = []
+    qty_whens = []
+    current = Material.objects.select_for_update().filter(id__in=totals).values_list('id', 'avg_cost', 'cost_qty')
+    for material_id, avg_cost, cost_qty in current:
+        quantity, amount = totals[material_id]
+        cost_qty = max(cost_qty, 0)
+        new_qty = cost_qty + quantity
+        avg = (avg_cost * cost_qty + Decimal(str(amount))) / new_qty
+        avg_whens.append(When(id=material_id, then=Value(avg.quantize(COST_STEP), output_field=COST_FIELD)))
+        qty_whens.append(When(id=material_id, then=Value(new_qty, output_field=QUANTITY_FIELD)))
+
+    Material.objects.filter(id__in=totals).update(
+        avg_cost=Case(*avg_whens, default=F('avg_cost'), output_field=COST_FIELD),
+        cost_qty=Case(*qty_whens, default=F('cost_qty'), output_field=QUANTITY_FIELD),
+    )
+
+
+def record_consumption(used):
+    """Списание уменьшает количество под себестоимостью (средняя цена не меняется)"""
+    if not used:
+        return
+    Material.objects.filter(id__in=used).update(cost_qty=Case(
+        *[When(id=material_id, then=Greatest(
+            F('cost_qty') - Value(qty, output_field=QUANTITY_FIELD), Value(0, output_field=QUANTITY_FIELD)
+        )) for material_id, qty in used.items()],
+        default=F('cost_qty'),
+        output_field=QUANTITY_FIELD,
+    ))
+
+
+def unit_costs(flat_boms):
+    """{product_id: себестоимость 1 шт} по развёрнутым рецептурам и текущим avg_cost"""
+    material_ids = {material_id for need in flat_boms.values() for material_id in need}
+    avg = dict(Material.objects.filter(id__in=material_ids).values_list('id', 'avg_cost'))
+    return {
+        product_id: sum(
+            (avg.get(material_id, Decimal(0)) * qty for material_id, qty in need.items()),
+            Decimal(0),
+        ).quantize(COST_STEP)
+        for product_id, need in flat_boms.items()
+    }
+
+
+def store_product_costs(costs):
+    """Запомнить последнюю себестоимость продуктов одним UPDATE"""
+    if not costs:
+        return
+    Product.objects.filter(id__in=costs).update(unit_cost=Case(
+        *[When(id=product_id, then=Value(cost, output_field=COST_FIELD)) for product_id, cost in costs.items()],
+        default=F('unit_cost'),
+        output_field=DecimalField(max_digits=12, decimal_places=4),
+    ))
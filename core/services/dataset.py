@@ -0,0 +1,182 @@
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from ..models import (
+    DailyMaterialRollup, DailyProductRollup, Location, Material, MaterialPurchase, MaterialStock, PlannedShipment,
+    Product, ProductBOM, ProductComponent, ProductStock, Production, ProductionMaterial, PurchaseOrder, StockMovement,
+    StockSnapshot, WBShipment
+)
+from . import bom, rollups, thresholds
+from .summary import stock_changed
+
+BATCH_SIZE = 1000
+# Последний день истории по умолчанию: один и тот же набор данных в любой день запуска
+DEFAULT_END = date(2026, 1, 1)
+
+# Что удаляется перед генерацией (порядок — от зависимых к основным)
+SEEDED_MODELS = [
+    StockSnapshot, StockMovement, ProductionMaterial, Production, MaterialPurchase, WBShipment, PlannedShipment, PurchaseOrder,
+    DailyMaterialRollup, DailyProductRollup, MaterialStock, ProductStock, ProductBOM, ProductComponent,
+    Product, Material, Location,
+]
+
+
+def flush():
+    """Удалить все складские данные (пользователи и WB токены не трогаются)"""
+    with transaction.atomic():
+        for model in SEEDED_MODELS:
+            model.objects.all().delete()
+    bom.invalidate()
+    stock_changed()
+
+
+def seed(locations=5, materials=200, products=1000, bom_lines=5, years=2,
+         purchases_per_day=20, productions_per_day=30, shipments_per_day=20, random_seed=42, end=DEFAULT_END):
+    """⚡ Воспроизводимый синтетический набор данных для бенчмарков.
+
+    Все документы генерируются в памяти и пишутся bulk_create пачками;
+    остатки, журнал движений и дневные итоги считаются из тех же документов,
+    поэтому данные согласованы, как после обычной проводки.
+    Документы идут по дням, как их провёл бы кладовщик: производство — только
+    из материалов, уже лежащих дома, отгрузка — только из готового остатка
+    (иначе проводка отказала бы с InsufficientStock). Поэтому производств
+    и отгрузок может быть меньше заданного *_per_day.
+    Одинаковые аргументы (включая end) — одинаковые данные.
+    Возвращает {модель: число строк}.
+    """
+    rng = random.Random(random_seed)
+    days = [end - timedelta(days=offset) for offset in range(365 * years, 0, -1)]
+
+    def create(model, objects):
+        return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+    with transaction.atomic():
+        home = Location.objects.create(name='Дом', type='home')
+        location_list = [home] + create(Location, [
+            Location(name=f'WB склад {i}', type='wb') for i in range(1, locations)
+        ])
+        material_list = create(Material, [
+            Material(name=f'Материал {i:05d}', unit=rng.choice(['шт', 'м', 'рулон']),
+                     type=rng.choice(['raw', 'pack', 'other']), lead_time_days=rng.choice([3, 7, 14]))
+            for i in range(materials)
+        ])
+        prices = {material.id: Decimal(rng.randint(100, 5000)) / 100 for material in material_list}
+        product_list = create(Product, [
+            Product(name=f'Продукт {i:05d}', wb_article=str(10_000_000 + i)) for i in range(products)
+        ])
+
+        recipes = {}
+        bom_rows = []
+        for product in product_list:
+            recipe = {
+                material.id: rng.choice([Decimal('0.5'), 1, 1, 2, 3])
+                for material in rng.sample(material_list, min(bom_lines, len(material_list)))
+            }
+            recipes[product.id] = recipe
+            bom_rows += [ProductBOM(product=product, material_id=material_id, qty_per_unit=qty)
+                         for material_id, qty in recipe.items()]
+        create(ProductBOM, bom_rows)
+        for product in product_list:
+            product.unit_cost = sum((prices[m] * Decimal(str(q)) for m, q in recipes[product.id].items()), Decimal(0))
+
+        # Остатки ведутся по ходу генерации: каждый документ видит только то, что уже поступило
+        material_stock = defaultdict(Decimal)
+        product_stock = defaultdict(Decimal)
+        purchases, productions, shipments = [], [], []
+        for day in days:
+            for _ in range(purchases_per_day):
+                material = rng.choice(material_list)
+                quantity = rng.randint(10, 500)
+                material_stock[(material.id, home.id)] += quantity
+                purchases.append(MaterialPurchase(
+                    date=day, material=material, quantity=quantity, unit_price=prices[material.id],
+                    total_amount=prices[material.id] * quantity, supplier=f'Поставщик {rng.randint(1, 20)}',
+                ))
+            for _ in range(productions_per_day):
+                product = rng.choice(product_list)
+                recipe = recipes[product.id]
+                # Сколько штук хватает материалов дома — не больше запрошенного
+                quantity = min([rng.randint(1, 40)] + [
+                    int(material_stock.get((material_id, home.id), 0) // Decimal(str(qty)))
+                    for material_id, qty in recipe.items()
+                ])
+                if not quantity:
+                    continue
+                for material_id, qty in recipe.items():
+                    material_stock[(material_id, home.id)] -= qty * quantity
+                product_stock[(product.id, home.id)] += quantity
+                productions.append(Production(
+                    date=day, product=product, location=home, produced_qty=quantity, unit_cost=product.unit_cost,
+                ))
+            stocked = [product for product in product_list if product_stock.get((product.id, home.id), 0) > 0]
+            for _ in range(shipments_per_day if stocked else 0):
+                product = rng.choice(stocked)
+                to_location = rng.choice(location_list[1:] or location_list)
+                quantity = min(rng.randint(1, 20), product_stock[(product.id, home.id)])
+                number = f'WB-{day:%Y%m%d}-{rng.randint(1, 99999):05d}'
+                if not quantity:
+                    continue
+                product_stock[(product.id, home.id)] -= quantity
+                product_stock[(product.id, to_location.id)] += quantity
+                shipments.append(WBShipment(
+                    date=day, from_location=home, to_location=to_location, product=product, quantity=quantity,
+                    wb_shipment_number=number,
+                ))
+        create(MaterialPurchase, purchases)
+        create(Production, productions)
+        create(WBShipment, shipments)
+
+        used, movements = [], []
+        for purchase in purchases:
+            movements.append(StockMovement(date=purchase.date, reason='purchase', location=home,
+                                           material_id=purchase.material_id, delta=purchase.quantity,
+                                           purchase=purchase))
+        for production in productions:
+            for material_id, qty in recipes[production.product_id].items():
+                quantity = qty * production.produced_qty
+                used.append(ProductionMaterial(production=production, material_id=material_id, quantity_used=quantity))
+                movements.append(StockMovement(date=production.date, reason='consumption', location=home,
+                                               material_id=material_id, delta=-quantity, production=production))
+            movements.append(StockMovement(date=production.date, reason='production', location=home,
+                                           product_id=production.product_id, delta=production.produced_qty,
+                                           production=production))
+        for shipment in shipments:
+            movements += [
+                StockMovement(date=shipment.date, reason='shipment_out', location_id=shipment.from_location_id,
+                              product_id=shipment.product_id, delta=-shipment.quantity, shipment=shipment),
+                StockMovement(date=shipment.date, reason='shipment_in', location_id=shipment.to_location_id,
+                              product_id=shipment.product_id, delta=shipment.quantity, shipment=shipment),
+            ]
+        create(ProductionMaterial, used)
+        create(StockMovement, movements)
+
+        create(MaterialStock, [
+            MaterialStock(material_id=material_id, location_id=location_id, quantity=quantity)
+            for (material_id, location_id), quantity in material_stock.items()
+        ])
+        create(ProductStock, [
+            ProductStock(product_id=product_id, location_id=location_id, quantity=quantity)
+            for (product_id, location_id), quantity in product_stock.items()
+        ])
+        Material.objects.bulk_update(
+            [Material(id=material_id, avg_cost=price, cost_qty=material_stock[(material_id, home.id)])
+             for material_id, price in prices.items()],
+            ['avg_cost', 'cost_qty'], batch_size=BATCH_SIZE,
+        )
+        Product.objects.bulk_update(product_list, ['unit_cost'], batch_size=BATCH_SIZE)
+
+        create(PlannedShipment, [
+            PlannedShipment(date=end + timedelta(days=rng.randint(0, 55)), product=rng.choice(product_list),
+                            quantity=rng.randint(5, 100))
+            for _ in range(products)
+        ])
+        rollups.rebuild()
+        thresholds.sync_all()
+        stock_changed()
+    bom.invalidate()
+
+    return {model.__name__: model.objects.count() for model in reversed(SEEDED_MODELS)}
@@ -0,0 +1,94 @@
+import csv
+import tempfile
+
+from ..models import MaterialPurchase, MaterialStock, Production, ProductStock, WBShipment
+
+# Сколько строк тянем из БД за один fetch при выгрузке
+CHUNK_SIZE = 2000
+
+# Выгрузки: slug → (название, модель, [(заголовок, поле для values_list)])
+EXPORTS = {
+    'material-stocks': ('Остатки материалов', MaterialStock, [
+        ('Материал', 'material__name'),
+        ('Ед.', 'material__unit'),
+        ('Локация', 'location__name'),
+        ('Количество', 'quantity'),
+    ]),
+    'product-stocks': ('Остатки продукции', ProductStock, [
+        ('Продукт', 'product__name'),
+        ('Артикул WB', 'product__wb_article'),
+        ('Локация', 'location__name'),
+        ('Количество', 'quantity'),
+    ]),
+    'purchases': ('Закупки', MaterialPurchase, [
+        ('Дата', 'date'),
+        ('Материал', 'material__name'),
+        ('Количество', 'quantity'),
+        ('Цена', 'unit_price'),
+        ('Сумма', 'total_amount'),
+        ('Поставщик', 'supplier'),
+    ]),
+    'production': ('Производство', Production, [
+        ('Дата', 'date'),
+        ('Продукт', 'product__name'),
+        ('Локация', 'location__name'),
+        ('Выпущено', 'produced_qty'),
+        ('Себестоимость 1 шт', 'unit_cost'),
+    ]),
+    'shipments': ('Отгрузки', WBShipment, [
+        ('Дата', 'date'),
+        ('Номер поставки', 'wb_shipment_number'),
+        ('Продукт', 'product__name'),
+        ('Откуда', 'from_location__name'),
+        ('Куда', 'to_location__name'),
+        ('Количество', 'quantity'),
+        ('Комментарий', 'comment'),
+    ]),
+}
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write() просто возвращает строку"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(name):
+    """⚡ Кортежи строк выгрузки курсором БД: в памяти не больше CHUNK_SIZE строк"""
+    _, model, columns = EXPORTS[name]
+    return (
+        model.objects.order_by('pk')
+        .values_list(*[field for _, field in columns])
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def iter_csv(name):
+    """Строки CSV по одной — для StreamingHttpResponse"""
+    _, _, columns = EXPORTS[name]
+    writer = csv.writer(_Echo(), delimiter=';')
+    # BOM, чтобы Excel открыл UTF-8 с кириллицей
+    yield '\ufeff' + writer.writerow([header for header, _ in columns])
+    for row in export_rows(name):
+        yield writer.writerow(row)
+
+
+def write_xlsx(name):
+    """XLSX в режиме write-only во временный файл (строки не копятся в памяти).
+
+    Возвращает открытый файл, позиционированный на начало; нужен openpyxl.
+    """
+    from openpyxl import Workbook
+
+    title, _, columns = EXPORTS[name]
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append([header for header, _ in columns])
+    for row in export_rows(name):
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,113 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncWeek
+
+from ..models import Material, Product, WBShipment
+from . import thresholds
+from .capacity import bom_matrix
+from .summary import stock_changed
+
+BATCH_SIZE = 500
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def weekly_series(weeks, today=None):
+    """Недельные отгрузки на WB за последние weeks полных недель: (product_ids, матрица продукты × недели)"""
+    today = today or date.today()
+    current_week = today - timedelta(days=today.weekday())
+    first_week = current_week - timedelta(weeks=weeks)
+
+    rows = (
+        WBShipment.objects.filter(date__gte=first_week, date__lt=current_week)
+        .annotate(week=TruncWeek('date')).values('product_id', 'week').annotate(quantity=Sum('quantity'))
+    )
+    rows = list(rows.values_list('product_id', 'week', 'quantity'))
+    product_ids = sorted({product_id for product_id, _, _ in rows})
+    index = {product_id: row for row, product_id in enumerate(product_ids)}
+
+    series = np.zeros((len(product_ids), weeks))
+    for product_id, week, quantity in rows:
+        week = week.date() if hasattr(week, 'date') else week
+        series[index[product_id], (week - first_week).days // 7] += float(quantity)
+    return product_ids, series
+
+
+def smooth(series, alpha):
+    """⚡ Простое экспоненциальное сглаживание сразу всех рядов (строки матрицы).
+
+    Цикл идёт по неделям, а не по рядам: каждая итерация — векторная
+    операция над всеми товарами. Возвращает (прогноз на неделю,
+    СКО ошибки прогноза на один шаг).
+    """
+    if series.shape[1] == 0:
+        return np.zeros(len(series)), np.zeros(len(series))
+    level = series[:, 0].copy()
+    squared_error = np.zeros(len(series))
+    for week in range(1, series.shape[1]):
+        error = series[:, week] - level
+        squared_error += error ** 2
+        level += alpha * error
+    sigma = np.sqrt(squared_error / max(series.shape[1] - 1, 1))
+    return level, sigma
+
+
+def reorder_levels(forecast, sigma, lead_days, z):
+    """Страховой запас и точка заказа на срок пополнения lead_days (скаляр или вектор)"""
+    lead_weeks = np.asarray(lead_days, dtype=float) / 7
+    safety = z * sigma * np.sqrt(lead_weeks)
+    return safety, forecast * lead_weeks + safety
+
+
+def material_series(product_ids, series):
+    """Расход материалов по неделям: отгрузки продуктов, развёрнутые по рецептурам"""
+    products, material_ids, starts, columns, quantities = bom_matrix(product_ids)
+    row = {product_id: index for index, product_id in enumerate(product_ids)}
+    materials = np.zeros((len(material_ids), series.shape[1]))
+    if len(columns):
+        counts = np.diff(np.append(starts, len(columns)))
+        product_rows = np.array([row[product_id] for product_id in products], dtype=np.intp)
+        np.add.at(materials, columns, series[np.repeat(product_rows, counts)] * quantities[:, None])
+    return material_ids, materials
+
+
+def _store(model, ids, forecast, safety, reorder):
+    objects = [
+        model(id=item_id, forecast_weekly=round(float(f), 3), safety_stock=round(float(s), 3),
+              reorder_point=round(float(r), 3))
+        for item_id, f, s, r in zip(ids, forecast, safety, reorder)
+    ]
+    # Позиции без истории возвращаются к общим порогам
+    model.objects.exclude(forecast_weekly=None).update(forecast_weekly=None, safety_stock=None, reorder_point=None)
+    model.objects.bulk_update(objects, ['forecast_weekly', 'safety_stock', 'reorder_point'], batch_size=BATCH_SIZE)
+
+
+def run_forecast(today=None):
+    """⚡ Пересчитать прогноз и пороги пополнения для всех продуктов и материалов одним проходом"""
+    alpha = _setting('FORECAST_ALPHA', 0.3)
+    z = _setting('FORECAST_SERVICE_Z', 1.65)
+
+    product_ids, series = weekly_series(_setting('FORECAST_HISTORY_WEEKS', 26), today)
+    forecast, sigma = smooth(series, alpha)
+    safety, reorder = reorder_levels(forecast, sigma, _setting('FORECAST_PRODUCT_LEAD_DAYS', 7), z)
+
+    material_ids, usage = material_series(product_ids, series)
+    material_forecast, material_sigma = smooth(usage, alpha)
+    lead_days = dict(Material.objects.filter(id__in=material_ids).values_list('id', 'lead_time_days'))
+    material_safety, material_reorder = reorder_levels(
+        material_forecast, material_sigma, [lead_days[material_id] for material_id in material_ids], z
+    )
+
+    with transaction.atomic():
+        _store(Product, product_ids, forecast, safety, reorder)
+        _store(Material, material_ids, material_forecast, material_safety, material_reorder)
+        # Пороги поменялись — переписываем их в строки остатков, сводка по критичным позициям устарела
+        thresholds.sync_all()
+        stock_changed()
+    return len(product_ids), len(material_ids)
@@ -0,0 +1,59 @@
+from django.db.models import Case, F, Func, Q, Subquery, Value, When
+from django.db.models.lookups import Exact
+
+# Сколько строк обновляем одним UPDATE
+BATCH_SIZE = 300
+
+
+def add(model, keys, rows, floor=None):
+    """⚡ Прибавляет {ключ: {поле: delta}} к строкам model; ключ — значения полей keys.
+
+    Обычно строки уже есть, и пачка — один UPDATE ... CASE по точным ключам.
+    Если обновилось меньше строк, чем ключей, недостающие создаются одним
+    INSERT OR IGNORE сразу с приращениями как начальными значениями (уже
+    обновлённые строки конфликтуют и пропускаются). Между этими запросами
+    строку никто не вставит: SQLite держит блокировку записи с первого UPDATE.
+
+    floor — поле, которое не должно уйти в минус: пачка обновляется целиком,
+    только если у всех её строк поле + delta >= 0 (проверка — подзапросом в том же
+    UPDATE), недостающие строки не создаются, а на первой неудачной пачке add
+    останавливается. Возвращает ключи пачек, где каких-то строк не было
+    (или не хватило floor).
+    """
+    items = list(rows.items())
+    missed = []
+
+    for start in range(0, len(items), BATCH_SIZE):
+        chunk = items[start:start + BATCH_SIZE]
+
+        updates = {}
+        for field in sorted({field for _, deltas in chunk for field in deltas}):
+            output_field = model._meta.get_field(field)
+            whens = [
+                When(**dict(zip(keys, key)), then=F(field) + Value(deltas[field], output_field=output_field))
+                for key, deltas in chunk if field in deltas
+            ]
+            updates[field] = Case(*whens, default=F(field), output_field=output_field)
+
+        match = Q()
+        for key, _ in chunk:
+            match |= Q(**dict(zip(keys, key)))
+        rows_to_update = model.objects.filter(match)
+        if floor is not None:
+            enough = Q()
+            for key, deltas in chunk:
+                enough |= Q(**dict(zip(keys, key)), **{f'{floor}__gte': -deltas[floor]})
+            passed = model.objects.filter(enough).values(count=Func(F('pk'), function='COUNT'))
+            rows_to_update = rows_to_update.filter(Exact(Subquery(passed), len(chunk)))
+
+        if rows_to_update.update(**updates) == len(chunk):
+            continue
+        missed.extend(key for key, _ in chunk)
+        if floor is not None:
+            break
+        model.objects.bulk_create(
+            [model(**dict(zip(keys, key)), **deltas) for key, deltas in chunk],
+            ignore_conflicts=True,
+        )
+
+    return missed
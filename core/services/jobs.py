@@ -0,0 +1,68 @@
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..models import WBJob
+from .wb_api import WildberriesAPI
+from .wb_health import key_hash, set_health
+from .wb_sync import sync_cards
+
+
+def _ping(job):
+    api_key = job.token.api_key
+    result = WildberriesAPI.for_token(job.token).test_connection()
+    set_health(api_key, result)
+    job.payload['key_hash'] = key_hash(api_key)  # каким ключом реально проверяли
+    return result
+
+
+def _sync_cards(job):
+    return {'synced': sync_cards(job.token, full=job.payload.get('full', False))}
+
+
+HANDLERS = {
+    'ping': _ping,
+    'sync_cards': _sync_cards,
+}
+
+
+def enqueue(token, kind, payload=None):
+    """Поставить задачу в очередь (повторно не ставим, если такая же уже ждёт)"""
+    job = WBJob.objects.filter(token=token, kind=kind, status__in=('queued', 'running')).first()
+    if job is None:
+        job = WBJob.objects.create(token=token, kind=kind, payload=payload or {})
+    return job
+
+
+def claim_next():
+    """Атомарно забрать самую старую задачу из очереди (или None)"""
+    while True:
+        job_id = WBJob.objects.filter(status='queued').order_by('created_at', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        # Условный UPDATE: задачу получит только один из параллельных воркеров
+        if WBJob.objects.filter(id=job_id, status='queued').update(status='running', started_at=timezone.now()):
+            return WBJob.objects.select_related('token').get(id=job_id)
+
+
+def run_job(job):
+    """Выполнить задачу в текущем потоке и сохранить результат"""
+    try:
+        job.result = HANDLERS[job.kind](job)
+        job.status = 'done'
+    except Exception:
+        job.status = 'failed'
+        job.error = traceback.format_exc(limit=5)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'payload', 'result', 'error', 'finished_at'])
+    close_old_connections()
+    return job
+
+
+def requeue_stale(after):
+    """Вернуть в очередь задачи, зависшие в running (упал воркер)"""
+    return WBJob.objects.filter(
+        status='running', started_at__lt=timezone.now() - timedelta(seconds=after)
+    ).update(status='queued', started_at=None)
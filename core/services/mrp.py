@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import Sum
+
+from ..models import Material, MaterialStock, PlannedShipment, ProductStock, PurchaseOrder
+from .capacity import bom_matrix
+
+DEFAULT_WEEKS = 8
+
+
+def week_starts(weeks, today=None):
+    """Понедельники недель горизонта планирования, начиная с текущей"""
+    today = today or date.today()
+    monday = today - timedelta(days=today.weekday())
+    return [monday + timedelta(weeks=week) for week in range(weeks)]
+
+
+def _bucket(day, first_week, weeks):
+    """Номер недели горизонта; просроченное попадает в текущую неделю"""
+    return min(max((day - first_week).days // 7, 0), weeks - 1)
+
+
+def _net(gross, available):
+    """⚡ Нетто-потребность по неделям для всех позиций сразу.
+
+    gross — матрица позиции × недели, available — запас на начало по позициям
+    (или матрица поступлений, где первая неделя включает остаток).
+    Возвращает матрицу докупки/допроизводства по неделям.
+    """
+    supply = np.cumsum(available, axis=1) if available.ndim == 2 else available[:, None]
+    # Накопленный дефицит не убывает: докупленное на прошлой неделе не возвращается
+    shortage = np.maximum(np.cumsum(gross, axis=1) - supply, 0)
+    shortage = np.maximum.accumulate(shortage, axis=1)
+    return np.diff(shortage, axis=1, prepend=0)
+
+
+def plan(weeks=DEFAULT_WEEKS, today=None):
+    """⚡ План закупок материалов (MRP) под план отгрузок на WB.
+
+    1. Отгрузки по неделям (продукты × недели) неттируются с остатком
+       готовой продукции на складах (кроме складов WB).
+    2. Остаток потребности разворачивается по рецептурам в материалы
+       (строки рецептур × недели, np.add.at).
+    3. Потребность в материалах неттируется с остатками и открытыми
+       заказами поставщикам, доставка которых ожидается в горизонте.
+    Всё считается матрицами по всему каталогу без цикла по продуктам.
+    """
+    today = today or date.today()
+    starts = week_starts(weeks, today)
+    horizon_end = starts[-1] + timedelta(days=6)
+
+    shipments = PlannedShipment.objects.filter(date__range=(starts[0], horizon_end), quantity__gt=0)
+    demand_rows = list(shipments.values('product_id', 'date').annotate(quantity=Sum('quantity')))
+    product_ids = sorted({row['product_id'] for row in demand_rows})
+
+    products, material_ids, bom_starts, columns, quantities = bom_matrix(product_ids)
+    product_row = {product_id: index for index, product_id in enumerate(products)}
+    demand = np.zeros((len(products), weeks))
+    for row in demand_rows:
+        if row['product_id'] in product_row:
+            demand[product_row[row['product_id']], _bucket(row['date'], starts[0], weeks)] += float(row['quantity'])
+
+    on_hand = np.zeros(len(products))
+    finished = ProductStock.objects.filter(product_id__in=products, quantity__gt=0).exclude(location__type='wb')
+    for product_id, quantity in finished.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'):
+        on_hand[product_row[product_id]] = quantity
+    to_produce = _net(demand, on_hand)
+
+    # Потребность в материалах: каждая строка рецептуры × план выпуска её продукта
+    gross = np.zeros((len(material_ids), weeks))
+    if len(columns):
+        counts = np.diff(np.append(bom_starts, len(columns)))
+        product_of_line = np.repeat(np.arange(len(products)), counts)
+        np.add.at(gross, columns, to_produce[product_of_line] * quantities[:, None])
+
+    material_row = {material_id: index for index, material_id in enumerate(material_ids)}
+    materials_on_hand = np.zeros(len(material_ids))
+    stock = MaterialStock.objects.filter(material_id__in=material_ids, quantity__gt=0)
+    for material_id, quantity in stock.values('material_id').annotate(total=Sum('quantity')).values_list('material_id', 'total'):
+        materials_on_hand[material_row[material_id]] = quantity
+    supply = np.zeros((len(material_ids), weeks))
+    supply[:, 0] = materials_on_hand
+    orders = PurchaseOrder.objects.filter(material_id__in=material_ids, received=False, expected_date__lte=horizon_end)
+    open_orders = np.zeros(len(material_ids))
+    for material_id, expected, quantity in orders.values_list('material_id', 'expected_date', 'quantity'):
+        supply[material_row[material_id], _bucket(expected, starts[0], weeks)] += float(quantity)
+        open_orders[material_row[material_id]] += float(quantity)
+    to_buy = _net(gross, supply)
+
+    materials = Material.objects.in_bulk(material_ids)
+    rows = []
+    for index in np.flatnonzero(to_buy.sum(axis=1) > 1e-9):
+        material = materials[material_ids[index]]
+        lines = []
+        for week in np.flatnonzero(to_buy[index] > 1e-9):
+            lines.append({
+                'need_by': max(starts[week], today),
+                'order_by': max(starts[week] - timedelta(days=material.lead_time_days), today),
+                'late': starts[week] - timedelta(days=material.lead_time_days) < today,
+                'quantity': round(float(to_buy[index, week]), 3),
+            })
+        rows.append({
+            'material_id': material.id,
+            'material': material.name,
+            'unit': material.unit,
+            'required': round(float(gross[index].sum()), 3),
+            'on_hand': round(float(materials_on_hand[index]), 3),
+            'open_orders': round(float(open_orders[index]), 3),
+            'shortfall': round(float(to_buy[index].sum()), 3),
+            'orders': lines,
+        })
+    rows.sort(key=lambda row: (row['orders'][0]['order_by'], row['material']))
+
+    return {
+        'weeks': starts,
+        'products': len(products),
+        'materials': rows,
+    }
@@ -0,0 +1,52 @@
+import base64
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+
+def encode_cursor(value, pk):
+    # Decimal (количества) кодируется строкой, QuantityField принимает её обратно в фильтре
+    raw = json.dumps([value, pk], ensure_ascii=False, cls=DjangoJSONEncoder).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Курсор → (значение, id); битый курсор = первая страница"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, order, cursor=None, size=50):
+    """⚡ Keyset-пагинация по (поле сортировки, id).
+
+    order — поле сортировки, например 'material__name' или '-quantity'.
+    Возвращает (строки страницы, курсор следующей страницы или None).
+    В отличие от OFFSET, стоимость страницы не растёт с её номером.
+    """
+    descending = order.startswith('-')
+    field = order.lstrip('-')
+    queryset = queryset.annotate(sort_key=F(field))
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        value, pk = position
+        if descending:
+            queryset = queryset.filter(Q(sort_key__lt=value) | Q(sort_key=value, id__lt=pk))
+        else:
+            queryset = queryset.filter(Q(sort_key__gt=value) | Q(sort_key=value, id__gt=pk))
+
+    ordering = ('-sort_key', '-id') if descending else ('sort_key', 'id')
+    rows = list(queryset.order_by(*ordering)[:size + 1])
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1].sort_key, rows[-1].id)
+    return rows, next_cursor
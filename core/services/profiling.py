@@ -0,0 +1,120 @@
+import json
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+
+# Границы корзин гистограммы времени ответа, мс
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+_NUMBERS = re.compile(r'\b\d+\b')
+_IN_LISTS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+_samples = defaultdict(deque)
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize(sql):
+    """Шаблон запроса: числа и списки IN (...) схлопываются, чтобы N+1 был виден как повтор"""
+    return _IN_LISTS.sub('(...)', _NUMBERS.sub('?', sql))
+
+
+class QueryRecorder:
+    """execute_wrapper: время и текст каждого SQL-запроса одного HTTP-запроса"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), (time.perf_counter() - started) * 1000))
+
+    def sample(self, view, method, status, wall_ms):
+        """Итог запроса: время, SQL, дубли (тот же SQL с теми же параметрами) и самые медленные запросы"""
+        exact = Counter((sql, params) for sql, params, _ in self.queries)
+        similar = Counter(normalize(sql) for sql, _, _ in self.queries)
+        template, repeats = similar.most_common(1)[0] if similar else ('', 0)
+        slowest = sorted(self.queries, key=lambda query: query[2], reverse=True)[:_setting('PROFILING_SLOW_QUERIES', 5)]
+        return {
+            'view': view,
+            'method': method,
+            'status': status,
+            'at': time.time(),
+            'wall_ms': round(wall_ms, 2),
+            'queries': len(self.queries),
+            'sql_ms': round(sum(duration for _, _, duration in self.queries), 2),
+            'duplicates': sum(count - 1 for count in exact.values()),
+            'top_repeat': {'sql': template, 'count': repeats} if repeats > 1 else None,
+            'slowest': [{'sql': normalize(sql), 'ms': round(duration, 2)} for sql, _, duration in slowest],
+        }
+
+
+def record(sample):
+    """Добавить замер в скользящее окно представления (и в файл, если задан PROFILING_LOG_FILE)"""
+    window = _setting('PROFILING_WINDOW', 500)
+    with _lock:
+        samples = _samples[sample['view']]
+        samples.append(sample)
+        while len(samples) > window:
+            samples.popleft()
+
+    log_file = _setting('PROFILING_LOG_FILE', None)
+    if log_file:
+        with _lock, open(log_file, 'a', encoding='utf-8') as output:
+            output.write(json.dumps(sample, ensure_ascii=False) + '\n')
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+def _percentile(values, share):
+    return values[min(int(round(share * (len(values) - 1))), len(values) - 1)]
+
+
+def _histogram(values):
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for value in values:
+        counts[next((index for index, bound in enumerate(BUCKETS_MS) if value <= bound), len(BUCKETS_MS))] += 1
+    labels = [f'≤{bound}' for bound in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+    return dict(zip(labels, counts))
+
+
+def stats():
+    """Сводка по представлениям за скользящее окно: перцентили, гистограмма, SQL, дубли, медленные запросы"""
+    with _lock:
+        snapshot = {view: list(samples) for view, samples in _samples.items()}
+
+    result = []
+    for view, samples in snapshot.items():
+        wall = sorted(sample['wall_ms'] for sample in samples)
+        queries = [sample['queries'] for sample in samples]
+        slowest = sorted(
+            (query for sample in samples for query in sample['slowest']), key=lambda query: query['ms'], reverse=True
+        )
+        repeats = [sample['top_repeat'] for sample in samples if sample['top_repeat']]
+        result.append({
+            'view': view,
+            'requests': len(samples),
+            'p50_ms': _percentile(wall, 0.5),
+            'p95_ms': _percentile(wall, 0.95),
+            'max_ms': wall[-1],
+            'histogram': _histogram(wall),
+            'queries_avg': round(sum(queries) / len(queries), 1),
+            'queries_max': max(queries),
+            'sql_ms_avg': round(sum(sample['sql_ms'] for sample in samples) / len(samples), 2),
+            'duplicates_max': max(sample['duplicates'] for sample in samples),
+            'top_repeat': max(repeats, key=lambda repeat: repeat['count']) if repeats else None,
+            'slowest': slowest[:_setting('PROFILING_SLOW_QUERIES', 5)],
+        })
+    return sorted(result, key=lambda row: row['p95_ms'], reverse=True)
@@ -0,0 +1,148 @@
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from ..fields import MAX_QUANTITY, to_quantity
+from ..models import Material, MaterialPurchase
+from .stock import create_purchases, home_location
+
+# Допустимые заголовки колонок накладной → поле закупки
+COLUMNS = {
+    'date': 'date', 'дата': 'date',
+    'material': 'material', 'материал': 'material',
+    'quantity': 'quantity', 'количество': 'quantity', 'кол-во': 'quantity',
+    'unit_price': 'unit_price', 'цена': 'unit_price',
+    'supplier': 'supplier', 'поставщик': 'supplier',
+}
+REQUIRED = ('date', 'material', 'quantity', 'unit_price')
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d.%m.%y')
+
+# Больше ошибок не показываем — накладную всё равно нужно исправлять целиком
+MAX_ERRORS = 200
+
+
+class PurchaseImportError(Exception):
+    """Накладная не прошла проверку; errors — [(номер строки, текст)]"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} ошибок в накладной')
+        self.errors = errors
+
+
+def _date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'дата «{value}» не распознана')
+
+
+def _limit(field):
+    """Граница (не включительно) значений DecimalField по max_digits / decimal_places"""
+    return Decimal(10) ** (field.max_digits - field.decimal_places)
+
+
+def _number(value, name, limit):
+    try:
+        number = Decimal(value.replace(' ', '').replace('\xa0', '').replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f'{name} «{value}» — не число')
+    if not number.is_finite() or number < 0:
+        raise ValueError(f'{name} «{value}» должно быть неотрицательным числом')
+    if number >= limit:
+        raise ValueError(f'{name} «{value}» — слишком большое число (должно быть меньше {limit:f})')
+    return number
+
+
+def decode(data):
+    """Байты файла → текст: UTF-8 или cp1251 (так сохраняет CSV русский Excel)"""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('cp1251')
+
+
+def read_rows(text):
+    """Строки CSV как словари по полям из COLUMNS (разделитель ; или , определяется сам)"""
+    text = text.lstrip('\ufeff')
+    # Разделитель — по строке заголовков: в данных бывают запятые в дробных числах
+    first_line = text.split('\n', 1)[0]
+    delimiter = max(';,\t', key=first_line.count)
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+    header = next(reader, None) or []
+    fields = [COLUMNS.get(name.strip().lower()) for name in header]
+    missing = [name for name in REQUIRED if name not in fields]
+    if missing:
+        raise PurchaseImportError([(1, f'нет колонок: {", ".join(missing)}')])
+    for line, values in enumerate(reader, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        yield line, {field: value.strip() for field, value in zip(fields, values) if field}
+
+
+def parse_purchases(text):
+    """⚡ Разбор и проверка накладной целиком.
+
+    Материалы ищутся по названию (без учёта регистра) в карте, собранной
+    одним запросом; название, под которым несколько материалов, — ошибка
+    строки, а не выбор наугад. Возвращает несохранённые MaterialPurchase или бросает
+    PurchaseImportError со всеми ошибками по строкам.
+    """
+    materials = defaultdict(list)
+    for pk, name in Material.objects.values_list('id', 'name'):
+        materials[name.strip().lower()].append(pk)
+    supplier_length = MaterialPurchase._meta.get_field('supplier').max_length
+    price_limit = _limit(MaterialPurchase._meta.get_field('unit_price'))
+    total_limit = _limit(MaterialPurchase._meta.get_field('total_amount'))
+
+    purchases = []
+    errors = []
+    for line, row in read_rows(text):
+        try:
+            material_ids = materials.get(row.get('material', '').lower(), [])
+            if not material_ids:
+                raise ValueError(f'материал «{row.get("material", "")}» не найден')
+            if len(material_ids) > 1:
+                raise ValueError(f'материал «{row.get("material", "")}» неоднозначен: '
+                                 f'с таким названием несколько материалов ({len(material_ids)})')
+            material_id, = material_ids
+            quantity = to_quantity(_number(row.get('quantity', ''), 'количество', MAX_QUANTITY))
+            if quantity <= 0:
+                raise ValueError(f'количество «{row.get("quantity", "")}» должно быть больше нуля')
+            unit_price = _number(row.get('unit_price', ''), 'цена', price_limit).quantize(Decimal('0.01'))
+            total_amount = (quantity * unit_price).quantize(Decimal('0.01'))
+            if total_amount >= total_limit:
+                raise ValueError(f'сумма строки {total_amount:f} — слишком большая (должна быть меньше {total_limit:f})')
+            supplier = row.get('supplier', '')
+            if len(supplier) > supplier_length:
+                raise ValueError(f'поставщик длиннее {supplier_length} символов')
+            purchases.append(MaterialPurchase(
+                date=_date(row.get('date', '')),
+                material_id=material_id,
+                quantity=quantity,
+                unit_price=unit_price,
+                total_amount=total_amount,
+                supplier=supplier,
+            ))
+        except ValueError as error:
+            errors.append((line, str(error)))
+        except ArithmeticError:
+            # Переполнение Decimal, которое не отсекли границы выше
+            errors.append((line, 'число вне допустимого диапазона'))
+        if len(errors) >= MAX_ERRORS:
+            break
+
+    if errors:
+        raise PurchaseImportError(errors)
+    if not purchases:
+        raise PurchaseImportError([(1, 'в накладной нет строк')])
+    return purchases
+
+
+def import_purchases(text):
+    """Проверить накладную и провести все закупки на склад «Дом» одной транзакцией"""
+    purchases = parse_purchases(text)
+    return create_purchases(purchases, home_location())
@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.db.models.lookups import GreaterThanOrEqual
+
+from ..models import WBRateBucket
+
+# Лимиты WB по категориям API: запросов в минуту и размер пачки (burst)
+DEFAULT_LIMITS = {
+    'content': {'per_minute': 100, 'burst': 5},
+    'prices': {'per_minute': 100, 'burst': 5},
+    'statistics': {'per_minute': 1, 'burst': 1},
+}
+
+
+class RateLimiter:
+    """⚡ Token bucket на каждый (WBToken, категория API), общий для всех процессов.
+
+    Состояние корзины лежит в БД, списание — один условный UPDATE
+    (пополнение считается прямо в SQL), поэтому параллельные воркеры
+    не превышают лимит WB и не требуют внешнего сервиса.
+    """
+
+    def __init__(self, token, limits=None):
+        self.token = token
+        self.limits = {**DEFAULT_LIMITS, **getattr(settings, 'WB_RATE_LIMITS', {}), **(limits or {})}
+
+    def _budget(self, category):
+        limit = self.limits.get(category, self.limits['content'])
+        return limit['per_minute'] / 60.0, float(limit['burst'])
+
+    def try_acquire(self, category):
+        """Взять один запрос без ожидания. Возвращает секунды до следующей попытки (0 — успех)"""
+        rate, burst = self._budget(category)
+        now = time.time()
+
+        WBRateBucket.objects.bulk_create(
+            [WBRateBucket(token=self.token, category=category, tokens=burst, updated_at=now)],
+            ignore_conflicts=True,
+        )
+        available = Least(Value(burst), F('tokens') + (Value(now) - F('updated_at')) * Value(rate))
+        taken = WBRateBucket.objects.filter(
+            GreaterThanOrEqual(available, Value(1.0)), token=self.token, category=category,
+        ).update(tokens=available - Value(1.0), updated_at=Value(now))
+        if taken:
+            return 0.0
+
+        bucket = WBRateBucket.objects.filter(token=self.token, category=category).values('tokens', 'updated_at').first()
+        current = min(burst, bucket['tokens'] + (now - bucket['updated_at']) * rate) if bucket else 0.0
+        return max((1.0 - current) / rate, 0.01)
+
+    def acquire(self, category, block=True, timeout=None):
+        """Взять один запрос; block=False или истёкший timeout → False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(category)
+            if not wait:
+                return True
+            if not block:
+                return False
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                wait = min(wait, left)
+            time.sleep(wait)
@@ -0,0 +1,101 @@
+import calendar
+from datetime import date, datetime
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from ..models import DailyMaterialRollup, DailyProductRollup, Material
+from .summary import stock_summary
+
+REPORT_TYPES = [
+    ('overview', 'Обзор'),
+    ('purchases', 'Закупки'),
+    ('production', 'Производство'),
+    ('shipments', 'Отгрузки'),
+    ('stocks', 'Остатки'),
+    ('financial', 'Финансы'),
+]
+
+PERIODS = [('month', 'Месяц'), ('year', 'Год')]
+
+
+def parse_anchor(value):
+    """'2026-03-15', '2026-03' или '2026' → date (или None)"""
+    for fmt in ('%Y-%m-%d', '%Y-%m', '%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def period_bounds(period, anchor=None):
+    """(начало, конец, подпись) месяца или года, в который попадает anchor"""
+    anchor = anchor or date.today()
+    if period == 'year':
+        return date(anchor.year, 1, 1), date(anchor.year, 12, 31), str(anchor.year)
+    last_day = calendar.monthrange(anchor.year, anchor.month)[1]
+    return date(anchor.year, anchor.month, 1), date(anchor.year, anchor.month, last_day), anchor.strftime('%m.%Y')
+
+
+def _by_month(queryset, **sums):
+    return list(
+        queryset.annotate(month=TruncMonth('day')).values('month').annotate(**sums).order_by('month')
+    )
+
+
+def build_report(report_type, date_from, date_to, location_id=None):
+    """⚡ Данные отчёта из дневных итогов (сотни строк вместо всех документов)"""
+    materials = DailyMaterialRollup.objects.filter(day__range=(date_from, date_to))
+    products = DailyProductRollup.objects.filter(day__range=(date_from, date_to))
+    if location_id:
+        materials = materials.filter(location_id=location_id)
+        products = products.filter(location_id=location_id)
+
+    if report_type == 'overview':
+        totals = materials.aggregate(purchased=Sum('purchased'), consumed=Sum('consumed'), spend=Sum('spend'))
+        totals.update(products.aggregate(produced=Sum('produced'), shipped=Sum('shipped_out')))
+        return {'totals': {key: value or 0 for key, value in totals.items()}}
+
+    if report_type == 'purchases':
+        return {
+            'rows': materials.filter(purchased__gt=0).values('material__name', 'material__unit')
+            .annotate(purchased=Sum('purchased'), spend=Sum('spend')).order_by('-spend'),
+            'by_month': _by_month(materials, purchased=Sum('purchased'), spend=Sum('spend')),
+        }
+
+    if report_type == 'production':
+        return {
+            'rows': products.filter(produced__gt=0).values('product__name')
+            .annotate(produced=Sum('produced')).order_by('-produced'),
+            'consumption': materials.filter(consumed__gt=0).values('material__name', 'material__unit')
+            .annotate(consumed=Sum('consumed')).order_by('-consumed'),
+        }
+
+    if report_type == 'shipments':
+        return {
+            'rows': products.filter(shipped_in__gt=0).values('product__name', 'location__name')
+            .annotate(shipped=Sum('shipped_in')).order_by('location__name', '-shipped'),
+            'by_month': _by_month(products, shipped=Sum('shipped_out')),
+        }
+
+    if report_type == 'stocks':
+        return {'summary': stock_summary(location_id)}
+
+    if report_type == 'financial':
+        by_month = _by_month(materials, spend=Sum('spend'))
+        cost_by_month = {row['month']: row['cost'] for row in _by_month(products, cost=Sum('produced_cost'))}
+        for row in by_month:
+            row['cost'] = cost_by_month.pop(row['month'], 0)
+        by_month += [{'month': month, 'spend': 0, 'cost': cost} for month, cost in cost_by_month.items()]
+        by_month.sort(key=lambda row: row['month'])
+        return {
+            'by_month': by_month,
+            'total_spend': sum(row['spend'] or 0 for row in by_month),
+            'total_cost': sum(row['cost'] or 0 for row in by_month),
+            'products': products.filter(produced__gt=0).values('product__name', 'product__unit_cost')
+            .annotate(produced=Sum('produced'), cost=Sum('produced_cost')).order_by('-cost'),
+            'materials': Material.objects.filter(avg_cost__gt=0).order_by('name'),
+        }
+
+    return {}
@@ -0,0 +1,80 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+
+from . import increments
+from ..models import (
+    DailyMaterialRollup, DailyProductRollup, Location, MaterialPurchase, Production,
+    ProductionMaterial, WBShipment
+)
+
+BATCH_SIZE = 300
+
+
+def production_cost(unit_cost, produced_qty):
+    """Себестоимость выпуска по документу, до копеек.
+
+    Дневной итог — сумма уже округлённых документов: так проводка по одному
+    документу, пачкой за смену и rebuild() дают одно и то же число.
+    """
+    return (unit_cost * produced_qty).quantize(Decimal('0.01'))
+
+
+def add(model, item_field, rows):
+    """⚡ Прибавляет {(day, item_id, location_id): {поле: delta}} к дневным итогам.
+
+    Как и для остатков (services/increments.py): строка за день уже есть — один
+    UPDATE ... CASE на пачку, первая проводка дня добавляет INSERT OR IGNORE.
+    """
+    increments.add(model, ('day', f'{item_field}_id', 'location_id'), rows)
+
+
+def rebuild():
+    """Пересчитать дневные итоги с нуля по закупкам, производству и отгрузкам"""
+    materials = defaultdict(dict)
+    products = defaultdict(dict)
+
+    # Закупки всегда приходят на склад «Дом» (см. purchase_create)
+    home = Location.objects.filter(name='Дом').first()
+    if home is not None:
+        purchases = MaterialPurchase.objects.values('date', 'material_id').annotate(
+            quantity=Sum('quantity'), amount=Sum('total_amount')
+        )
+        for row in purchases:
+            materials[(row['date'], row['material_id'], home.id)].update(
+                purchased=row['quantity'], spend=row['amount'] or Decimal(0)
+            )
+
+    used = ProductionMaterial.objects.values(
+        'production__date', 'material_id', 'production__location_id'
+    ).annotate(quantity=Sum('quantity_used'))
+    for row in used:
+        key = (row['production__date'], row['material_id'], row['production__location_id'])
+        materials[key]['consumed'] = row['quantity']
+
+    # Себестоимость округляется по каждому документу (как при проводке), поэтому — в Python
+    produced = Production.objects.values_list('date', 'product_id', 'location_id', 'produced_qty', 'unit_cost')
+    for day, product_id, location_id, quantity, unit_cost in produced.iterator(chunk_size=BATCH_SIZE * 10):
+        row = products[(day, product_id, location_id)]
+        row['produced'] = row.get('produced', Decimal(0)) + quantity
+        row['produced_cost'] = row.get('produced_cost', Decimal(0)) + production_cost(unit_cost, quantity)
+
+    for location_field, field in (('from_location_id', 'shipped_out'), ('to_location_id', 'shipped_in')):
+        shipped = WBShipment.objects.values('date', 'product_id', location_field).annotate(quantity=Sum('quantity'))
+        for row in shipped:
+            products[(row['date'], row['product_id'], row[location_field])][field] = row['quantity']
+
+    with transaction.atomic():
+        DailyMaterialRollup.objects.all().delete()
+        DailyProductRollup.objects.all().delete()
+        DailyMaterialRollup.objects.bulk_create([
+            DailyMaterialRollup(day=day, material_id=item_id, location_id=location_id, **fields)
+            for (day, item_id, location_id), fields in materials.items()
+        ], batch_size=BATCH_SIZE)
+        DailyProductRollup.objects.bulk_create([
+            DailyProductRollup(day=day, product_id=item_id, location_id=location_id, **fields)
+            for (day, item_id, location_id), fields in products.items()
+        ], batch_size=BATCH_SIZE)
+    return len(materials), len(products)
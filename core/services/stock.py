@@ -0,0 +1,225 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+
+from . import costing, increments, rollups, thresholds
+from .bom import explode_many
+from .summary import stock_changed
+from ..fields import to_quantity
+from ..models import (
+    DailyMaterialRollup, DailyProductRollup, Location, MaterialPurchase, MaterialStock, ProductStock, Production,
+    ProductionMaterial, StockMovement
+)
+
+# Сколько пар (позиция, локация) обновляем одним UPDATE
+BATCH_SIZE = 300
+
+
+class InsufficientStock(Exception):
+    """Недостаточно остатка для списания"""
+
+
+def _apply_deltas(model, item_field, deltas, require=False):
+    """⚡ Применяет {(item_id, location_id): delta} к остаткам (services/increments.py).
+
+    Изменения применяются одним UPDATE ... CASE на стороне БД — без чтения
+    остатков в Python и без потерянных обновлений; недостающие строки
+    создаются одним INSERT OR IGNORE. Приращения — целые тысячные
+    (QuantityField), поэтому сумма точная. Пороги (critical_level / low_level)
+    переписываются только новым строкам: у существующих их держат в актуальном
+    виде сигналы позиций и прогноз.
+
+    require — списание без ухода в минус: строка меняется, только если остатка
+    хватает. Если хоть одной позиции не хватает — InsufficientStock, и вся
+    транзакция откатывается (журнал движений всегда совпадает с остатками).
+    """
+    item_key = f'{item_field}_id'
+    rows = {key: {'quantity': delta} for key, delta in deltas.items()}
+    missed = increments.add(model, (item_key, 'location_id'), rows, floor='quantity' if require else None)
+    if missed and require:
+        raise InsufficientStock(_short_item(model, item_field, {key: deltas[key] for key in missed}))
+    if missed:
+        thresholds.sync(item_field, item_ids={item_id for item_id, _ in missed})
+    if deltas:
+        stock_changed()
+
+
+def _short_item(model, item_field, deltas):
+    """Первая позиция, которой не хватает на списание: её пачка не изменена, остатки читаются как есть"""
+    item_key = f'{item_field}_id'
+    rows = model.objects.filter(**{
+        f'{item_key}__in': {item_id for item_id, _ in deltas},
+        'location_id__in': {location_id for _, location_id in deltas},
+    }).values_list(item_key, 'location_id', 'quantity')
+    available = {(item_id, location_id): quantity for item_id, location_id, quantity in rows}
+    for (item_id, location_id), delta in deltas.items():
+        if available.get((item_id, location_id), 0) + delta < 0:
+            return item_id
+    return None
+
+
+def record_adjustment(stock, delta, day=None):
+    """Ручная правка строки остатка (админка) — движение «корректировка» на разницу delta"""
+    delta = to_quantity(delta)
+    if not delta:
+        return None
+    item_field = 'material' if isinstance(stock, MaterialStock) else 'product'
+    movement = StockMovement.objects.create(
+        date=day or date.today(), reason='adjustment', location_id=stock.location_id, delta=delta,
+        **{f'{item_field}_id': getattr(stock, f'{item_field}_id')},
+    )
+    stock_changed()
+    return movement
+
+
+def home_location():
+    """Склад «Дом», куда приходят закупки"""
+    location, _ = Location.objects.get_or_create(name='Дом', defaults={'type': 'home'})
+    return location
+
+
+def post_purchase(purchase, location):
+    """Поступление закупки на склад"""
+    post_purchases([purchase], location)
+
+
+def post_purchases(purchases, location):
+    """⚡ Проводит пачку уже сохранённых закупок на один склад.
+
+    Приход, дневные итоги и средние цены агрегируются по материалу в памяти
+    и применяются одним набором запросов, сколько бы строк ни было в накладной.
+    """
+    deltas = defaultdict(Decimal)
+    totals = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    bought = defaultdict(lambda: defaultdict(Decimal))
+    movements = []
+    for purchase in purchases:
+        quantity = to_quantity(purchase.quantity)
+        amount = Decimal(str(purchase.total_amount))
+        deltas[(purchase.material_id, location.id)] += quantity
+        totals[purchase.material_id][0] += quantity
+        totals[purchase.material_id][1] += amount
+        day = bought[(purchase.date, purchase.material_id, location.id)]
+        day['purchased'] += quantity
+        day['spend'] += amount
+        movements.append(StockMovement(
+            date=purchase.date, reason='purchase', location=location,
+            material_id=purchase.material_id, delta=quantity, purchase=purchase,
+        ))
+
+    with transaction.atomic(savepoint=False):
+        _apply_deltas(MaterialStock, 'material', deltas)
+        StockMovement.objects.bulk_create(movements, batch_size=BATCH_SIZE)
+        rollups.add(DailyMaterialRollup, 'material', bought)
+        costing.record_purchases({material_id: tuple(total) for material_id, total in totals.items()})
+
+
+def create_purchases(purchases, location):
+    """Сохраняет и проводит закупки (например, из накладной) одной транзакцией"""
+    with transaction.atomic():
+        MaterialPurchase.objects.bulk_create(purchases, batch_size=BATCH_SIZE)
+        post_purchases(purchases, location)
+    return purchases
+
+
+def post_production(production):
+    """Списание материалов по рецептуре и поступление готовой продукции"""
+    post_productions([production])
+
+
+def post_productions(productions):
+    """⚡ Проводит пачку производств одним набором запросов.
+
+    Рецептуры берутся из кэша развёрнутых BOM (с полуфабрикатами), расход агрегируется
+    в памяти по (материал, локация) и применяется одним UPDATE.
+    Если какого-то материала не хватает на весь расход по рецептуре —
+    InsufficientStock, ничего не проводится. Себестоимость выпуска
+    фиксируется по текущим средневзвешенным ценам материалов: несохранённые
+    производства сохраняются здесь же сразу с ней, уже сохранённым она
+    дописывается одним UPDATE.
+    """
+    bom = explode_many({production.product_id for production in productions})
+    unit_costs = costing.unit_costs(bom)
+
+    material_deltas = defaultdict(Decimal)
+    product_deltas = defaultdict(Decimal)
+    used = defaultdict(Decimal)
+    consumed = defaultdict(lambda: defaultdict(Decimal))
+    produced = defaultdict(lambda: defaultdict(Decimal))
+    used_rows = []
+    movements = []
+    for production in productions:
+        produced_qty = to_quantity(production.produced_qty)
+        for material_id, qty_per_unit in bom[production.product_id].items():
+            # Расход округляется до тысячной один раз: остаток, журнал и итоги получают одно число
+            qty = to_quantity(qty_per_unit * produced_qty)
+            material_deltas[(material_id, production.location_id)] -= qty
+            used[material_id] += qty
+            consumed[(production.date, material_id, production.location_id)]['consumed'] += qty
+            used_rows.append(ProductionMaterial(production=production, material_id=material_id, quantity_used=qty))
+            movements.append(StockMovement(
+                date=production.date, reason='consumption', location_id=production.location_id,
+                material_id=material_id, delta=-qty, production=production,
+            ))
+        production.unit_cost = unit_costs[production.product_id]
+        product_deltas[(production.product_id, production.location_id)] += produced_qty
+        day_key = (production.date, production.product_id, production.location_id)
+        produced[day_key]['produced'] += produced_qty
+        produced[day_key]['produced_cost'] += rollups.production_cost(production.unit_cost, produced_qty)
+        movements.append(StockMovement(
+            date=production.date, reason='production', location_id=production.location_id,
+            product_id=production.product_id, delta=produced_qty, production=production,
+        ))
+
+    with transaction.atomic(savepoint=False):
+        _apply_deltas(MaterialStock, 'material', material_deltas, require=True)
+        _apply_deltas(ProductStock, 'product', product_deltas)
+        saved = [production for production in productions if not production._state.adding]
+        if saved:
+            Production.objects.bulk_update(saved, ['unit_cost'], batch_size=BATCH_SIZE)
+        Production.objects.bulk_create(
+            [production for production in productions if production._state.adding], batch_size=BATCH_SIZE,
+        )
+        ProductionMaterial.objects.bulk_create(used_rows, batch_size=BATCH_SIZE)
+        StockMovement.objects.bulk_create(movements, batch_size=BATCH_SIZE)
+        costing.store_product_costs(unit_costs)
+        costing.record_consumption(used)
+        rollups.add(DailyMaterialRollup, 'material', consumed)
+        rollups.add(DailyProductRollup, 'product', produced)
+
+
+def create_productions(productions):
+    """Сохраняет и проводит производства за смену одной транзакцией"""
+    with transaction.atomic():
+        post_productions(productions)
+    return productions
+
+
+def post_shipment(shipment):
+    """Перемещение готовой продукции «откуда» → «куда».
+
+    Списание — условный UPDATE (quantity >= отгружаемого), поэтому два
+    параллельных кладовщика не смогут отгрузить один и тот же остаток.
+    """
+    quantity = to_quantity(shipment.quantity)
+    with transaction.atomic(savepoint=False):
+        _apply_deltas(ProductStock, 'product', {(shipment.product_id, shipment.from_location_id): -quantity},
+                      require=True)
+        _apply_deltas(ProductStock, 'product', {(shipment.product_id, shipment.to_location_id): quantity})
+
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                date=shipment.date, reason='shipment_out', location_id=shipment.from_location_id,
+                product_id=shipment.product_id, delta=-quantity, shipment=shipment,
+            ),
+            StockMovement(
+                date=shipment.date, reason='shipment_in', location_id=shipment.to_location_id,
+                product_id=shipment.product_id, delta=quantity, shipment=shipment,
+            ),
+        ])
+        rollups.add(DailyProductRollup, 'product', {
+            (shipment.date, shipment.product_id, shipment.from_location_id): {'shipped_out': quantity},
+            (shipment.date, shipment.product_id, shipment.to_location_id): {'shipped_in': quantity},
+        })
@@ -0,0 +1,126 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Q, Sum, Value, When
+
+from .thresholds import STOCKS
+from ..models import STOCK_ATTENTION_Q, STOCK_CRITICAL_Q, MaterialStock, ProductStock
+
+VERSION_KEY = 'stock:version'
+
+STATUSES = [('critical', 'Критично'), ('low', 'Мало'), ('ok', 'OK')]
+
+# Пороги — в самой строке остатка (critical_level / low_level, см. services/thresholds.py),
+# поэтому статус считается без JOIN, а «критично» и «критично или мало» — это ровно
+# условия частичных индексов остатков: такие выборки читают только проблемные строки
+CRITICAL_Q = STOCK_CRITICAL_Q
+ATTENTION_Q = STOCK_ATTENTION_Q
+
+
+def _check_kind(kind):
+    if kind not in STOCKS:
+        raise ValueError(f'Неизвестный вид остатков: {kind!r}')
+
+
+def stock_status_q(kind, status):
+    """Фильтр остатков kind ('material' / 'product') по статусу из STATUSES"""
+    _check_kind(kind)
+    return {
+        'critical': CRITICAL_Q,
+        'low': ATTENTION_Q & ~CRITICAL_Q,
+        'ok': ~ATTENTION_Q,
+    }.get(status, Q())
+
+
+def stock_status(kind):
+    """Аннотация статуса остатка kind ('critical' / 'low' / 'ok')"""
+    _check_kind(kind)
+    return Case(
+        When(CRITICAL_Q, then=Value('critical')),
+        When(ATTENTION_Q, then=Value('low')),
+        default=Value('ok'),
+        output_field=CharField(),
+    )
+
+
+def stock_version():
+    """Текущая «версия остатков» — меняется при любом движении.
+
+    Хранится в общем кэше (settings.CACHES), поэтому сброс после проводки
+    в одном процессе видят все воркеры.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Случайная версия, чтобы после вытеснения ключа не попасть в старые записи
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_stock_version():
+    # Новая случайная версия, а не incr: incr файлового кэша — чтение и запись без блокировки,
+    # два параллельных сброса дали бы одно и то же число, и сводка без второго изменения
+    # жила бы до таймаута. Каждый сброс записывает своё значение
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def stock_changed():
+    """Остатки изменились — сбросить сводку после коммита транзакции"""
+    transaction.on_commit(bump_stock_version)
+
+
+def _totals(queryset, key, condition=None):
+    if condition is not None:
+        queryset = queryset.filter(condition)
+    return queryset.annotate(key=Value(key)).values('key').annotate(total=Sum('quantity'), positions=Count('id'))
+
+
+def summarize(materials, products):
+    """Итоги по произвольным выборкам остатков (без кэша).
+
+    Один UNION ALL: итог и число позиций по каждой таблице, а число
+    «критично» / «критично или мало» — отдельными ветками с условиями
+    частичных индексов, т. е. по нескольким проблемным строкам, а не по всей таблице.
+    """
+    parts = []
+    for kind, queryset in (('materials', materials), ('products', products)):
+        parts += [
+            _totals(queryset, f'total_{kind}'),
+            _totals(queryset, f'critical_{kind}', CRITICAL_Q),
+            _totals(queryset, f'low_{kind}', ATTENTION_Q),
+        ]
+
+    summary = {f'{field}_{kind}': 0 for field in ('total', 'positions', 'critical', 'low')
+               for kind in ('materials', 'products')}
+    for row in parts[0].union(*parts[1:], all=True):
+        field, kind = row['key'].split('_')
+        if field == 'total':
+            summary[f'total_{kind}'] = row['total'] or 0
+            summary[f'positions_{kind}'] = row['positions']
+        else:
+            summary[f'{field}_{kind}'] = row['positions']
+    return summary
+
+
+def _compute(location_id=None):
+    materials = MaterialStock.objects.all()
+    products = ProductStock.objects.all()
+    if location_id:
+        materials = materials.filter(location_id=location_id)
+        products = products.filter(location_id=location_id)
+    return summarize(materials, products)
+
+
+def stock_summary(location_id=None):
+    """⚡ Итоги по остаткам: total_*, positions_*, critical_*, low_* для materials/products.
+
+    Считается одним запросом и кэшируется до следующего движения остатков.
+    """
+    key = f"stock:summary:{stock_version()}:{location_id or 'all'}"
+    summary = cache.get(key)
+    if summary is None:
+        summary = _compute(location_id)
+        cache.set(key, summary, getattr(settings, 'STOCK_SUMMARY_CACHE_TIMEOUT', 300))
+    return summary
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from ..models import Material, MaterialStock, Product, ProductStock
+
+# Пороги по умолчанию — для позиций без своих порогов и без прогноза
+# (переопределяются settings.STOCK_THRESHOLDS). Обе границы не включаются: критично — остаток < critical
+# (закончившийся — критичен всегда), мало — остаток < low
+DEFAULTS = {
+    'material': {'critical': 0, 'low': 10},
+    'product': {'critical': 5, 'low': 20},
+}
+
+STOCKS = {'material': (MaterialStock, Material), 'product': (ProductStock, Product)}
+
+
+def defaults(kind):
+    return {**DEFAULTS[kind], **getattr(settings, 'STOCK_THRESHOLDS', {}).get(kind, {})}
+
+
+def levels(kind):
+    """{'critical_level': ..., 'low_level': ...} для UPDATE строк остатков kind ('material' / 'product').
+
+    Порог позиции, заданный вручную, важнее рассчитанного прогнозом
+    (safety_stock / reorder_point), прогноз — важнее общего по умолчанию.
+    """
+    stock_model, item_model = STOCKS[kind]
+    quantity_field = stock_model._meta.get_field('quantity')
+    item = item_model.objects.filter(id=OuterRef(f'{kind}_id'))
+    default = defaults(kind)
+
+    def level(manual, forecast, fallback):
+        return Subquery(item.values(level=Coalesce(
+            manual, forecast, Value(fallback, output_field=quantity_field), output_field=quantity_field,
+        )))
+
+    return {
+        'critical_level': level('critical_level', 'safety_stock', default['critical']),
+        'low_level': level('low_level', 'reorder_point', default['low']),
+    }
+
+
+def sync(kind, item_ids=None, stock_ids=None):
+    """Переписать пороги строк остатков из позиций (все строки или только указанных позиций/строк)"""
+    stock_model, _ = STOCKS[kind]
+    rows = stock_model.objects.all()
+    if item_ids is not None:
+        rows = rows.filter(**{f'{kind}_id__in': item_ids})
+    if stock_ids is not None:
+        rows = rows.filter(id__in=stock_ids)
+    return rows.update(**levels(kind))
+
+
+def sync_all():
+    """Пороги всех строк остатков: после прогноза, генерации данных и т. п."""
+    return sync('material'), sync('product')
@@ -1,18 +1,123 @@
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Базовые адреса API (переопределяются WB_API_BASE_URLS, например на локальную заглушку)
+BASE_URLS = {
+    'content': 'https://content-api.wildberries.ru',
+    'prices': 'https://discounts-prices-api.wildberries.ru',
+    'statistics': 'https://statistics-api.wildberries.ru',
+}
+
+# Ответы, которые повторяются на уровне клиента — каждый повтор снова берёт токен у RateLimiter
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Сессия на поток: keep-alive пул соединений вместо нового TLS на каждый запрос.
+# requests.Session не потокобезопасна, поэтому у потоков (в т. ч. пула asyncio.to_thread) — свои
+_local = threading.local()
+
+
+def _build_session():
+    # Транспорт повторяет только сбои соединения; 429/5xx повторяет WildberriesAPI._send
+    # через лимитер, иначе повторы шли бы мимо общего бюджета запросов
+    retries = getattr(settings, 'WB_API_RETRIES', 3)
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=0,
+        backoff_factor=getattr(settings, 'WB_API_BACKOFF', 0.5),
+        allowed_methods=frozenset({'GET', 'POST'}),
+        raise_on_status=False,
+    )
+    pool_size = getattr(settings, 'WB_API_POOL_SIZE', 10)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Accept': 'application/json'})
+    return session
+
+
+def get_session():
+    """requests.Session текущего потока (пересоздаётся после fork)"""
+    session = getattr(_local, 'session', None)
+    if session is None or _local.pid != os.getpid():
+        session = _local.session = _build_session()
+        _local.pid = os.getpid()
+    return session
 
 
 class WildberriesAPI:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, session=None, timeout=None, base_urls=None, limiter=None):
         self.api_key = api_key
+        self.limiter = limiter
+        self._session = session
+        # (connect, read) в секундах
+        self.timeout = timeout or getattr(settings, 'WB_API_TIMEOUT', (5, 20))
+        self.base_urls = {**BASE_URLS, **getattr(settings, 'WB_API_BASE_URLS', {}), **(base_urls or {})}
+        self.retries = getattr(settings, 'WB_API_RETRIES', 3)
+        self.backoff = getattr(settings, 'WB_API_BACKOFF', 0.5)
+
+    @property
+    def session(self):
+        """Переданная сессия или сессия потока, из которого идёт вызов"""
+        return self._session or get_session()
+
+    @classmethod
+    def for_token(cls, token, **kwargs):
+        """Клиент для WBToken с общим для всех процессов лимитом запросов"""
+        from .rate_limit import RateLimiter
+
+        return cls(token.api_key, limiter=RateLimiter(token), **kwargs)
+
+    def _throttle(self, category):
+        if self.limiter is not None:
+            self.limiter.acquire(category)
+
+    def _retry_delay(self, response, attempt):
+        """Пауза перед повтором: Retry-After (секунды или HTTP-дата), иначе экспоненциальная"""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                try:
+                    return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+                except (TypeError, ValueError):
+                    pass
+        return self.backoff * 2 ** attempt
+
+    def _send(self, method, category, url, **kwargs):
+        """Запрос с повторами 429/5xx; перед каждой попыткой — токен у лимитера"""
+        for attempt in range(self.retries + 1):
+            self._throttle(category)
+            r = self.session.request(
+                method, url, headers={'Authorization': self.api_key}, timeout=self.timeout, **kwargs
+            )
+            if r.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return r
+            time.sleep(self._retry_delay(r, attempt))
+
+    def _request(self, method, category, path, **kwargs):
+        r = self._send(method, category, self.base_urls[category] + path, **kwargs)
+        r.raise_for_status()
+        return r.json()
 
     def test_connection(self):
         """✅ /ping тест"""
         if not self.api_key:
             return {'ok': False, 'text': 'Нужен токен'}
-        url = "https://content-api.wildberries.ru/ping"
-        headers = {'Authorization': self.api_key}
+        url = self.base_urls['content'] + "/ping"
         try:
-            r = requests.get(url, headers=headers, timeout=15)
+            r = self._send('GET', 'content', url)
             return {
                 'status_code': r.status_code,
                 'text': r.text,
@@ -22,26 +127,39 @@ class WildberriesAPI:
             return {'error': str(e)}
 
     def get_my_products(self, limit=20):
-        """🔍 WB карточки товаров — НОВЫЙ endpoint"""
+        """🔍 Первые limit карточек товаров (Content API v2, тот же запрос, что и синхронизация)"""
         if not self.api_key:
             return []
+        cards, _ = self.get_cards_page(limit=limit)
+        return cards
 
-        # ✅ Актуальный Content API 2026
-        url = "https://content-api.wildberries.ru/public/api/v1/getCards"
-        headers = {'Authorization': self.api_key}
-
-        try:
-            print(f"🛒 CARDS API: {url}")
-            r = requests.post(url, headers=headers, timeout=20)
-            print(f"🛒 STATUS: {r.status_code}")
-            print(f"🛒 RESPONSE: {r.text[:300]}")
+    def get_cards_page(self, cursor=None, limit=100):
+        """Страница карточек Content API v2 по курсору.
 
-            if r.status_code == 200:
-                data = r.json()
-                print(f"✅ КАРТОЧКИ: {len(data)}")
-                return self.format_cards(data[:limit])
+        cursor — {'updatedAt': ..., 'nmID': ...} из предыдущего ответа.
+        Возвращает (карточки, курсор следующей страницы или None).
+        """
+        body = {
+            'settings': {
+                'sort': {'ascending': True},
+                'cursor': {'limit': limit, **(cursor or {})},
+                'filter': {'withPhoto': -1},
+            }
+        }
+        data = self._request('POST', 'content', '/content/v2/get/cards/list', json=body)
+        cards = data.get('cards') or []
+        page_cursor = data.get('cursor') or {}
+        if len(cards) < limit or not page_cursor.get('nmID'):
+            return cards, None
+        return cards, {'updatedAt': page_cursor['updatedAt'], 'nmID': page_cursor['nmID']}
 
-        except Exception as e:
-            print(f"❌ {e}")
+    def get_prices_page(self, offset=0, limit=1000):
+        """Страница цен и скидок (offset-пагинация)"""
+        data = self._request(
+            'GET', 'prices', '/api/v2/list/goods/filter', params={'limit': limit, 'offset': offset}
+        )
+        return (data.get('data') or {}).get('listGoods') or []
 
-        return self.get_demo_products(limit)  # fallback
+    def get_stocks(self, date_from='2019-06-20'):
+        """Остатки на складах WB (Statistics API)"""
+        return self._request('GET', 'statistics', '/api/v1/supplier/stocks', params={'dateFrom': date_from})
@@ -0,0 +1,81 @@
+import asyncio
+
+from .wb_api import WildberriesAPI
+
+
+class AsyncWildberriesAPI:
+    """⚡ Асинхронная обёртка над WildberriesAPI.
+
+    HTTP-вызовы выполняются в пуле потоков, у каждого потока своя keep-alive
+    сессия (requests.Session не потокобезопасна); одновременных запросов
+    не больше concurrency. Независимые разделы (карточки, цены, остатки)
+    выкачиваются параллельно.
+    """
+
+    def __init__(self, api_key, concurrency=4, **kwargs):
+        self.api = WildberriesAPI(api_key, **kwargs)
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def _call(self, func, *args, **kwargs):
+        async with self.semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def iter_cards(self, cursor=None, limit=100):
+        """Все карточки по курсору Content API (страницы идут строго по очереди)"""
+        while True:
+            cards, cursor = await self._call(self.api.get_cards_page, cursor, limit)
+            for card in cards:
+                yield card
+            if cursor is None:
+                return
+
+    async def iter_prices(self, limit=1000):
+        """Все цены: страницы по offset запрашиваются пачками по concurrency штук"""
+        offset = 0
+        while True:
+            offsets = [offset + i * limit for i in range(self.concurrency)]
+            pages = await asyncio.gather(*(self._call(self.api.get_prices_page, o, limit) for o in offsets))
+            for page in pages:
+                for item in page:
+                    yield item
+                if len(page) < limit:
+                    return
+            offset = offsets[-1] + limit
+
+    async def iter_stocks(self, date_from='2019-06-20'):
+        for item in await self._call(self.api.get_stocks, date_from):
+            yield item
+
+    async def iter_catalog(self, cards_cursor=None):
+        """Карточки, цены и остатки параллельно: yield (раздел, запись) по мере поступления"""
+        queue = asyncio.Queue(maxsize=1000)
+        done = object()
+
+        async def pump(kind, source):
+            try:
+                async for item in source:
+                    await queue.put((kind, item))
+            finally:
+                await queue.put(done)
+
+        sources = {
+            'card': self.iter_cards(cards_cursor),
+            'price': self.iter_prices(),
+            'stock': self.iter_stocks(),
+        }
+        tasks = [asyncio.create_task(pump(kind, source)) for kind, source in sources.items()]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await queue.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+            # Пробрасываем ошибку упавшего раздела
+            for task in tasks:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,30 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def key_hash(api_key):
+    """Хэш токена — сам ключ в кэш и в задачи не кладём"""
+    return hashlib.sha256((api_key or '').encode()).hexdigest()
+
+
+def _cache_key(api_key):
+    return f'wb:health:{key_hash(api_key)}'
+
+
+def health_ttl():
+    return getattr(settings, 'WB_HEALTH_TTL', 300)
+
+
+def get_health(api_key):
+    """Закэшированный результат /ping для токена или None"""
+    return cache.get(_cache_key(api_key))
+
+
+def set_health(api_key, result, timeout=None):
+    cache.set(_cache_key(api_key), result, health_ttl() if timeout is None else timeout)
+
+
+def invalidate_health(api_key):
+    cache.delete(_cache_key(api_key))
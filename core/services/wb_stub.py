@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .wb_api import WildberriesAPI
+from .wb_async import AsyncWildberriesAPI
+
+
+class StubWB:
+    """Локальная заглушка WB API (карточки, цены, остатки, /ping) для тестов и бенчмарков.
+
+    Отвечает в форматах Content / Prices / Statistics API с задержкой latency
+    на запрос, считает запросы и наибольшее число одновременных.
+    Используется как контекстный менеджер; base_urls — для WildberriesAPI(base_urls=...).
+    """
+
+    def __init__(self, cards=250, prices=2500, stocks=100, latency=0.0):
+        self.cards = [
+            {'nmID': 100000 + i, 'vendorCode': f'ART-{i}', 'title': f'Товар {i}',
+             'updatedAt': f'2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z'}
+            for i in range(cards)
+        ]
+        self.prices = [{'nmID': 100000 + i, 'sizes': [{'price': 1000 + i}]} for i in range(prices)]
+        self.stocks = [{'nmId': 100000 + i, 'warehouseName': 'Коледино', 'quantity': i % 50} for i in range(stocks)]
+        self.latency = latency
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_urls(self):
+        url = 'http://%s:%s' % self._server.server_address[:2]
+        return {'content': url, 'prices': url, 'statistics': url}
+
+    def _cards_page(self, body):
+        cursor = body.get('settings', {}).get('cursor', {})
+        after = cursor.get('nmID')
+        cards = [card for card in self.cards if after is None or card['nmID'] > after][:cursor.get('limit', 100)]
+        last = cards[-1] if cards else {}
+        return {'cards': cards, 'cursor': {'updatedAt': last.get('updatedAt'), 'nmID': last.get('nmID'),
+                                           'total': len(cards)}}
+
+    def _respond(self, method, url, body):
+        """(статус, JSON) на запрос к заглушке"""
+        path = urlparse(url).path
+        query = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        if path == '/ping':
+            return 200, {'TS': time.time(), 'Status': 'OK'}
+        if method == 'POST' and path == '/content/v2/get/cards/list':
+            return 200, self._cards_page(body)
+        if path == '/api/v2/list/goods/filter':
+            offset, limit = int(query.get('offset', 0)), int(query.get('limit', 1000))
+            return 200, {'data': {'listGoods': self.prices[offset:offset + limit]}}
+        if path == '/api/v1/supplier/stocks':
+            return 200, self.stocks
+        return 404, {'error': 'not found'}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, как у настоящего API
+
+            def _handle(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                with stub._lock:
+                    stub.requests += 1
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+                try:
+                    time.sleep(stub.latency)
+                    status, payload = stub._respond(method, self.path, body)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def fetch_sequential(api, cards_limit=100, prices_limit=1000):
+    """Каталог синхронным клиентом, запрос за запросом: {раздел: число записей}"""
+    counts = {'card': 0, 'price': 0, 'stock': 0}
+    cursor = None
+    while True:
+        cards, cursor = api.get_cards_page(cursor, cards_limit)
+        counts['card'] += len(cards)
+        if cursor is None:
+            break
+    offset = 0
+    while True:
+        page = api.get_prices_page(offset, prices_limit)
+        counts['price'] += len(page)
+        if len(page) < prices_limit:
+            break
+        offset += prices_limit
+    counts['stock'] = len(api.get_stocks())
+    return counts
+
+
+async def fetch_async(api):
+    """Каталог асинхронным клиентом (разделы и страницы цен параллельно): {раздел: число записей}"""
+    counts = {'card': 0, 'price': 0, 'stock': 0}
+    async for kind, _ in api.iter_catalog():
+        counts[kind] += 1
+    return counts
+
+
+def benchmark_clients(cards=1000, prices=20000, stocks=500, latency=0.05, concurrency=4):
+    """⚡ Выкачать один и тот же каталог с заглушки синхронно и асинхронно: [{client, seconds, requests, ...}]"""
+    import asyncio
+
+    results = []
+    with StubWB(cards=cards, prices=prices, stocks=stocks, latency=latency) as stub:
+        runs = [
+            ('sync', lambda: fetch_sequential(WildberriesAPI('stub', base_urls=stub.base_urls))),
+            (f'async x{concurrency}', lambda: asyncio.run(fetch_async(
+                AsyncWildberriesAPI('stub', concurrency=concurrency, base_urls=stub.base_urls)))),
+        ]
+        for name, run in runs:
+            stub.requests = stub.max_in_flight = 0
+            started = time.perf_counter()
+            counts = run()
+            results.append({
+                'client': name,
+                'seconds': round(time.perf_counter() - started, 3),
+                'requests': stub.requests,
+                'max_in_flight': stub.max_in_flight,
+                **counts,
+            })
+    return results
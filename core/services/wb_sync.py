@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Product, WBSyncState
+from .wb_api import WildberriesAPI
+
+NAME_LENGTH = Product._meta.get_field('name').max_length
+
+
+def _upsert_products(cards):
+    """Карточки WB → Product (сопоставление по wb_article = nmID) пачкой"""
+    names = {}
+    for card in cards:
+        article = str(card['nmID'])
+        names[article] = (card.get('title') or card.get('vendorCode') or article)[:NAME_LENGTH]
+
+    existing = {}
+    for product in Product.objects.filter(wb_article__in=names).order_by('id'):
+        existing.setdefault(product.wb_article, product)
+
+    changed = []
+    for article, product in existing.items():
+        if product.name != names[article]:
+            product.name = names[article]
+            changed.append(product)
+
+    Product.objects.bulk_update(changed, ['name'], batch_size=500)
+    Product.objects.bulk_create(
+        [Product(name=name, wb_article=article) for article, name in names.items() if article not in existing],
+        batch_size=500,
+    )
+
+
+def sync_cards(token, full=False, limit=100, api=None):
+    """⚡ Инкрементальная синхронизация карточек WB с контрольной точкой.
+
+    Запрашиваются только карточки, изменённые после сохранённого курсора
+    (updatedAt, nmID). Курсор сохраняется после каждой страницы, поэтому
+    прерванная синхронизация продолжается с места остановки.
+    Возвращает число обработанных карточек.
+    """
+    api = api or WildberriesAPI.for_token(token)
+    state, _ = WBSyncState.objects.get_or_create(token=token)
+    cursor = None if full else state.cursor
+    synced = 0
+
+    while True:
+        cards, next_cursor = api.get_cards_page(cursor, limit)
+        if cards:
+            last = cards[-1]
+            with transaction.atomic():
+                _upsert_products(cards)
+                state.cursor_updated_at = last.get('updatedAt') or ''
+                state.cursor_nm_id = last['nmID']
+                state.cards_synced += len(cards)
+                state.save(update_fields=['cursor_updated_at', 'cursor_nm_id', 'cards_synced'])
+            synced += len(cards)
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+
+    state.last_synced_at = timezone.now()
+    state.save(update_fields=['last_synced_at'])
+    return synced
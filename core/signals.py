@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Material, MaterialStock, Product, ProductBOM, ProductComponent, ProductStock, WBToken
+from .services import bom, thresholds
+from .services.summary import stock_changed
+from .services.wb_health import invalidate_health
+
+
+@receiver(pre_save, sender=ProductComponent)
+def reject_bom_cycle(sender, instance, **kwargs):
+    """Цикл в рецептуре не сохраняется и мимо формы (ORM, фикстуры), а не ломает проводки позже"""
+    if bom.creates_cycle(instance.product_id, instance.component_id):
+        raise bom.BOMCycleError(instance.product_id)
+
+
+@receiver([post_save, post_delete], sender=ProductBOM)
+@receiver([post_save, post_delete], sender=ProductComponent)
+def invalidate_bom_cache(sender, **kwargs):
+    """Рецептура изменилась — сбрасываем развёрнутые BOM (и ещё раз после коммита)"""
+    bom.invalidate()
+    transaction.on_commit(bom.invalidate)
+
+
+@receiver([post_save, post_delete], sender=MaterialStock)
+@receiver([post_save, post_delete], sender=ProductStock)
+def invalidate_stock_summary(sender, **kwargs):
+    """Правка остатка вручную (админка) — сбрасываем закэшированную сводку"""
+    stock_changed()
+
+
+@receiver(post_save, sender=MaterialStock)
+@receiver(post_save, sender=ProductStock)
+def fill_stock_thresholds(sender, instance, created, **kwargs):
+    """Новая строка остатка (админка) получает пороги своей позиции"""
+    if created:
+        thresholds.sync('material' if sender is MaterialStock else 'product', stock_ids=[instance.id])
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Product)
+def sync_item_thresholds(sender, instance, update_fields=None, **kwargs):
+    """Пороги позиции изменены — переписываем их в её строки остатков"""
+    fields = {'critical_level', 'low_level', 'safety_stock', 'reorder_point'}
+    if update_fields is None or fields & set(update_fields):
+        thresholds.sync('material' if sender is Material else 'product', item_ids=[instance.id])
+        stock_changed()
+
+
+@receiver(post_save, sender=WBToken)
+def invalidate_token_health(sender, instance, **kwargs):
+    """Токен сохранён — следующая проверка должна пройти заново"""
+    invalidate_health(instance.api_key)
@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты со своим файловым кэшем во временном каталоге.
+
+    Общий кэш приложения (settings.CACHES) тесты не трогают. Каталог передаётся
+    через WB_CACHE_DIR, поэтому его видят и подпроцессы тестов (как другой воркер).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='wb-test-cache-')
+        os.environ['WB_CACHE_DIR'] = self.cache_dir
+        self.cache_settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+            }
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        os.environ.pop('WB_CACHE_DIR', None)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
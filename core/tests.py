@@ -1,3 +1,1313 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from decimal import Decimal
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.db.models import F
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    DailyMaterialRollup, DailyProductRollup, Location, Material, MaterialPurchase, MaterialStock, PlannedShipment,
+    Product, ProductBOM, ProductComponent, ProductionMaterial, ProductStock, Production, PurchaseOrder, StockMovement,
+    StockSnapshot, WBJob, WBShipment, WBSyncState, WBToken
+)
+from .services import (
+    bom, forecast, jobs, mrp, profiling, rate_limit, snapshots, summary, wb_api, wb_async, wb_health, wb_sync
+)
+from .services.capacity import capacity_table
+from .services.pagination import keyset_page
+from .services.purchase_import import PurchaseImportError, parse_purchases
+from .services.stock import (
+    InsufficientStock, create_productions, create_purchases, post_production, post_purchase, post_shipment
+)
+from .services.wb_stub import StubWB, fetch_sequential
+
+# Данных достаточно, чтобы N+1 (запрос на строку/продукт/материал) выбил бюджет
+MATERIALS = 30
+PRODUCTS = 20
+BOM_LINES = 4
+
+
+class QueryBudgetTests(TestCase):
+    """Бюджет SQL-запросов на представление: не растёт вместе с объёмом данных"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget', 'budget@example.com', 'pass')
+        cls.home = Location.objects.create(name='Дом', type='home')
+        cls.wb = Location.objects.create(name='WB Коледино', type='wb')
+        cls.materials = Material.objects.bulk_create([
+            Material(name=f'Материал {i}', unit='шт', type='raw') for i in range(MATERIALS)
+        ])
+        cls.products = Product.objects.bulk_create([
+            Product(name=f'Продукт {i}', wb_article=str(1000 + i)) for i in range(PRODUCTS)
+        ])
+        ProductBOM.objects.bulk_create([
+            ProductBOM(product=product, material=cls.materials[(i + j) % MATERIALS], qty_per_unit=1 + j)
+            for i, product in enumerate(cls.products) for j in range(BOM_LINES)
+        ])
+        # Дома материалов хватает на производство в тестах, на WB есть и нулевые остатки
+        MaterialStock.objects.bulk_create([
+            MaterialStock(material=material, location=location, quantity=100 * (i % 3) + (50 if location == cls.home else 0))
+            for i, material in enumerate(cls.materials) for location in (cls.home, cls.wb)
+        ])
+        ProductStock.objects.bulk_create([
+            ProductStock(product=product, location=location, quantity=10 * i)
+            for i, product in enumerate(cls.products) for location in (cls.home, cls.wb)
+        ])
+        MaterialPurchase.objects.bulk_create([
+            MaterialPurchase(date=date(2026, 1, 1 + i % 28), material=material, quantity=10, unit_price=5,
+                             total_amount=50)
+            for i, material in enumerate(cls.materials)
+        ])
+        WBShipment.objects.bulk_create([
+            WBShipment(date=date(2026, 1, 1 + i % 28), from_location=cls.home, to_location=cls.wb, product=product,
+                       quantity=1, wb_shipment_number=f'WB-{i}')
+            for i, product in enumerate(cls.products)
+        ])
+        PlannedShipment.objects.bulk_create([
+            PlannedShipment(date=date.today(), product=product, quantity=50) for product in cls.products
+        ])
+
+    def setUp(self):
+        cache.clear()
+        bom.invalidate()
+        self.client.force_login(self.user)
+
+    def assertMaxQueries(self, budget, method, url, data=None, status=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data or {})
+        if status is not None:
+            self.assertEqual(response.status_code, status)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method.upper()} {url}: {len(queries)} запросов при бюджете {budget}\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+        return response
+
+    def test_dashboard(self):
+        self.assertMaxQueries(4, 'get', reverse('dashboard'), status=200)
+
+    def test_dashboard_cached(self):
+        self.client.get(reverse('dashboard'))
+        # Сводка из кэша: к таблицам остатков запросов нет
+        self.assertMaxQueries(3, 'get', reverse('dashboard'), status=200)
+
+    def test_wb_stocks(self):
+        self.assertMaxQueries(7, 'get', reverse('wb_stocks'), status=200)
+
+    def test_wb_stocks_filtered(self):
+        self.assertMaxQueries(7, 'get', reverse('wb_stocks'), {
+            'location': self.home.id, 'type': 'raw', 'status': 'low', 'sort': '-quantity',
+        }, status=200)
+
+    def test_production_create(self):
+        # Первая проводка дня: дневные итоги ещё создаются (INSERT OR IGNORE)
+        self.assertMaxQueries(22, 'post', reverse('production_create'), {
+            'date': '2026-02-01', 'product': self.products[0].id, 'location': self.home.id, 'produced_qty': 3,
+        }, status=302)
+
+    def test_production_same_day(self):
+        data = {'date': '2026-02-01', 'product': self.products[0].id, 'location': self.home.id, 'produced_qty': 3}
+        self.client.post(reverse('production_create'), data)
+        # Строки остатков и итогов дня уже есть: каждая таблица — один UPDATE
+        self.assertMaxQueries(18, 'post', reverse('production_create'), data, status=302)
+
+    def test_production_batch(self):
+        rows = {'form-TOTAL_FORMS': PRODUCTS, 'form-INITIAL_FORMS': 0}
+        for i, product in enumerate(self.products):
+            rows.update({
+                f'form-{i}-date': '2026-02-01', f'form-{i}-product': product.id,
+                f'form-{i}-location': self.home.id, f'form-{i}-produced_qty': 2,
+            })
+        # Пачка из PRODUCTS строк проводится тем же числом запросов, что и одна
+        self.assertMaxQueries(21, 'post', reverse('production_batch'), rows, status=302)
+
+    def test_purchase_create(self):
+        self.assertMaxQueries(14, 'post', reverse('purchase_create'), {
+            'date': '2026-02-01', 'material': self.materials[0].id, 'quantity': 5, 'unit_price': 10,
+        }, status=302)
+
+    def test_shipment_create(self):
+        self.assertMaxQueries(16, 'post', reverse('shipment_create'), {
+            'date': '2026-02-01', 'from_location': self.home.id, 'to_location': self.wb.id,
+            'product': self.products[5].id, 'quantity': 1, 'wb_shipment_number': 'WB-NEW',
+        }, status=302)
+
+    def test_reports(self):
+        budgets = {'overview': 6, 'purchases': 6, 'production': 6, 'shipments': 6, 'stocks': 5, 'financial': 8}
+        for report_type, budget in budgets.items():
+            with self.subTest(report_type=report_type):
+                self.assertMaxQueries(budget, 'get', reverse('report', args=[report_type]),
+                                      {'period': 'year', 'on': '2026'}, status=200)
+
+    def test_capacity(self):
+        self.assertMaxQueries(10, 'get', reverse('capacity'), status=200)
+
+    def test_mrp(self):
+        self.assertMaxQueries(10, 'get', reverse('mrp'), status=200)
+
+    def test_stock_as_of(self):
+        self.assertMaxQueries(8, 'get', reverse('stock_as_of'), {'date': '2026-01-15'}, status=200)
+
+
+class KeysetPaginationTests(TestCase):
+    """Курсорные страницы остатков: при равных значениях сортировки строки не теряются и не повторяются"""
+
+    @classmethod
+    def setUpTestData(cls):
+        home = Location.objects.create(name='Дом', type='home')
+        quantities = ['5', '5', '5', '2.5', '5', '2.5', '7', '5']
+        for index, quantity in enumerate(quantities):
+            material = Material.objects.create(name=f'Материал {index % 3}', unit='шт', type='raw')
+            MaterialStock.objects.create(material=material, location=home, quantity=Decimal(quantity))
+
+    def walk(self, order, size=3):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(MaterialStock.objects.all(), order, cursor, size)
+            seen.extend(rows)
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_ties_once_in_order(self):
+        for order in ('quantity', '-quantity', 'material__name', '-material__name'):
+            rows = self.walk(order)
+            field = order.lstrip('-')
+            expected = MaterialStock.objects.annotate(sort_key=F(field)).order_by(
+                *(('-sort_key', '-id') if order.startswith('-') else ('sort_key', 'id'))
+            )
+            self.assertEqual([row.id for row in rows], [row.id for row in expected], order)
+
+    def test_broken_cursor_starts_over(self):
+        first, _ = keyset_page(MaterialStock.objects.all(), 'quantity', None, 3)
+        for cursor in ('garbage', 'W10', '!!!'):
+            rows, _ = keyset_page(MaterialStock.objects.all(), 'quantity', cursor, 3)
+            self.assertEqual(rows, first, cursor)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_LOG_FILE=None)
+class ProfilingTests(TestCase):
+    """Профилирование запросов: SQL по представлениям, повторы, медленные запросы, доступ только staff"""
+
+    def setUp(self):
+        profiling.reset()
+        self.addCleanup(profiling.reset)
+        self.user = User.objects.create_user('keeper', 'keeper@example.com', 'pass')
+        self.staff = User.objects.create_user('admin', 'admin@example.com', 'pass', is_staff=True)
+
+    def view_stats(self, view):
+        return next(row for row in profiling.stats() if row['view'] == view)
+
+    def test_records_queries_per_view(self):
+        self.client.force_login(self.user)
+        queries = profiling.QueryRecorder()
+        with connection.execute_wrapper(queries):
+            self.assertEqual(self.client.get(reverse('wb_stocks')).status_code, 200)
+        self.client.get(reverse('wb_stocks'))
+
+        row = self.view_stats('wb_stocks')
+        self.assertEqual(row['requests'], 2)
+        self.assertEqual(row['queries_max'], len(queries.queries))
+        self.assertGreater(row['queries_max'], 0)
+        self.assertEqual(sum(row['histogram'].values()), 2)
+
+    def test_duplicates_and_slowest(self):
+        recorder = profiling.QueryRecorder()
+        execute = mock.Mock(return_value=None)
+        timings = [0, 0.001, 0, 0.001, 0, 0.002, 0, 0.020, 0, 0.005]
+        statements = [
+            ('SELECT * FROM core_product WHERE id = %s', (1,)),
+            ('SELECT * FROM core_product WHERE id = %s', (1,)),
+            ('SELECT * FROM core_product WHERE id = %s', (2,)),
+            ('SELECT * FROM core_material WHERE id IN (%s, %s, %s)', (1, 2, 3)),
+            ('SELECT * FROM core_location LIMIT 21', ()),
+        ]
+        with mock.patch.object(profiling.time, 'perf_counter', side_effect=timings):
+            for sql, params in statements:
+                recorder(execute, sql, params, False, {})
+
+        with override_settings(PROFILING_SLOW_QUERIES=2):
+            sample = recorder.sample('product_list', 'GET', 200, 40)
+        self.assertEqual(execute.call_count, 5)
+        self.assertEqual((sample['queries'], sample['sql_ms']), (5, 29))
+        # Тот же SQL с теми же параметрами — дубль; с другими — повтор шаблона (N+1)
+        self.assertEqual(sample['duplicates'], 1)
+        self.assertEqual(sample['top_repeat'], {'sql': 'SELECT * FROM core_product WHERE id = %s', 'count': 3})
+        self.assertEqual(sample['slowest'], [
+            {'sql': 'SELECT * FROM core_material WHERE id IN (...)', 'ms': 20},
+            {'sql': 'SELECT * FROM core_location LIMIT ?', 'ms': 5},
+        ])
+
+    def test_json_endpoint_and_access(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('wb_stocks'))
+        response = self.client.get(reverse('profiling'), {'format': 'json'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('admin:login'), response['Location'])
+
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('profiling')).status_code, 200)
+        data = self.client.get(reverse('profiling'), {'format': 'json'}).json()
+        self.assertEqual([row['view'] for row in data['views']], ['wb_stocks'])
+        self.assertEqual(set(data['views'][0]), {
+            'view', 'requests', 'p50_ms', 'p95_ms', 'max_ms', 'histogram', 'queries_avg', 'queries_max',
+            'sql_ms_avg', 'duplicates_max', 'top_repeat', 'slowest',
+        })
+        self.assertEqual(data['views'][0]['requests'], 1)
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_records_nothing(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('wb_stocks')).status_code, 200)
+        self.assertEqual(profiling.stats(), [])
+
+
+def run_in_subprocess(code):
+    """Выполнить код в отдельном процессе с теми же настройками (как другой воркер); возвращает stdout"""
+    return subprocess.run(
+        [sys.executable, '-c', f'import django; django.setup(); {code}'],
+        check=True, cwd=settings.BASE_DIR, env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)},
+        capture_output=True, text=True,
+    ).stdout
+
+
+class SQLiteProfileTests(TestCase):
+    """Настройки SQLite применяются к каждому новому соединению и держат параллельную запись"""
+
+    def test_pragmas_applied_to_new_connection(self):
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        wrapper = DatabaseWrapper({**connections.settings['default'], 'NAME': path}, alias='pragma_check')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            values = {}
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2})
+
+    def test_contention_benchmark_smoke(self):
+        # В отдельном процессе: run_profile переключает соединение на временную БД
+        output = run_in_subprocess(
+            'import json; from core.services.contention import production_profile, run_profile; '
+            'print(json.dumps(run_profile(production_profile(), threads=2, operations=3)))'
+        )
+        result = json.loads(output.splitlines()[-1])
+        self.assertEqual((result['operations'], result['succeeded']), (6, 6))
+        self.assertEqual((result['lock_errors'], result['other_errors']), (0, 0))
+
+
+class BOMTests(TestCase):
+    """Развёрнутые рецептуры: общая версия кэша и защита от циклов"""
+
+    def setUp(self):
+        bom.invalidate()
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.fabric = Material.objects.create(name='Ткань', unit='м', type='raw')
+        self.plain = Product.objects.create(name='Набор')
+        self.line = ProductBOM.objects.create(product=self.plain, material=self.fabric, qty_per_unit=2)
+        MaterialStock.objects.create(material=self.fabric, location=self.home, quantity=10)
+        self.first = Product.objects.create(name='Полуфабрикат А')
+        self.second = Product.objects.create(name='Полуфабрикат Б')
+        ProductBOM.objects.create(product=self.second, material=self.fabric, qty_per_unit=1)
+
+    def test_cycle_is_rejected_on_save(self):
+        ProductComponent.objects.create(product=self.first, component=self.second, qty_per_unit=1)
+        with self.assertRaises(bom.BOMCycleError):
+            ProductComponent.objects.create(product=self.second, component=self.first, qty_per_unit=1)
+        self.assertEqual(bom.explode(self.first.id), {self.fabric.id: 1})
+
+    def test_cycle_written_around_save_breaks_only_its_products(self):
+        ProductComponent.objects.bulk_create([
+            ProductComponent(product=self.first, component=self.second, qty_per_unit=1),
+            ProductComponent(product=self.second, component=self.first, qty_per_unit=1),
+        ])
+        bom.invalidate()
+        self.assertEqual(bom.explode_many([self.plain.id]), {self.plain.id: {self.fabric.id: 2}})
+        with self.assertRaises(bom.BOMCycleError):
+            bom.explode(self.first.id)
+        _, rows = capacity_table()
+        self.assertEqual([(row['product_id'], row['capacity']) for row in rows], [(self.plain.id, [5])])
+
+    def test_invalidation_in_another_process_is_visible(self):
+        self.assertEqual(bom.explode(self.plain.id), {self.fabric.id: 2})
+        # Правка без сигналов в этом процессе — как будто её сделал другой воркер
+        ProductBOM.objects.filter(id=self.line.id).update(qty_per_unit=3)
+        self.assertEqual(bom.explode(self.plain.id), {self.fabric.id: 2})
+        run_in_subprocess('from core.services import bom; bom.invalidate()')
+        self.assertEqual(bom.explode(self.plain.id), {self.fabric.id: 3})
+
+
+class PlanningTests(TestCase):
+    """Производственные мощности и MRP на маленькой рецептуре с полуфабрикатом"""
+
+    def setUp(self):
+        bom.invalidate()
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.shop = Location.objects.create(name='Цех', type='home')
+        self.wb = Location.objects.create(name='WB Коледино', type='wb')
+        self.fabric = Material.objects.create(name='Ткань', unit='м', type='raw', lead_time_days=14)
+        self.thread = Material.objects.create(name='Нитки', unit='шт', type='raw', lead_time_days=3)
+        self.zip = Material.objects.create(name='Зип-пакет', unit='шт', type='pack')
+        # Набор: 2 м ткани + 1 нить; Подарок: 2 набора + зип-пакет; Образец — без рецептуры
+        self.kit = Product.objects.create(name='Набор')
+        self.gift = Product.objects.create(name='Подарок')
+        Product.objects.create(name='Образец')
+        ProductBOM.objects.create(product=self.kit, material=self.fabric, qty_per_unit=2)
+        ProductBOM.objects.create(product=self.kit, material=self.thread, qty_per_unit=1)
+        ProductComponent.objects.create(product=self.gift, component=self.kit, qty_per_unit=2)
+        ProductBOM.objects.create(product=self.gift, material=self.zip, qty_per_unit=1)
+
+    def stock(self, location, **quantities):
+        for name, quantity in quantities.items():
+            MaterialStock.objects.create(material=getattr(self, name), location=location, quantity=quantity)
+
+    def test_capacity(self):
+        self.stock(self.home, fabric=9, thread=5, zip=10)
+        self.stock(self.shop, fabric=100, thread=3, zip=1)
+        locations, rows = capacity_table(location_ids=[self.home.id, self.shop.id])
+
+        self.assertEqual([location['name'] for location in locations], ['Дом', 'Цех'])
+        self.assertEqual({row['product']: (row['capacity'], row['bottleneck']) for row in rows}, {
+            # Дом: ткань 9/2 = 4.5; Цех: нитки 3/1
+            'Набор': ([4, 3], ['Ткань', 'Нитки']),
+            # Дом: ткань 9/4 = 2.25; Цех: зип-пакет 1/1 (нитки 3/2 = 1.5)
+            'Подарок': ([2, 1], ['Ткань', 'Зип-пакет']),
+        })
+
+        _, rows = capacity_table(location_ids=[self.home.id], search='Пода')
+        self.assertEqual([(row['product_id'], row['capacity']) for row in rows], [(self.gift.id, [2])])
+
+    def test_mrp(self):
+        self.stock(self.home, fabric=5, thread=20)
+        ProductStock.objects.create(product=self.kit, location=self.home, quantity=4)
+        ProductStock.objects.create(product=self.kit, location=self.wb, quantity=100)  # на WB — не запас под план
+        for day, product, quantity in (
+            (date(2026, 3, 5), self.kit, 10), (date(2026, 3, 11), self.gift, 1), (date(2026, 3, 18), self.kit, 10),
+            (date(2026, 4, 10), self.kit, 50),  # за горизонтом
+        ):
+            PlannedShipment.objects.create(date=day, product=product, quantity=quantity)
+        PurchaseOrder.objects.create(expected_date=date(2026, 3, 10), material=self.fabric, quantity=10)
+        PurchaseOrder.objects.create(expected_date=date(2026, 3, 10), material=self.fabric, quantity=99, received=True)
+
+        result = mrp.plan(weeks=4, today=date(2026, 3, 4))
+
+        self.assertEqual(result['weeks'][0], date(2026, 3, 2))
+        self.assertEqual(result['products'], 2)
+        # Выпуск: наборы 10 − 4 на неделе 1, подарок на неделе 2, 10 наборов на неделе 3.
+        # Ткань: 12, 4, 20 против 5 в остатке и 10 по заказу на неделе 2 → 7 сейчас и 14 к 16.03.
+        # Нитки: 6 + 2 + 10 ≤ 20 — докупать не нужно
+        self.assertEqual(result['materials'], [
+            {
+                'material_id': self.zip.id, 'material': 'Зип-пакет', 'unit': 'шт',
+                'required': 1.0, 'on_hand': 0.0, 'open_orders': 0.0, 'shortfall': 1.0,
+                'orders': [{'need_by': date(2026, 3, 9), 'order_by': date(2026, 3, 4), 'late': True, 'quantity': 1.0}],
+            },
+            {
+                'material_id': self.fabric.id, 'material': 'Ткань', 'unit': 'м',
+                'required': 36.0, 'on_hand': 5.0, 'open_orders': 10.0, 'shortfall': 21.0,
+                'orders': [
+                    {'need_by': date(2026, 3, 4), 'order_by': date(2026, 3, 4), 'late': True, 'quantity': 7.0},
+                    {'need_by': date(2026, 3, 16), 'order_by': date(2026, 3, 4), 'late': True, 'quantity': 14.0},
+                ],
+            },
+        ])
+
+
+def wb_response(status, payload=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(payload if payload is not None else {}).encode()
+    response.headers.update(headers or {})
+    return response
+
+
+class RateLimiterTests(TestCase):
+    """Token bucket в БД: пачка до burst, затем пополнение по per_minute"""
+
+    def setUp(self):
+        token = WBToken.objects.create(user=User.objects.create_user('seller'), api_key='key')
+        self.limiter = rate_limit.RateLimiter(token, limits={'content': {'per_minute': 60, 'burst': 2}})
+        self.clock = mock.patch.object(rate_limit.time, 'time', return_value=1000.0)
+        self.now = self.clock.start()
+        self.addCleanup(self.clock.stop)
+
+    def test_exhaustion(self):
+        self.assertEqual(self.limiter.try_acquire('content'), 0)
+        self.assertEqual(self.limiter.try_acquire('content'), 0)
+        # Пачка из burst запросов израсходована: следующий токен — через секунду (60 в минуту)
+        self.assertAlmostEqual(self.limiter.try_acquire('content'), 1.0)
+        self.assertFalse(self.limiter.acquire('content', block=False))
+
+    def test_refill(self):
+        self.limiter.try_acquire('content')
+        self.limiter.try_acquire('content')
+        self.now.return_value = 1000.5
+        self.assertAlmostEqual(self.limiter.try_acquire('content'), 0.5)
+        self.now.return_value = 1001.0
+        self.assertEqual(self.limiter.try_acquire('content'), 0)
+        # За долгий простой копится не больше burst
+        self.now.return_value = 2000.0
+        self.assertEqual(self.limiter.try_acquire('content'), 0)
+        self.assertEqual(self.limiter.try_acquire('content'), 0)
+        self.assertGreater(self.limiter.try_acquire('content'), 0)
+
+
+class WBClientTests(TestCase):
+    """Повторы 429/5xx идут через лимитер и соблюдают Retry-After"""
+
+    def client_with(self, *responses):
+        session = mock.Mock()
+        session.request.side_effect = list(responses)
+        limiter = mock.Mock()
+        return wb_api.WildberriesAPI('key', session=session, limiter=limiter), session, limiter
+
+    @override_settings(WB_API_RETRIES=3, WB_API_BACKOFF=0.5)
+    def test_retries_take_tokens_and_honour_retry_after(self):
+        api, session, limiter = self.client_with(
+            wb_response(429, headers={'Retry-After': '2'}), wb_response(503), wb_response(200, {'cards': []}),
+        )
+        with mock.patch.object(wb_api.time, 'sleep') as sleep:
+            self.assertEqual(api.get_cards_page(), ([], None))
+        self.assertEqual([call.args for call in sleep.call_args_list], [(2.0,), (1.0,)])
+        self.assertEqual(limiter.acquire.call_count, session.request.call_count)
+        self.assertEqual(session.request.call_count, 3)
+
+    def test_my_products_use_configured_base_url(self):
+        api, session, _ = self.client_with(wb_response(200, {'cards': [{'nmID': 1}], 'cursor': {}}))
+        api.base_urls['content'] = 'http://127.0.0.1:8001'
+        self.assertEqual(api.get_my_products(limit=5), [{'nmID': 1}])
+        method, url = session.request.call_args.args
+        self.assertEqual((method, url), ('POST', 'http://127.0.0.1:8001/content/v2/get/cards/list'))
+        self.assertEqual(session.request.call_args.kwargs['json']['settings']['cursor'], {'limit': 5})
+        self.assertEqual(wb_api.WildberriesAPI(None, session=session).get_my_products(), [])
+
+    @override_settings(WB_API_RETRIES=1)
+    def test_gives_up_after_retries(self):
+        api, session, limiter = self.client_with(wb_response(429), wb_response(429))
+        with mock.patch.object(wb_api.time, 'sleep'), self.assertRaises(requests.HTTPError):
+            api.get_stocks()
+        self.assertEqual(limiter.acquire.call_count, 2)
+
+
+class AsyncClientTests(TestCase):
+    """Асинхронный клиент против локальной заглушки WB: те же данные, что и у синхронного, параллельно"""
+
+    def test_catalog_matches_sequential_fetch(self):
+        with StubWB(cards=250, prices=4500, stocks=30, latency=0.02) as stub:
+            api = wb_async.AsyncWildberriesAPI('key', concurrency=4, base_urls=stub.base_urls)
+
+            async def collect():
+                return [item async for item in api.iter_catalog()]
+
+            items = asyncio.run(collect())
+            self.assertGreater(stub.max_in_flight, 1)
+            self.assertLessEqual(stub.max_in_flight, 4)
+            expected = fetch_sequential(wb_api.WildberriesAPI('key', base_urls=stub.base_urls))
+
+        counts = defaultdict(int)
+        for kind, _ in items:
+            counts[kind] += 1
+        self.assertEqual(dict(counts), {'card': 250, 'price': 4500, 'stock': 30})
+        self.assertEqual(expected, dict(counts))
+        cards = [item['nmID'] for kind, item in items if kind == 'card']
+        self.assertEqual(cards, sorted(set(cards)))
+
+    def test_session_per_thread(self):
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(wb_api.get_session()))
+        thread.start()
+        thread.join()
+        self.assertIs(wb_api.get_session(), wb_api.get_session())
+        self.assertIsNot(sessions[0], wb_api.get_session())
+        self.assertIs(wb_api.WildberriesAPI('key').session, wb_api.get_session())
+
+
+class CardSyncTests(TestCase):
+    """Синхронизация карточек продолжается с сохранённого курсора и не запрашивает старые страницы"""
+
+    def setUp(self):
+        self.token = WBToken.objects.create(user=User.objects.create_user('seller'), api_key='key')
+
+    def test_incremental_sync_resumes_from_cursor(self):
+        with StubWB(cards=250) as stub:
+            api = wb_api.WildberriesAPI('key', base_urls=stub.base_urls)
+            first_page = api.get_cards_page(limit=100)
+            stub.requests = 0
+            with mock.patch.object(api, 'get_cards_page', side_effect=[first_page, requests.ConnectionError]):
+                with self.assertRaises(requests.ConnectionError):
+                    wb_sync.sync_cards(self.token, api=api)
+            # Первая страница сохранена вместе с курсором — продолжаем со 101-й карточки
+            self.assertEqual(Product.objects.count(), 100)
+            self.assertEqual(WBSyncState.objects.get(token=self.token).cursor_nm_id, 100099)
+
+            self.assertEqual(wb_sync.sync_cards(self.token, api=api), 150)
+            self.assertEqual(stub.requests, 2)
+
+            stub.cards.append({'nmID': 100250, 'vendorCode': 'ART-250', 'title': 'Новинка', 'updatedAt': ''})
+            stub.cards[0]['title'] = 'Переименован'
+            stub.requests = 0
+            self.assertEqual(wb_sync.sync_cards(self.token, api=api), 1)
+            self.assertEqual(stub.requests, 1)
+            self.assertEqual(Product.objects.get(wb_article='100000').name, 'Товар 0')
+
+            self.assertEqual(wb_sync.sync_cards(self.token, full=True, api=api), 251)
+
+        self.assertEqual(Product.objects.count(), 251)
+        self.assertEqual(Product.objects.get(wb_article='100000').name, 'Переименован')
+        state = WBSyncState.objects.get(token=self.token)
+        self.assertEqual((state.cursor_nm_id, state.cards_synced), (100250, 502))
+
+
+@mock.patch.object(jobs, 'close_old_connections')
+class JobQueueTests(TestCase):
+    """Очередь задач WB: одна задача — одному воркеру, ошибки и зависшие задачи не теряются"""
+
+    def setUp(self):
+        self.token = WBToken.objects.create(user=User.objects.create_user('seller'), api_key='key')
+
+    def test_claim_is_exclusive_and_in_order(self, _):
+        ping = jobs.enqueue(self.token, 'ping')
+        self.assertEqual(jobs.enqueue(self.token, 'ping'), ping)
+        sync = jobs.enqueue(self.token, 'sync_cards', {'full': True})
+
+        self.assertEqual(jobs.claim_next(), ping)
+        self.assertEqual(jobs.claim_next(), sync)
+        self.assertIsNone(jobs.claim_next())
+        self.assertEqual(set(WBJob.objects.values_list('status', flat=True)), {'running'})
+        # Пока задача выполняется, такая же повторно не ставится
+        self.assertEqual(jobs.enqueue(self.token, 'ping'), ping)
+
+    def test_failure_is_recorded_and_stale_jobs_retry(self, _):
+        job = jobs.enqueue(self.token, 'ping')
+        with mock.patch.dict(jobs.HANDLERS, ping=mock.Mock(side_effect=requests.ConnectionError('нет сети'))):
+            jobs.run_job(jobs.claim_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('нет сети', job.error)
+        self.assertIsNotNone(job.finished_at)
+
+        # Воркер упал посреди задачи: через after секунд она снова в очереди
+        stuck = jobs.enqueue(self.token, 'sync_cards')
+        self.assertEqual(jobs.claim_next(), stuck)
+        WBJob.objects.filter(id=stuck.id).update(started_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(jobs.requeue_stale(after=60), 1)
+        self.assertEqual(jobs.requeue_stale(after=60), 0)
+
+        with mock.patch.dict(jobs.HANDLERS, sync_cards=mock.Mock(return_value={'synced': 3})):
+            jobs.run_job(jobs.claim_next())
+        stuck.refresh_from_db()
+        self.assertEqual((stuck.status, stuck.result), ('done', {'synced': 3}))
+
+
+@mock.patch.object(jobs, 'close_old_connections')
+class TokenHealthTests(TestCase):
+    """Проверка токена: результат живёт в кэше TTL секунд, /ping не повторяется на каждый заход"""
+
+    def setUp(self):
+        user = User.objects.create_user('seller', 'seller@example.com', 'pass')
+        self.token = WBToken.objects.create(user=user, api_key='old-key')
+        self.client.force_login(user)
+
+    def profile(self):
+        response = self.client.get(reverse('wb_profile'))
+        self.assertEqual(response.status_code, 200)
+        return response.context['test_result']
+
+    def run_ping(self, result):
+        with mock.patch.object(wb_api.WildberriesAPI, 'test_connection', return_value=result) as ping:
+            jobs.run_job(jobs.claim_next())
+        return ping
+
+    def test_result_is_cached_until_token_changes(self, _):
+        self.assertIsNone(self.profile())
+        self.assertIsNone(self.profile())
+        self.assertEqual(WBJob.objects.filter(kind='ping').count(), 1)
+
+        ok = {'status': 'success', 'message': 'OK'}
+        self.run_ping(ok)
+        self.assertEqual(wb_health.get_health('old-key'), ok)
+        self.assertEqual(self.profile(), ok)
+        self.assertIsNone(jobs.claim_next())
+
+        # Кэш другого процесса пуст — свежий результат берётся из задачи и кладётся в кэш
+        wb_health.invalidate_health('old-key')
+        self.assertEqual(self.profile(), ok)
+        self.assertEqual(wb_health.get_health('old-key'), ok)
+        self.assertIsNone(jobs.claim_next())
+
+        # Результат старого ключа новому не достаётся
+        self.client.post(reverse('wb_profile'), {'api_key': 'new-key'})
+        self.assertIsNone(self.profile())
+        self.assertEqual(self.run_ping({'status': 'error', 'message': '401'}).call_count, 1)
+        self.assertEqual(self.profile(), {'status': 'error', 'message': '401'})
+
+    @override_settings(WB_HEALTH_TTL=60)
+    def test_stale_result_triggers_new_check(self, _):
+        self.profile()
+        self.run_ping({'status': 'success', 'message': 'OK'})
+        wb_health.invalidate_health('old-key')
+        WBJob.objects.update(finished_at=timezone.now() - timedelta(seconds=61))
+        self.assertIsNone(self.profile())
+        self.assertEqual(WBJob.objects.filter(kind='ping', status='queued').count(), 1)
+
+
+class StockVersionTests(TestCase):
+    """Версия остатков в общем кэше: сброс в другом процессе (воркер, wb_worker) виден здесь"""
+
+    def test_bump_in_another_process_is_visible(self):
+        before = summary.stock_version()
+        run_in_subprocess('from core.services.summary import bump_stock_version; bump_stock_version()')
+        self.assertNotEqual(summary.stock_version(), before)
+
+    def test_tests_do_not_touch_app_cache(self):
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(os.path.abspath(location), os.path.abspath(settings.BASE_DIR / 'cache'))
+        self.assertEqual(os.environ['WB_CACHE_DIR'], location)
+
+    def test_bumps_never_collide(self):
+        versions = set()
+        for _ in range(100):
+            summary.bump_stock_version()
+            versions.add(summary.stock_version())
+        self.assertEqual(len(versions), 100)
+
+
+class QuantityTests(TestCase):
+    """Количества в целых тысячных: проводки не накапливают ошибку float"""
+
+    def setUp(self):
+        bom.invalidate()
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.wb = Location.objects.create(name='WB Коледино', type='wb')
+        self.material = Material.objects.create(name='Тряпка', unit='шт', type='raw')
+        self.product = Product.objects.create(name='Набор')
+        ProductBOM.objects.create(product=self.product, material=self.material, qty_per_unit=Decimal('0.1'))
+
+    def test_repeated_postings_are_exact(self):
+        for _ in range(10):
+            purchase = MaterialPurchase.objects.create(
+                date=date(2026, 2, 1), material=self.material, quantity=0.1, unit_price=3, total_amount=Decimal('0.30'),
+            )
+            post_purchase(purchase, self.home)
+        for _ in range(10):
+            post_production(Production.objects.create(
+                date=date(2026, 2, 2), product=self.product, location=self.home, produced_qty=1,
+            ))
+        for _ in range(3):
+            post_shipment(WBShipment.objects.create(
+                date=date(2026, 2, 3), from_location=self.home, to_location=self.wb, product=self.product,
+                quantity=Decimal('3.3'), wb_shipment_number='WB-1',
+            ))
+
+        # 10 × 0.1 − 10 × 1 × 0.1 = ровно 0, а 10 − 3 × 3.3 = ровно 0.1
+        self.assertTrue(MaterialStock.objects.filter(material=self.material, quantity=0).exists())
+        self.assertEqual(ProductStock.objects.get(product=self.product, location=self.home).quantity, Decimal('0.1'))
+        self.assertEqual(ProductStock.objects.get(product=self.product, location=self.wb).quantity, Decimal('9.9'))
+        self.assertEqual(Material.objects.get(id=self.material.id).cost_qty, 0)
+        self.assertEqual(
+            sum(StockMovement.objects.filter(material=self.material).values_list('delta', flat=True)), 0
+        )
+
+
+class RollupTests(TestCase):
+    """Дневные итоги, которые ведут проводки, сходятся с документами и с rebuild_rollups"""
+
+    def setUp(self):
+        bom.invalidate()
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.wb = Location.objects.create(name='WB Коледино', type='wb')
+        self.material = Material.objects.create(name='Тряпка', unit='шт', type='raw')
+        self.product = Product.objects.create(name='Набор')
+        ProductBOM.objects.create(product=self.product, material=self.material, qty_per_unit=Decimal('1.5'))
+
+        for day, quantity, price in ((1, 40, 3), (1, 10, Decimal('2.5')), (2, 20, 4)):
+            post_purchase(MaterialPurchase.objects.create(
+                date=date(2026, 3, day), material=self.material, quantity=quantity, unit_price=price,
+                total_amount=quantity * price,
+            ), self.home)
+        for day, quantity in ((2, 4), (2, 6), (3, 10)):
+            post_production(Production.objects.create(
+                date=date(2026, 3, day), product=self.product, location=self.home, produced_qty=quantity,
+            ))
+        for day, quantity in ((3, 5), (4, 7)):
+            post_shipment(WBShipment.objects.create(
+                date=date(2026, 3, day), from_location=self.home, to_location=self.wb, product=self.product,
+                quantity=quantity, wb_shipment_number=f'WB-{day}',
+            ))
+
+    def rollups(self):
+        return (
+            {(row.pop('day'), row.pop('location_id')): row for row in DailyMaterialRollup.objects.values(
+                'day', 'location_id', 'purchased', 'consumed', 'spend')},
+            {(row.pop('day'), row.pop('location_id')): row for row in DailyProductRollup.objects.values(
+                'day', 'location_id', 'produced', 'produced_cost', 'shipped_out', 'shipped_in')},
+        )
+
+    def from_documents(self):
+        """Те же итоги, посчитанные в Python прямо по документам"""
+        materials = defaultdict(lambda: {'purchased': 0, 'consumed': 0, 'spend': 0})
+        products = defaultdict(lambda: {'produced': 0, 'produced_cost': 0, 'shipped_out': 0, 'shipped_in': 0})
+        for purchase in MaterialPurchase.objects.all():
+            materials[(purchase.date, self.home.id)]['purchased'] += purchase.quantity
+            materials[(purchase.date, self.home.id)]['spend'] += purchase.total_amount
+        for used in ProductionMaterial.objects.select_related('production'):
+            materials[(used.production.date, used.production.location_id)]['consumed'] += used.quantity_used
+        for production in Production.objects.all():
+            key = (production.date, production.location_id)
+            products[key]['produced'] += production.produced_qty
+            products[key]['produced_cost'] += (production.unit_cost * production.produced_qty).quantize(Decimal('0.01'))
+        for shipment in WBShipment.objects.all():
+            products[(shipment.date, shipment.from_location_id)]['shipped_out'] += shipment.quantity
+            products[(shipment.date, shipment.to_location_id)]['shipped_in'] += shipment.quantity
+        return dict(materials), dict(products)
+
+    def test_postings_match_documents_and_rebuild(self):
+        posted = self.rollups()
+        self.assertEqual(posted, self.from_documents())
+        self.assertEqual(posted[0][(date(2026, 3, 1), self.home.id)],
+                         {'purchased': 50, 'consumed': 0, 'spend': Decimal('145.00')})
+        self.assertEqual(posted[1][(date(2026, 3, 4), self.wb.id)]['shipped_in'], 7)
+
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollups(), posted)
+
+    def test_reports_ignore_bad_location(self):
+        self.client.force_login(User.objects.create_user('viewer', 'viewer@example.com', 'pass'))
+        for report in ('overview', 'purchases', 'stocks'):
+            with self.subTest(report=report):
+                response = self.client.get(reverse('report', args=[report]), {'location': 'abc'})
+                self.assertEqual(response.status_code, 200)
+
+
+class PurchaseImportTests(TestCase):
+    """Накладная: любые числа вне диапазона — ошибки строк в превью, а не 500"""
+
+    def setUp(self):
+        Material.objects.create(name='Тряпка', unit='шт', type='raw')
+
+    def errors(self, *rows):
+        text = 'дата;материал;количество;цена\n' + '\n'.join(rows)
+        with self.assertRaises(PurchaseImportError) as raised:
+            parse_purchases(text)
+        return raised.exception.errors
+
+    def test_valid_rows(self):
+        purchases = parse_purchases('дата;материал;количество;цена\n01.02.2026;тряпка;1,5;10,504\n')
+        self.assertEqual([(p.quantity, p.unit_price, p.total_amount) for p in purchases],
+                         [(Decimal('1.5'), Decimal('10.50'), Decimal('15.75'))])
+
+    def test_out_of_range_numbers_are_row_errors(self):
+        errors = self.errors(
+            '01.02.2026;Тряпка;1e400;1',
+            '01.02.2026;Тряпка;99999999999999999999;1',
+            '01.02.2026;Тряпка;1;123456789',
+            '01.02.2026;Тряпка;900000000;100',
+            '01.02.2026;Тряпка;1;1',
+        )
+        self.assertEqual([line for line, _ in errors], [2, 3, 4, 5])
+        self.assertIn('слишком большое', errors[0][1])
+        self.assertIn('цена', errors[2][1])
+        self.assertIn('сумма строки', errors[3][1])
+
+    def test_zero_quantity_and_ambiguous_material_are_row_errors(self):
+        Material.objects.create(name='Лента', unit='м', type='raw')
+        Material.objects.create(name='лента ', unit='шт', type='raw')
+        errors = self.errors(
+            '01.02.2026;Тряпка;0;1',
+            '01.02.2026;Тряпка;0,0001;1',
+            '01.02.2026;Лента;1;1',
+            '01.02.2026;Тряпка;1;1',
+        )
+        self.assertEqual([line for line, _ in errors], [2, 3, 4])
+        self.assertIn('больше нуля', errors[0][1])
+        self.assertIn('больше нуля', errors[1][1])
+        self.assertIn('неоднозначен', errors[2][1])
+
+    def test_view_shows_errors(self):
+        self.client.force_login(User.objects.create_user('buyer', 'buyer@example.com', 'pass'))
+        upload = SimpleUploadedFile('invoice.csv', 'дата;материал;количество;цена\n01.02.2026;Тряпка;1e400;1\n'.encode())
+        response = self.client.post(reverse('purchase_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'слишком большое')
+        self.assertFalse(MaterialPurchase.objects.exists())
+
+
+class ProductionPostingTests(TestCase):
+    """Производство списывает материалы по рецептуре и не уводит остаток в минус"""
+
+    def setUp(self):
+        bom.invalidate()
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.fabric = Material.objects.create(name='Ткань', unit='м', type='raw')
+        self.thread = Material.objects.create(name='Нитки', unit='шт', type='raw')
+        self.product = Product.objects.create(name='Набор')
+        ProductBOM.objects.create(product=self.product, material=self.fabric, qty_per_unit=2)
+        ProductBOM.objects.create(product=self.product, material=self.thread, qty_per_unit=1)
+        MaterialStock.objects.create(material=self.fabric, location=self.home, quantity=10)
+        MaterialStock.objects.create(material=self.thread, location=self.home, quantity=3)
+
+    def produce(self, *quantities):
+        return create_productions([
+            Production(date=date(2026, 2, 1), product=self.product, location=self.home, produced_qty=quantity)
+            for quantity in quantities
+        ])
+
+    def test_shortage_rejects_whole_batch(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            self.produce(2, 2)  # ниток нужно 4, есть 3
+
+        self.assertEqual(raised.exception.args, (self.thread.id,))
+        self.assertFalse(Production.objects.exists())
+        self.assertFalse(StockMovement.objects.exists())
+        self.assertEqual(
+            dict(MaterialStock.objects.values_list('material_id', 'quantity')), {self.fabric.id: 10, self.thread.id: 3}
+        )
+
+    def test_view_reports_shortage(self):
+        self.client.force_login(User.objects.create_user('maker', 'maker@example.com', 'pass'))
+        response = self.client.post(reverse('production_create'), {
+            'date': '2026-02-01', 'product': self.product.id, 'location': self.home.id, 'produced_qty': 4,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Недостаточно материалов')
+        self.assertFalse(Production.objects.exists())
+
+    def test_batch_deducts_combined_bom_in_one_update(self):
+        # Подарочный набор: один «Набор» как полуфабрикат плюс 1 м ткани
+        gift = Product.objects.create(name='Подарочный набор')
+        ProductComponent.objects.create(product=gift, component=self.product, qty_per_unit=1)
+        ProductBOM.objects.create(product=gift, material=self.fabric, qty_per_unit=1)
+        batch = [
+            Production(date=date(2026, 2, 1), product=self.product, location=self.home, produced_qty=2),
+            Production(date=date(2026, 2, 1), product=gift, location=self.home, produced_qty=1),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            create_productions(batch)
+
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "core_materialstock"')]
+        self.assertEqual(len(updates), 1)
+        # Ткань: 2×2 + 1×(2 + 1) = 7, нитки: 2×1 + 1×1 = 3
+        self.assertEqual(
+            dict(MaterialStock.objects.values_list('material_id', 'quantity')), {self.fabric.id: 3, self.thread.id: 0}
+        )
+        self.assertEqual(
+            dict(ProductStock.objects.values_list('product_id', 'quantity')), {self.product.id: 2, gift.id: 1}
+        )
+        used = defaultdict(Decimal)
+        for material_id, quantity in ProductionMaterial.objects.values_list('material_id', 'quantity_used'):
+            used[material_id] += quantity
+        self.assertEqual(dict(used), {self.fabric.id: 7, self.thread.id: 3})
+        self.assertEqual(StockMovement.objects.filter(reason='consumption').count(), 4)
+
+
+class CostingTests(TestCase):
+    """Средневзвешенная цена материала и себестоимость выпуска"""
+
+    def setUp(self):
+        bom.invalidate()
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.fabric = Material.objects.create(name='Ткань', unit='м', type='raw')
+        self.product = Product.objects.create(name='Набор')
+        ProductBOM.objects.create(product=self.product, material=self.fabric, qty_per_unit=2)
+
+    def buy(self, *lines):
+        create_purchases([
+            MaterialPurchase(date=date(2026, 2, 1), material=self.fabric, quantity=quantity, unit_price=price,
+                             total_amount=Decimal(quantity) * Decimal(price))
+            for quantity, price in lines
+        ], self.home)
+        self.fabric.refresh_from_db()
+        return self.fabric.avg_cost, self.fabric.cost_qty
+
+    def test_weighted_average_through_purchases_and_production(self):
+        self.assertEqual(self.buy((10, 100)), (100, 10))
+        # (100×10 + 120×30) / 40 — одной накладной из двух строк
+        self.assertEqual(self.buy((10, 120), (20, 120)), (115, 40))
+
+        production, = create_productions([
+            Production(date=date(2026, 2, 2), product=self.product, location=self.home, produced_qty=5),
+        ])
+        production.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((production.unit_cost, self.product.unit_cost), (230, 230))
+        self.fabric.refresh_from_db()
+        self.assertEqual((self.fabric.avg_cost, self.fabric.cost_qty), (115, 30))
+
+        # (115×30 + 55×10) / 40
+        self.assertEqual(self.buy((10, 55)), (100, 40))
+        # Дробная закупка: (100×40 + 0.003×33.33) / 40.003, цена — до 4 знаков
+        self.assertEqual(self.buy(('0.003', '33.33')), (Decimal('99.9950'), Decimal('40.003')))
+
+
+class ExportTests(TestCase):
+    """Выгрузки CSV / XLSX: заголовки, все строки и значения как в БД"""
+
+    def setUp(self):
+        home = Location.objects.create(name='Дом', type='home')
+        wb = Location.objects.create(name='WB Коледино', type='wb')
+        product = Product.objects.create(name='Набор "Люкс"', wb_article='12345')
+        ProductStock.objects.create(product=product, location=home, quantity=Decimal('40'))
+        post_shipment(WBShipment.objects.create(
+            date=date(2026, 2, 1), from_location=home, to_location=wb, product=product,
+            quantity=Decimal('12.5'), wb_shipment_number='WB-1', comment='коробка; вторая партия',
+        ))
+        self.client.force_login(User.objects.create_user('exporter', 'exporter@example.com', 'pass'))
+
+    def get(self, name, **params):
+        response = self.client.get(reverse('export', args=[name]), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_csv(self):
+        response = self.get('shipments')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(body.startswith('\ufeff'))
+        rows = list(csv.reader(io.StringIO(body[1:]), delimiter=';'))
+        self.assertEqual(rows, [
+            ['Дата', 'Номер поставки', 'Продукт', 'Откуда', 'Куда', 'Количество', 'Комментарий'],
+            ['2026-02-01', 'WB-1', 'Набор "Люкс"', 'Дом', 'WB Коледино', '12.5', 'коробка; вторая партия'],
+        ])
+
+        rows = list(csv.reader(io.StringIO(b''.join(self.get('product-stocks').streaming_content).decode()[1:]),
+                               delimiter=';'))
+        self.assertEqual(sorted(rows[1:]), [
+            ['Набор "Люкс"', '12345', 'WB Коледино', '12.5'],
+            ['Набор "Люкс"', '12345', 'Дом', '27.5'],
+        ])
+
+    def test_xlsx(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            self.skipTest('openpyxl не установлен')
+        response = self.get('shipments', format='xlsx')
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        self.assertEqual(sheet.title, 'Отгрузки')
+        rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(rows[0], ['Дата', 'Номер поставки', 'Продукт', 'Откуда', 'Куда', 'Количество', 'Комментарий'])
+        self.assertEqual(rows[1][1:], ['WB-1', 'Набор "Люкс"', 'Дом', 'WB Коледино', 12.5, 'коробка; вторая партия'])
+        self.assertEqual(len(rows), 2)
+
+    def test_unknown_export(self):
+        self.assertEqual(self.client.get(reverse('export', args=['users'])).status_code, 404)
+
+
+class DatasetTests(TestCase):
+    """Синтетический набор данных: воспроизводим и согласован, как после настоящих проводок"""
+
+    ARGS = ['--locations', '3', '--materials', '10', '--products', '15', '--bom-lines', '3', '--years', '1',
+            '--purchases-per-day', '2', '--productions-per-day', '3', '--shipments-per-day', '3']
+
+    def seed(self, *args):
+        call_command('seed_dataset', *self.ARGS, *args, stdout=io.StringIO())
+        return (
+            list(MaterialPurchase.objects.order_by('id').values_list('date', 'material__name', 'quantity')),
+            list(Production.objects.order_by('id').values_list('date', 'product__name', 'produced_qty')),
+            list(WBShipment.objects.order_by('id').values_list('date', 'product__name', 'to_location__name', 'quantity')),
+        )
+
+    def test_reproducible_and_never_negative(self):
+        purchases, productions, shipments = self.seed()
+        self.assertEqual(purchases[-1][0], date(2025, 12, 31))
+        self.assertTrue(productions and shipments)
+        self.assertEqual(self.seed('--flush'), (purchases, productions, shipments))
+        self.assertNotEqual(self.seed('--flush', '--end', '2026-06-01')[0][-1][0], purchases[-1][0])
+
+        self.assertFalse(MaterialStock.objects.filter(quantity__lt=0).exists())
+        self.assertFalse(ProductStock.objects.filter(quantity__lt=0).exists())
+        # Остаток на конец каждого дня истории по журналу ни разу не уходит в минус
+        running = defaultdict(Decimal)
+        movements = StockMovement.objects.order_by('date').values_list(
+            'date', 'material_id', 'product_id', 'location_id', 'delta'
+        )
+        previous = None
+        for day, material_id, product_id, location_id, delta in movements:
+            if day != previous:
+                self.assertGreaterEqual(min(running.values(), default=0), 0, previous)
+                previous = day
+            running[(material_id, product_id, location_id)] += delta
+        current = {
+            **{(material_id, None, location_id): quantity for material_id, location_id, quantity
+               in MaterialStock.objects.values_list('material_id', 'location_id', 'quantity')},
+            **{(None, product_id, location_id): quantity for product_id, location_id, quantity
+               in ProductStock.objects.values_list('product_id', 'location_id', 'quantity')},
+        }
+        self.assertEqual(dict(running), current)
+
+
+class SnapshotTests(TestCase):
+    """Остаток на дату по снимку + движениям после него совпадает с полным проходом журнала"""
+
+    def setUp(self):
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.wb = Location.objects.create(name='WB Коледино', type='wb')
+        self.material = Material.objects.create(name='Тряпка', unit='шт', type='raw')
+        self.product = Product.objects.create(name='Набор')
+
+    def move(self, day, delta, location=None, **item):
+        StockMovement.objects.create(
+            date=date(2026, 3, day), reason='purchase', location=location or self.home,
+            delta=delta, **(item or {'material': self.material}),
+        )
+
+    def test_as_of_matches_replay(self):
+        for day in range(1, 11):
+            self.move(day, 10)
+            self.move(day, Decimal('-2.5'), product=self.product)
+            self.move(day, 1, location=self.wb, product=self.product)
+        snapshots.take_snapshot(date(2026, 3, 3))
+        snapshots.take_snapshot(date(2026, 3, 7))
+        # Задним числом — раньше обоих снимков
+        self.move(2, Decimal('0.001'))
+
+        days = [date(2026, 3, day) for day in (2, 3, 5, 7, 9)]
+        as_of = {day: snapshots.balances(day) for day in days}
+        StockSnapshot.objects.all().delete()
+        for day in days:
+            with self.subTest(day=day):
+                self.assertEqual(as_of[day], snapshots.balances(day))
+
+        self.assertEqual(as_of[days[-1]][0], {(self.material.id, self.home.id): Decimal('90.001')})
+        self.assertEqual(as_of[days[-1]][1], {
+            (self.product.id, self.home.id): Decimal('-22.5'), (self.product.id, self.wb.id): Decimal(9),
+        })
+
+    def test_as_of_reads_only_movements_after_snapshot(self):
+        for day in range(1, 11):
+            self.move(day, 1)
+        _, lines = snapshots.take_snapshot(date(2026, 3, 8))
+        self.assertEqual(lines, 1)
+        with CaptureQueriesContext(connection) as queries:
+            materials, _ = snapshots.balances(date(2026, 3, 9))
+        self.assertEqual(materials, {(self.material.id, self.home.id): Decimal(9)})
+        # Снимок, его строки и один агрегат по движениям после него
+        self.assertEqual(len(queries), 3)
+
+    def assertAsOfTodayIsCurrent(self):
+        current = tuple(
+            {(item_id, location_id): quantity
+             for item_id, location_id, quantity in model.objects.exclude(quantity=0).values_list(key, 'location_id', 'quantity')}
+            for model, key in ((MaterialStock, 'material_id'), (ProductStock, 'product_id'))
+        )
+        self.assertEqual(snapshots.balances(date.today()), current)
+
+    def test_as_of_today_matches_stock_after_postings_and_admin_edits(self):
+        bom.invalidate()
+        ProductBOM.objects.create(product=self.product, material=self.material, qty_per_unit=2)
+        day = date.today() - timedelta(days=5)
+        post_purchase(MaterialPurchase.objects.create(
+            date=day, material=self.material, quantity=20, unit_price=1, total_amount=20,
+        ), self.home)
+        post_production(Production.objects.create(date=day, product=self.product, location=self.home, produced_qty=4))
+        snapshots.take_snapshot(day)
+        post_shipment(WBShipment.objects.create(
+            date=day, from_location=self.home, to_location=self.wb, product=self.product, quantity=3,
+            wb_shipment_number='WB-1',
+        ))
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        stock = MaterialStock.objects.get(material=self.material, location=self.home)
+        self.client.post(reverse('admin:core_materialstock_change', args=[stock.id]), {'quantity': '11.5'})
+        self.client.post(reverse('admin:core_materialstock_add'), {
+            'material': self.material.id, 'location': self.wb.id, 'quantity': '2',
+        })
+        product_stock = ProductStock.objects.get(product=self.product, location=self.home)
+        self.client.post(reverse('admin:core_productstock_delete', args=[product_stock.id]), {'post': 'yes'})
+
+        self.assertEqual(MaterialStock.objects.get(id=stock.id).quantity, Decimal('11.5'))
+        self.assertFalse(ProductStock.objects.filter(id=product_stock.id).exists())
+        self.assertEqual(StockMovement.objects.filter(reason='adjustment').count(), 3)
+        self.assertAsOfTodayIsCurrent()
+
+    def test_opening_balances_cover_stock_from_before_the_ledger(self):
+        # Остатки, заведённые до журнала (bulk_create — мимо проводок и админки)
+        MaterialStock.objects.bulk_create([
+            MaterialStock(material=self.material, location=self.home, quantity=7),
+            MaterialStock(material=self.material, location=self.wb, quantity=0),
+        ])
+        ProductStock.objects.bulk_create([ProductStock(product=self.product, location=self.wb, quantity=5)])
+        self.move(5, -7, location=self.wb)  # в журнале есть, в остатках — 0
+        self.move(6, 2)
+        self.assertNotEqual(snapshots.balances(date.today())[0], {(self.material.id, self.home.id): Decimal(7)})
+
+        migration = import_module('core.migrations.0022_opening_balances')
+        migration.seed_opening_balances(apps, None)
+        self.assertAsOfTodayIsCurrent()
+        self.assertEqual(set(StockMovement.objects.filter(reason='opening').values_list('date', flat=True)),
+                         {date(2026, 3, 5)})
+
+
+class ThresholdTests(TestCase):
+    """Пороги хранятся в строках остатков и следуют за проводками и правками позиций"""
+
+    def setUp(self):
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.wb = Location.objects.create(name='WB Коледино', type='wb')
+        self.plain = Product.objects.create(name='Набор')
+        self.custom = Product.objects.create(name='Подарочный набор', critical_level=10, low_level=50)
+        for product in (self.plain, self.custom):
+            ProductStock.objects.create(product=product, location=self.home, quantity=30)
+
+    def counts(self):
+        result = summary.summarize(MaterialStock.objects.all(), ProductStock.objects.all())
+        return result['critical_products'], result['low_products']
+
+    def test_levels_follow_postings_and_overrides(self):
+        stock = ProductStock.objects.get(product=self.plain, location=self.home)
+        self.assertEqual((stock.critical_level, stock.low_level), (5, 20))
+        # Свой порог позиции: 30 < 50 — «мало»
+        self.assertEqual(self.counts(), (0, 1))
+
+        post_shipment(WBShipment.objects.create(
+            date=date(2026, 3, 1), from_location=self.home, to_location=self.wb, product=self.plain,
+            quantity=26, wb_shipment_number='WB-1',
+        ))
+        # Дома осталось 4 (критично), на WB появилась строка с 26 — порогами по умолчанию
+        self.assertEqual(self.counts(), (1, 2))
+        self.assertEqual(ProductStock.objects.get(product=self.plain, location=self.wb).low_level, 20)
+
+        self.custom.low_level = None
+        self.custom.save(update_fields=['low_level'])
+        self.assertEqual(self.counts(), (1, 1))
+        self.assertEqual(
+            set(ProductStock.objects.filter(summary.stock_status_q('product', 'critical')).values_list('product_id', 'location_id')),
+            {(self.plain.id, self.home.id)},
+        )
+        with self.assertRaises(ValueError):
+            summary.stock_status_q('service', 'critical')
+
+    def test_product_default_is_strictly_below_five(self):
+        stock = ProductStock.objects.get(product=self.plain, location=self.home)
+        for quantity, critical in (('4.5', 1), ('4.999', 1), ('5', 0), ('5.001', 0)):
+            ProductStock.objects.filter(id=stock.id).update(quantity=Decimal(quantity))
+            self.assertEqual(self.counts()[0], critical, quantity)
+
+        self.client.force_login(User.objects.create_user('keeper', 'keeper@example.com', 'pass'))
+        self.assertContains(self.client.get(reverse('wb_stocks')), 'критично при &lt; 5</small>')
+
+    @override_settings(STOCK_THRESHOLDS={'product': {'critical': 100, 'low': 200}})
+    def test_threshold_migrations_ignore_settings(self):
+        for name, function in (('0021_stock_thresholds', 'fill_levels'), ('0023_stock_critical_exclusive', 'exclusive_default')):
+            getattr(import_module(f'core.migrations.{name}'), function)(apps, None)
+        stock = ProductStock.objects.get(product=self.plain, location=self.home)
+        self.assertEqual((stock.critical_level, stock.low_level), (5, 20))
+
+    def test_empty_stock_is_always_critical(self):
+        material = Material.objects.create(name='Ткань', unit='м', type='raw')
+        stock = MaterialStock.objects.create(material=material, location=self.home, quantity=1)
+        post_purchase(MaterialPurchase.objects.create(
+            date=date(2026, 3, 1), material=material, quantity=1, unit_price=1, total_amount=1,
+        ), self.home)
+        stock.refresh_from_db()
+        self.assertEqual((stock.quantity, stock.critical_level), (2, 0))
+        for quantity, critical in (('0.001', 0), ('0', 1)):
+            MaterialStock.objects.filter(id=stock.id).update(quantity=Decimal(quantity))
+            result = summary.summarize(MaterialStock.objects.all(), ProductStock.objects.none())
+            self.assertEqual(result['critical_materials'], critical, quantity)
+
+
+@override_settings(FORECAST_HISTORY_WEEKS=4, FORECAST_PRODUCT_LEAD_DAYS=7)
+class ForecastTests(TestCase):
+    """Прогноз пишет точки заказа в позиции и пороги — в их строки остатков"""
+
+    def setUp(self):
+        bom.invalidate()
+        self.home = Location.objects.create(name='Дом', type='home')
+        self.wb = Location.objects.create(name='WB Коледино', type='wb')
+        self.material = Material.objects.create(name='Тряпка', unit='шт', type='raw', lead_time_days=14)
+        self.product = Product.objects.create(name='Набор')
+        ProductBOM.objects.create(product=self.product, material=self.material, qty_per_unit=2)
+
+    def test_run_forecast_syncs_stock_levels(self):
+        # Четыре полные недели по 10 штук: прогноз 10 в неделю, ошибка 0 — страховой запас 0
+        for day in (2, 9, 16, 23):
+            WBShipment.objects.create(
+                date=date(2026, 3, day), from_location=self.home, to_location=self.wb, product=self.product,
+                quantity=10, wb_shipment_number=f'WB-{day}',
+            )
+        stock = ProductStock.objects.create(product=self.product, location=self.wb, quantity=5)
+        material_stock = MaterialStock.objects.create(material=self.material, location=self.home, quantity=30)
+
+        self.assertEqual(forecast.run_forecast(today=date(2026, 3, 30)), (1, 1))
+
+        product = Product.objects.get(id=self.product.id)
+        self.assertEqual((product.forecast_weekly, product.safety_stock, product.reorder_point), (10, 0, 10))
+        material = Material.objects.get(id=self.material.id)
+        # 2 на штуку × 10 в неделю × 2 недели поставки
+        self.assertEqual((material.forecast_weekly, material.reorder_point), (20, 40))
+
+        stock.refresh_from_db()
+        material_stock.refresh_from_db()
+        self.assertEqual((stock.critical_level, stock.low_level), (0, 10))
+        self.assertEqual((material_stock.critical_level, material_stock.low_level), (0, 40))
+        self.assertTrue(ProductStock.objects.filter(summary.stock_status_q('product', 'low'), id=stock.id).exists())
+
+    def ship(self, day, quantity):
+        WBShipment.objects.create(
+            date=day, from_location=self.home, to_location=self.wb, product=self.product,
+            quantity=quantity, wb_shipment_number=f'WB-{day:%m%d}',
+        )
+
+    def test_weekly_series_uses_full_weeks_only(self):
+        # Понедельник 30.03: история — недели с 09.03, 16.03 и 23.03; текущая неделя не входит
+        for day, quantity in ((8, 100), (10, 3), (15, 4), (24, 5), (30, 100)):
+            self.ship(date(2026, 3, day), quantity)
+        product_ids, series = forecast.weekly_series(3, today=date(2026, 3, 31))
+        self.assertEqual(product_ids, [self.product.id])
+        self.assertEqual(series.tolist(), [[7, 0, 5]])
+
+    def test_smoothing_and_reorder_levels(self):
+        level, sigma = forecast.smooth(np.array([[10, 20, 10, 20], [0, 0, 0, 0]], dtype=float), alpha=0.5)
+        # Уровень: 10 → 15 → 12.5 → 16.25; ошибки 10, −5, 7.5
+        self.assertEqual(level.tolist(), [16.25, 0])
+        self.assertAlmostEqual(sigma[0], np.sqrt((100 + 25 + 56.25) / 3))
+        self.assertEqual(sigma[1], 0)
+
+        safety, reorder = forecast.reorder_levels(level, sigma, [14, 7], z=1.65)
+        self.assertAlmostEqual(safety[0], 1.65 * sigma[0] * np.sqrt(2))
+        self.assertAlmostEqual(reorder[0], 16.25 * 2 + safety[0])
+        self.assertEqual((safety[1], reorder[1]), (0, 0))
+
+    def test_items_without_history_fall_back_to_defaults(self):
+        for day in (2, 9, 16, 23):
+            self.ship(date(2026, 3, day), 10)
+        stock = ProductStock.objects.create(product=self.product, location=self.wb, quantity=5)
+        forecast.run_forecast(today=date(2026, 3, 30))
+        stock.refresh_from_db()
+        self.assertEqual((stock.critical_level, stock.low_level), (0, 10))
+
+        # Через полгода отгрузок в окне нет — прогноз снят, пороги снова общие
+        self.assertEqual(forecast.run_forecast(today=date(2026, 9, 28)), (0, 0))
+        product = Product.objects.get(id=self.product.id)
+        self.assertEqual((product.forecast_weekly, product.safety_stock, product.reorder_point), (None, None, None))
+        self.assertIsNone(Material.objects.get(id=self.material.id).reorder_point)
+        stock.refresh_from_db()
+        self.assertEqual((stock.critical_level, stock.low_level), (5, 20))
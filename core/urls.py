@@ -11,11 +11,25 @@ urlpatterns = [
     # ✅ Основные формы
     path('', views.dashboard, name='dashboard'),
     path('production/', views.production_create, name='production_create'),
+    path('production/batch/', views.production_batch, name='production_batch'),
+    path('production/capacity/', views.capacity, name='capacity'),
     path('purchase/', views.purchase_create, name='purchase_create'),
+    path('purchase/import/', views.purchase_import, name='purchase_import'),
+    path('purchase/plan/', views.mrp, name='mrp'),
     path('shipment/', views.shipment_create, name='shipment_create'),
 
     # ✅ WB модули (убрал проблемный!)
     path('wb/profile/', views.wb_profile, name='wb_profile'),
-    # path('wb/sync-products/', views.wb_sync_products, name='sync_wb_products'),  # ❌ УБРАЛ!
+    path('wb/sync-products/', views.sync_wb_products, name='sync_wb_products'),
+    path('wb/jobs/<int:job_id>/', views.wb_job_status, name='wb_job_status'),
     path('wb/stocks/', views.wb_stocks, name='wb_stocks'),
+    path('wb/stocks/as-of/', views.stock_as_of, name='stock_as_of'),
+
+    # ✅ Отчёты
+    path('reports/', views.reports, name='reports'),
+    path('reports/<slug:report_type>/', views.reports, name='report'),
+    path('export/<slug:name>/', views.export, name='export'),
+
+    # ✅ Профилирование (staff)
+    path('profiling/', views.profiling_stats, name='profiling'),
 ]
@@ -1,19 +1,43 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import transaction
 from django.db.models import Sum
-from .forms import ProductionForm, PurchaseForm, ShipmentForm, UserProfileForm
+from .forms import (
+    ProductionForm, ProductionBatchFormSet, PurchaseForm, PurchaseImportForm, ShipmentForm, UserProfileForm
+)
 from .models import *
-from .services.wb_api import WildberriesAPI  # ✅ Импорт API
+from .services.capacity import capacity_table
+from .services.export import EXPORTS, iter_csv, write_xlsx
+from .services.jobs import enqueue
+from .services.mrp import DEFAULT_WEEKS, plan
+from .services.wb_health import get_health, health_ttl, key_hash, set_health
+from .services import profiling
+from .services.pagination import keyset_page
+from .services.purchase_import import PurchaseImportError, decode, import_purchases
+from .services.reports import PERIODS, REPORT_TYPES, build_report, parse_anchor, period_bounds
+from .services.snapshots import as_of_table
+from .services.summary import (
+    STATUSES, stock_status, stock_status_q, stock_summary, summarize
+)
+from .services.stock import (
+    InsufficientStock, create_productions, home_location, post_production, post_purchase, post_shipment
+)
 
 # ✅ ГЛАВНЫЙ ДАШБОРД — ТЕПЕРЬ С @login_required!
 @login_required
 def dashboard(request):
     """🔒 Главный дашборд — только для авторизованных"""
-    total_products = ProductStock.objects.aggregate(Sum('quantity'))['quantity__sum'] or 0
-    total_materials = MaterialStock.objects.aggregate(Sum('quantity'))['quantity__sum'] or 0
-    critical_materials = MaterialStock.objects.filter(quantity=0).count()
+    summary = stock_summary()
+    total_products = summary['total_products']
+    total_materials = summary['total_materials']
+    critical_materials = summary['critical_materials']
 
     status_icon = "✓" if critical_materials == 0 else "⚠️"
     status_color = "success" if critical_materials == 0 else "warning"
@@ -34,28 +58,13 @@ def production_create(request):
     if request.method == 'POST':
         form = ProductionForm(request.POST)
         if form.is_valid():
-            production = form.save()
-
-            # Автоматическое списание материалов
-            for bom in production.product.productbom_set.all():
-                stock, created = MaterialStock.objects.get_or_create(
-                    material=bom.material,
-                    location=production.location,
-                    defaults={'quantity': 0}
-                )
-                stock.quantity -= bom.qty_per_unit * production.produced_qty
-                if stock.quantity < 0:
-                    stock.quantity = 0
-                stock.save()
-
-            # Поступление готовой продукции
-            product_stock, created = ProductStock.objects.get_or_create(
-                product=production.product,
-                location=production.location,
-                defaults={'quantity': 0}
-            )
-            product_stock.quantity += production.produced_qty
-            product_stock.save()
+            try:
+                with transaction.atomic():
+                    production = form.save(commit=False)
+                    post_production(production)  # Сохранение с себестоимостью, списание материалов + поступление продукции
+            except InsufficientStock:
+                messages.error(request, '❌ Недостаточно материалов на складе!')
+                return render(request, 'core/production.html', {'form': form, 'title': 'Производство'})
 
             messages.success(request, f'✅ Произведено {production.produced_qty} {production.product.name}')
             return redirect('dashboard')
@@ -68,6 +77,38 @@ def production_create(request):
     })
 
 
+
+@login_required
+def production_batch(request):
+    """🔒 Производство за смену (пакетная проводка)"""
+    choices = {
+        'product_choices': Product.objects.values_list('id', 'name'),
+        'location_choices': Location.objects.values_list('id', 'name'),
+    }
+    if request.method == 'POST':
+        formset = ProductionBatchFormSet(request.POST, form_kwargs=choices)
+        if formset.is_valid():
+            productions = [form.to_production() for form in formset if form.has_changed()]
+            if not productions:
+                messages.error(request, '❌ Заполните хотя бы одну строку')
+            else:
+                try:
+                    create_productions(productions)
+                except InsufficientStock:
+                    # Смена не проводится частично: ни одной строки, пока материалов не хватает
+                    messages.error(request, '❌ Недостаточно материалов на складе!')
+                else:
+                    total = sum(production.produced_qty for production in productions)
+                    messages.success(request, f'✅ Проведено {len(productions)} производств, {total:g} шт.')
+                    return redirect('dashboard')
+    else:
+        formset = ProductionBatchFormSet(form_kwargs=choices)
+
+    return render(request, 'core/production_batch.html', {
+        'formset': formset,
+        'title': 'Производство за смену'
+    })
+
 @login_required
 def purchase_create(request):
     """🔧 ИСПРАВЛЕННЫЙ СЧЁТЧИК СУММЫ"""
@@ -76,23 +117,15 @@ def purchase_create(request):
         if form.is_valid():
             purchase = form.save(commit=False)
 
-            # ✅ ТОЧНЫЙ РАСЧЁТ!
-            quantity = float(form.cleaned_data['quantity'] or 0)
-            unit_price = float(form.cleaned_data['unit_price'] or 0)
-            purchase.total_amount = quantity * unit_price  # ✅ РАБОТАЕТ!
-
-            purchase.save()
+            # ✅ ТОЧНЫЙ РАСЧЁТ: количество и цена — Decimal
+            quantity = form.cleaned_data['quantity'] or 0
+            unit_price = form.cleaned_data['unit_price'] or 0
+            purchase.total_amount = (quantity * unit_price).quantize(Decimal('0.01'))
 
-            # Остальной код без изменений...
-            home_loc, created = Location.objects.get_or_create(
-                name='Дом', defaults={'type': 'home'}
-            )
-            stock, _ = MaterialStock.objects.get_or_create(
-                material=purchase.material, location=home_loc,
-                defaults={'quantity': 0}
-            )
-            stock.quantity += purchase.quantity
-            stock.save()
+            home_loc = home_location()
+            with transaction.atomic():
+                purchase.save()
+                post_purchase(purchase, home_loc)
 
             messages.success(request,
                              f'✅ Закуплено {purchase.quantity} {purchase.material.unit} '
@@ -104,34 +137,46 @@ def purchase_create(request):
     return render(request, 'core/purchase.html', {'form': form, 'title': 'Закупки'})
 
 
+@login_required
+def purchase_import(request):
+    """🔒 Загрузка накладной CSV: все строки проверяются и проводятся разом"""
+    errors = []
+    if request.method == 'POST':
+        form = PurchaseImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                purchases = import_purchases(decode(form.cleaned_data['file'].read()))
+            except PurchaseImportError as error:
+                errors = error.errors
+            else:
+                total = sum(purchase.total_amount for purchase in purchases)
+                messages.success(request, f'✅ Загружено {len(purchases)} закупок на {total:,.0f} руб.')
+                return redirect('dashboard')
+    else:
+        form = PurchaseImportForm()
+
+    return render(request, 'core/purchase_import.html', {
+        'form': form,
+        'errors': errors,
+        'title': 'Загрузка накладной'
+    })
+
+
 @login_required
 def shipment_create(request):
     """🔒 Отгрузки"""
     if request.method == 'POST':
         form = ShipmentForm(request.POST)
         if form.is_valid():
-            shipment = form.save()
-
-            # Списание с "откуда"
-            from_stock, _ = ProductStock.objects.get_or_create(
-                product=shipment.product, location=shipment.from_location
-            )
-            if from_stock.quantity < shipment.quantity:
+            try:
+                with transaction.atomic():
+                    shipment = form.save()
+                    post_shipment(shipment)  # Списание с "откуда", поступление "куда"
+            except InsufficientStock:
                 messages.error(request, '❌ Недостаточно готовой продукции!')
-                shipment.delete()
                 form = ShipmentForm()
                 return render(request, 'core/shipment.html', {'form': form, 'title': 'Отгрузки'})
 
-            from_stock.quantity -= shipment.quantity
-            from_stock.save()
-
-            # Поступление "куда"
-            to_stock, _ = ProductStock.objects.get_or_create(
-                product=shipment.product, location=shipment.to_location
-            )
-            to_stock.quantity += shipment.quantity
-            to_stock.save()
-
             messages.success(request,
                              f'✅ Отгружено {shipment.quantity} на склад {shipment.to_location}! №{shipment.wb_shipment_number}')
             return redirect('dashboard')
@@ -142,69 +187,269 @@ def shipment_create(request):
 
 @login_required
 def wb_profile(request):
-    """🔒 WB Токен"""
+    """🔒 WB Токен (проверка токена — фоновой задачей, без ожидания WB в запросе)"""
     token, created = WBToken.objects.get_or_create(user=request.user)
 
     if request.method == 'POST':
         token.api_key = request.POST.get('api_key', '').strip()
         token.save()
+        if token.api_key:
+            enqueue(token, 'ping', {'key_hash': key_hash(token.api_key)})
         messages.success(request, "✅ Токен сохранен!")
         return redirect('wb_profile')
 
     test_result = None
+    ping_job = None
     if token.api_key:
-        try:
-            wb_api = WildberriesAPI(token.api_key)
-            test_result = wb_api.test_connection()
-        except:
+        # Свежий результат из кэша — без запроса к WB и без задачи
+        test_result = get_health(token.api_key)
+
+    if token.api_key and test_result is None:
+        ping_job = token.jobs.filter(kind='ping').order_by('-created_at', '-id').first()
+        fresh_since = timezone.now() - timedelta(seconds=health_ttl())
+        is_fresh = ping_job is not None and not ping_job.is_pending \
+            and ping_job.finished_at >= fresh_since \
+            and ping_job.payload.get('key_hash') == key_hash(token.api_key)
+        if is_fresh and ping_job.status == 'done':
+            # Задачу выполнил воркер в другом процессе — кладём результат в свой кэш
+            test_result = ping_job.result
+            set_health(token.api_key, test_result, (ping_job.finished_at - fresh_since).total_seconds())
+        elif is_fresh:
             test_result = {'status': 'error', 'message': 'Ошибка подключения'}
+        elif ping_job is None or not ping_job.is_pending:
+            ping_job = enqueue(token, 'ping', {'key_hash': key_hash(token.api_key)})
 
     return render(request, 'wb_settings.html', {
         'token': token,
-        'test_result': test_result
+        'test_result': test_result,
+        'job': ping_job if ping_job and ping_job.is_pending else None,
     })
 
 @login_required
 def sync_wb_products(request):
-    """🔒 Синхронизация WB"""
-    token = WBToken.objects.get(user=request.user)
-    try:
-        wb_api = WildberriesAPI(token.api_key)
-        test = wb_api.test_connection()
-        products = wb_api.get_demo_products(limit=50)
-    except:
-        products = []
-        test = {'status': 'error'}
+    """🔒 Синхронизация WB (ставится в очередь, страница ждёт задачу)"""
+    token = WBToken.objects.filter(user=request.user).exclude(api_key='').first()
+    if token is None:
+        messages.error(request, '❌ Сначала сохраните WB токен')
+        return redirect('wb_profile')
 
+    if request.method == 'POST':
+        enqueue(token, 'sync_cards', {'full': bool(request.POST.get('full'))})
+        messages.success(request, '⏳ Синхронизация поставлена в очередь')
+        return redirect('sync_wb_products')
+
+    last_job = token.jobs.filter(kind='sync_cards').order_by('-created_at', '-id').first()
+    products = Product.objects.exclude(wb_article='')
     return render(request, 'wb_products.html', {
-        'products': products,
-        'count': len(products),
-        'test_result': test
+        'products': products.annotate(amount=Sum('productstock__quantity')).order_by('name')[:100],
+        'count': products.count(),
+        'last_job': last_job,
+        'job': last_job if last_job and last_job.is_pending else None,
+    })
+
+@login_required
+def wb_job_status(request, job_id):
+    """🔒 Статус фоновой задачи WB (JSON для опроса со страницы)"""
+    job = get_object_or_404(WBJob, id=job_id, token__user=request.user)
+    return JsonResponse({
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'result': job.result,
+        'error': job.error.splitlines()[-1] if job.error else '',
+        'finished_at': job.finished_at,
     })
 
+STOCK_SORTS = {
+    'name': ('material__name', 'product__name'),
+    'quantity': ('quantity', 'quantity'),
+    '-quantity': ('-quantity', '-quantity'),
+}
+
+
 @login_required
 def wb_stocks(request):
-    """🔒 Остатки WB"""
+    """🔒 Остатки WB (keyset-пагинация, фильтры и сортировка на сервере)"""
     location_filter = request.GET.get('location')
+    type_filter = request.GET.get('type')
+    status_filter = request.GET.get('status')
+    sort = request.GET.get('sort') if request.GET.get('sort') in STOCK_SORTS else 'name'
+    page_size = getattr(settings, 'STOCKS_PAGE_SIZE', 50)
 
-    material_stocks = MaterialStock.objects.select_related('material', 'location').all()
-    product_stocks = ProductStock.objects.select_related('product', 'location').all()
+    material_stocks = MaterialStock.objects.select_related('material', 'location')
+    product_stocks = ProductStock.objects.select_related('product', 'location')
 
     if location_filter:
         material_stocks = material_stocks.filter(location_id=location_filter)
         product_stocks = product_stocks.filter(location_id=location_filter)
+    if type_filter:
+        material_stocks = material_stocks.filter(material__type=type_filter)
+    if status_filter:
+        material_stocks = material_stocks.filter(stock_status_q('material', status_filter))
+        product_stocks = product_stocks.filter(stock_status_q('product', status_filter))
+
+    # Без доп. фильтров итоги берём из кэша, иначе — один агрегирующий запрос
+    if type_filter or status_filter:
+        summary = summarize(material_stocks, product_stocks)
+    else:
+        summary = stock_summary(location_filter)
+
+    material_order, product_order = STOCK_SORTS[sort]
+    material_page, material_next = keyset_page(
+        material_stocks.annotate(status=stock_status('material')), material_order, request.GET.get('m_cursor'), page_size
+    )
+    product_page, product_next = keyset_page(
+        product_stocks.annotate(status=stock_status('product')), product_order, request.GET.get('p_cursor'), page_size
+    )
+
+    def page_url(param, cursor):
+        query = request.GET.copy()
+        query.pop(param, None)
+        if cursor:
+            query[param] = cursor
+        return f'?{query.urlencode()}'
 
     context = {
-        'material_stocks': material_stocks,
-        'product_stocks': product_stocks,
-        'total_materials': material_stocks.aggregate(Sum('quantity'))['quantity__sum'] or 0,
-        'total_products': product_stocks.aggregate(Sum('quantity'))['quantity__sum'] or 0,
-        'critical_materials': material_stocks.filter(quantity=0).count(),
+        'material_stocks': material_page,
+        'product_stocks': product_page,
+        'material_next_url': page_url('m_cursor', material_next) if material_next else None,
+        'product_next_url': page_url('p_cursor', product_next) if product_next else None,
+        'material_first_url': page_url('m_cursor', None) if request.GET.get('m_cursor') else None,
+        'product_first_url': page_url('p_cursor', None) if request.GET.get('p_cursor') else None,
+        'total_materials': summary['total_materials'],
+        'total_products': summary['total_products'],
+        'critical_materials': summary['critical_materials'],
+        'critical_products': summary['critical_products'],
+        'material_positions': summary['positions_materials'],
+        'product_positions': summary['positions_products'],
         'locations': Location.objects.all(),
+        'material_types': Material._meta.get_field('type').choices,
+        'statuses': STATUSES,
         'selected_location': location_filter,
+        'selected_type': type_filter,
+        'selected_status': status_filter,
+        'selected_sort': sort,
     }
     return render(request, 'core/stocks.html', context)
 
+@login_required
+def capacity(request):
+    """🔒 Сколько можно произвести из текущих остатков материалов (страница или ?format=json)"""
+    location_ids = [int(value) for value in request.GET.getlist('location') if value.isdigit()]
+    search = request.GET.get('q', '').strip()
+    locations, rows = capacity_table(location_ids, search)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'locations': locations, 'products': rows}, json_dumps_params={'ensure_ascii': False})
+
+    for row in rows:
+        row['cells'] = list(zip(row['capacity'], row['bottleneck']))
+
+    return render(request, 'core/capacity.html', {
+        'locations': locations,
+        'all_locations': Location.objects.order_by('name'),
+        'selected_locations': [str(location_id) for location_id in location_ids],
+        'search': search,
+        'rows': rows,
+        'title': 'Мощность производства',
+    })
+
+@login_required
+def mrp(request):
+    """🔒 План закупок материалов под план отгрузок (страница или ?format=json)"""
+    weeks = request.GET.get('weeks', '')
+    weeks = min(max(int(weeks), 1), 52) if weeks.isdigit() else DEFAULT_WEEKS
+    result = plan(weeks)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse(result, json_dumps_params={'ensure_ascii': False})
+
+    result.update({'weeks_count': weeks, 'title': 'План закупок'})
+    return render(request, 'core/mrp.html', result)
+
+@login_required
+def stock_as_of(request):
+    """🔒 Остатки на дату: ближайший снимок + движения после него (страница или ?format=json)"""
+    try:
+        day = date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        day = timezone.localdate()
+    location = request.GET.get('location', '')
+    result = as_of_table(day, int(location) if location.isdigit() else None)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse(result, json_dumps_params={'ensure_ascii': False})
+
+    result.update({
+        'locations': Location.objects.order_by('name'),
+        'selected_location': location,
+        'title': 'Остатки на дату',
+    })
+    return render(request, 'core/stock_as_of.html', result)
+
+@login_required
+def reports(request, report_type='overview'):
+    """🔒 Отчёты (по дневным итогам, а не по всем документам)"""
+    if report_type not in dict(REPORT_TYPES):
+        raise Http404('Неизвестный отчёт')
+
+    period = request.GET.get('period') if request.GET.get('period') in dict(PERIODS) else 'month'
+    date_from, date_to, period_label = period_bounds(period, parse_anchor(request.GET.get('on')))
+    location_filter = request.GET.get('location', '')
+
+    context = build_report(report_type, date_from, date_to, int(location_filter) if location_filter.isdigit() else None)
+    context.update({
+        'report_type': report_type,
+        'report_types': REPORT_TYPES,
+        'periods': PERIODS,
+        'period': period,
+        'period_label': period_label,
+        'date_from': date_from,
+        'date_to': date_to,
+        'locations': Location.objects.all(),
+        'selected_location': location_filter,
+        'exports': [(slug, title) for slug, (title, _, _) in EXPORTS.items()],
+        'title': 'Отчёты',
+    })
+    return render(request, 'core/reports.html', context)
+
+@login_required
+def export(request, name):
+    """🔒 Выгрузка таблицы целиком: CSV потоком или XLSX (?format=xlsx)"""
+    if name not in EXPORTS:
+        raise Http404('Неизвестная выгрузка')
+    filename = f"{name}-{timezone.localdate():%Y-%m-%d}"
+
+    if request.GET.get('format') == 'xlsx':
+        try:
+            output = write_xlsx(name)
+        except ImportError:
+            raise Http404('XLSX недоступен: не установлен openpyxl')
+        return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx')
+
+    response = StreamingHttpResponse(iter_csv(name), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+@staff_member_required
+def profiling_stats(request):
+    """🔒 Профилирование запросов (только staff): время, SQL, дубли по представлениям"""
+    if request.method == 'POST':
+        profiling.reset()
+        messages.success(request, '✅ Статистика сброшена')
+        return redirect('profiling')
+
+    views_stats = profiling.stats()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'views': views_stats}, json_dumps_params={'ensure_ascii': False})
+
+    return render(request, 'core/profiling.html', {
+        'views_stats': views_stats,
+        'enabled': getattr(settings, 'PROFILING_ENABLED', False),
+        'buckets': list(views_stats[0]['histogram']) if views_stats else [],
+        'title': 'Профилирование',
+    })
+
 @login_required
 def user_profile(request):
     """🔒 Профиль пользователя"""
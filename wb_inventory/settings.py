@@ -3,6 +3,7 @@ Django settings for wb_inventory project.
 Generated by 'django-admin startproject' using Django 6.0.
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -28,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы в замер попадали и сессии/авторизация; работает только при PROFILING_ENABLED
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,13 +61,54 @@ TEMPLATES = [
 WSGI_APPLICATION = 'wb_inventory.wsgi.application'
 
 # Database
+# ✅ SQLite под параллельную запись. PRAGMA выполняются при открытии каждого соединения:
+# WAL — читатели не ждут писателя, synchronous=NORMAL — fsync только на checkpoint,
+# mmap и кэш страниц — меньше системных вызовов на чтение.
+# Профиль один на разработку и боевой запуск: dev-база — тот же файл SQLite, что и у сервера
+# (тестовая БД в памяти, WAL к ней не применяется). benchmark_contention сравнивает его с настройками по умолчанию
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # в КБ (минус = размер, а не число страниц): 64 МБ
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами вместо открытия на каждый запрос
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # busy timeout: ждать освобождения блокировки до 20 с, а не падать с «database is locked»
+            'timeout': 20,
+            # Блокировка на запись берётся в начале транзакции: без взаимоблокировок
+            # при повышении чтения до записи (их busy timeout не спасает)
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
+# ✅ Кэш — общий для всех процессов (воркеры gunicorn, wb_worker): версия остатков
+# и рецептур, сводка по остаткам, проверки токенов. LocMemCache по умолчанию у каждого
+# процесса свой — сброс в одном воркере не доходил бы до остальных.
+# Файловый кэш, как и SQLite, не требует отдельного сервера.
+# WB_CACHE_DIR — другой каталог (тесты кладут туда временный, см. core/test_runner.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('WB_CACHE_DIR') or BASE_DIR / 'cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Тесты — со своим кэшем во временном каталоге
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,3 +146,45 @@ MEDIA_ROOT = BASE_DIR / "media"
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
+
+
+# ✅ Wildberries API: таймауты (connect, read), ретраи 429/5xx с экспоненциальной паузой
+WB_API_TIMEOUT = (5, 20)
+WB_API_RETRIES = 3
+WB_API_BACKOFF = 0.5
+WB_API_POOL_SIZE = 10
+# Подмена адресов API (например, локальная заглушка для бенчмарков): {'content': 'http://127.0.0.1:8001', ...}
+WB_API_BASE_URLS = {}
+# Сколько секунд доверяем результату проверки токена (/ping)
+WB_HEALTH_TTL = 300
+# Лимиты запросов на токен по категориям API (общие для всех воркеров, хранятся в БД)
+WB_RATE_LIMITS = {
+    'content': {'per_minute': 100, 'burst': 5},
+    'prices': {'per_minute': 100, 'burst': 5},
+    'statistics': {'per_minute': 1, 'burst': 1},
+}
+
+
+# ✅ Прогноз спроса (manage.py forecast_demand): экспоненциальное сглаживание недельных отгрузок
+FORECAST_ALPHA = 0.3
+FORECAST_HISTORY_WEEKS = 26
+# Коэффициент уровня сервиса для страхового запаса (1.65 ≈ 95%)
+FORECAST_SERVICE_Z = 1.65
+# Сколько дней от запуска производства до поступления на WB
+FORECAST_PRODUCT_LEAD_DAYS = 7
+
+# ✅ Пороги остатков по умолчанию — для позиций без своих порогов (critical_level / low_level)
+# и без прогноза: «критично» — остаток < critical (или закончился), «мало» — остаток < low
+STOCK_THRESHOLDS = {
+    'material': {'critical': 0, 'low': 10},
+    'product': {'critical': 5, 'low': 20},
+}
+
+
+# ✅ Профилирование запросов (/profiling/, только staff)
+PROFILING_ENABLED = False
+# Сколько последних запросов каждого представления держать в памяти
+PROFILING_WINDOW = 500
+PROFILING_SLOW_QUERIES = 5
+# Файл для сырых замеров (JSON по строке на запрос), None — не писать
+PROFILING_LOG_FILE = None